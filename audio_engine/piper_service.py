@@ -0,0 +1,270 @@
+# audio_engine/piper_service.py
+"""
+Resident Piper synthesis service.
+
+Spawning the piper CLI per short reloads the .onnx voice and rebuilds its
+ONNX Runtime session every time. This service keeps recently used voices
+loaded (LRU-bounded by settings.PIPER_SERVICE_MAX_VOICES) and serves
+newline-delimited JSON requests on a unix socket, running at most
+settings.PIPER_SERVICE_WORKERS syntheses at once:
+
+    python audio_engine/piper_service.py
+
+tts.py starts it on demand (see ensure_running()) and falls back to the
+piper CLI when it can't run, e.g. when the piper-tts Python package is
+missing.
+"""
+import argparse
+import fcntl
+import json
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import wave
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict
+
+if __package__ in (None, ""):
+    # Allow `python audio_engine/piper_service.py` to import project modules
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+
+START_TIMEOUT = 30      # seconds to wait for a spawned service to accept connections
+RETRY_AFTER = 60        # seconds before trying to start a service that failed to come up
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+# --- Service ---
+
+class VoiceCache:
+    """Loaded PiperVoice objects, least recently used evicted past max_voices"""
+
+    def __init__(self, max_voices: int):
+        self.max_voices = max(1, max_voices)
+        self._voices: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+        self.loads = 0
+
+    def get(self, model_path: str):
+        from piper import PiperVoice
+
+        with self._lock:
+            if model_path in self._voices:
+                self._voices.move_to_end(model_path)
+                return self._voices[model_path]
+            load_lock = self._loading.setdefault(model_path, threading.Lock())
+
+        # One load per voice even if several requests for it arrive together
+        with load_lock:
+            with self._lock:
+                if model_path in self._voices:
+                    return self._voices[model_path]
+            voice = PiperVoice.load(model_path)
+            with self._lock:
+                self._voices[model_path] = voice
+                self.loads += 1
+                while len(self._voices) > self.max_voices:
+                    evicted, _ = self._voices.popitem(last=False)
+                    print(f"🧹 Unloaded voice: {Path(evicted).name}")
+            print(f"🔊 Loaded voice: {Path(model_path).name}")
+            return voice
+
+    def loaded(self):
+        with self._lock:
+            return list(self._voices)
+
+
+def synthesize_to_wav(voice, text: str, out_wav: Path, length_scale: float, sentence_silence: float) -> None:
+    """Write text as a WAV with either piper-tts API (1.2: synthesize, 1.3+: synthesize_wav/chunks)"""
+    with wave.open(str(out_wav), "wb") as wav:
+        if not hasattr(voice, "synthesize_wav"):
+            voice.synthesize(text, wav, length_scale=length_scale, sentence_silence=sentence_silence)
+            return
+
+        from piper import SynthesisConfig
+        config = SynthesisConfig(length_scale=length_scale)
+        first = True
+        for chunk in voice.synthesize(text, syn_config=config):
+            if first:
+                wav.setframerate(chunk.sample_rate)
+                wav.setsampwidth(chunk.sample_width)
+                wav.setnchannels(chunk.sample_channels)
+                first = False
+            else:
+                silence = int(sentence_silence * chunk.sample_rate) * chunk.sample_width * chunk.sample_channels
+                wav.writeframes(b"\x00" * silence)
+            wav.writeframes(chunk.audio_int16_bytes)
+
+
+class PiperService:
+    def __init__(self, workers: int, max_voices: int):
+        self.voices = VoiceCache(max_voices)
+        self.slots = threading.BoundedSemaphore(max(1, workers))
+        self.workers = max(1, workers)
+        self.served = 0
+
+    def handle(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        op = req.get("op", "synthesize")
+        if op == "ping":
+            return {"ok": True}
+        if op == "stats":
+            return {"ok": True, "voices": self.voices.loaded(), "loads": self.voices.loads,
+                    "served": self.served, "workers": self.workers}
+        if op == "load":
+            self.voices.get(req["voice_model"])
+            return {"ok": True}
+        if op != "synthesize":
+            return {"ok": False, "error": f"Unknown op: {op}"}
+
+        with self.slots:
+            voice = self.voices.get(req["voice_model"])
+            out_wav = Path(req["out_wav"])
+            tmp = out_wav.with_name(f".{out_wav.name}.{threading.get_ident()}.tmp")
+            synthesize_to_wav(voice, req["text"], tmp, float(req.get("length_scale", 1.0)),
+                              float(req.get("sentence_silence", settings.SENTENCE_SILENCE)))
+            tmp.replace(out_wav)
+            self.served += 1
+        return {"ok": True}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # A connection may send any number of requests, one JSON object per line
+        for line in self.rfile:
+            try:
+                resp = self.server.service.handle(json.loads(line))
+            except Exception as e:
+                resp = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(resp) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path: Path, workers: int, max_voices: int) -> None:
+    import piper  # noqa: F401  fail fast (exit) so clients fall back to the CLI
+
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    if socket_path.exists():
+        try:
+            request({"op": "ping"}, socket_path, timeout=2)
+            print(f"Piper service already running on {socket_path}")
+            return
+        except ServiceUnavailable:
+            socket_path.unlink()  # stale socket from a dead service
+
+    server = _Server(str(socket_path), _Handler)
+    server.service = PiperService(workers, max_voices)
+    print(f"🎙️  Piper service on {socket_path} ({workers} worker(s), up to {max_voices} voice(s))")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        socket_path.unlink(missing_ok=True)
+
+
+# --- Client ---
+
+def request(payload: Dict[str, Any], socket_path: Path = None, timeout: float = 600) -> Dict[str, Any]:
+    """Send one request and wait for its reply.
+
+    ServiceUnavailable if nothing is listening, or the service hangs (timeout) or drops the connection.
+    """
+    socket_path = Path(socket_path or settings.PIPER_SERVICE_SOCKET)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(socket_path))
+        sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    except OSError as e:  # includes socket.timeout, refused/reset connections and a missing socket
+        raise ServiceUnavailable(f"{type(e).__name__}: {e}") from e
+    finally:
+        sock.close()
+    if not line:
+        raise ServiceUnavailable("Piper service closed the connection")
+    return json.loads(line)
+
+
+_unavailable_until = [0.0]
+_start_lock = threading.Lock()
+
+
+def ensure_running() -> bool:
+    """True if the service answers, starting it in the background if needed"""
+    if time.monotonic() < _unavailable_until[0]:
+        return False
+    socket_path = Path(settings.PIPER_SERVICE_SOCKET)
+    try:
+        request({"op": "ping"}, socket_path, timeout=5)
+        return True
+    except ServiceUnavailable:
+        pass
+
+    # Only one process on the machine spawns it; the rest wait on the lock, then ping
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    with _start_lock, open(socket_path.with_suffix(".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            request({"op": "ping"}, socket_path, timeout=5)
+            return True
+        except ServiceUnavailable:
+            pass
+
+        log = open(socket_path.with_suffix(".log"), "a")
+        proc = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "--socket", str(socket_path)],
+            stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+            start_new_session=True,  # outlives the web worker or CLI that started it
+        )
+        log.close()
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline and proc.poll() is None:
+            try:
+                request({"op": "ping"}, socket_path, timeout=5)
+                return True
+            except ServiceUnavailable:
+                time.sleep(0.1)
+
+    print(f"⚠️  Piper service did not start (see {socket_path.with_suffix('.log')}); using the piper CLI")
+    _unavailable_until[0] = time.monotonic() + RETRY_AFTER
+    return False
+
+
+def synthesize(text: str, out_wav: Path, model_path: Path, length_scale: float, sentence_silence: float) -> None:
+    """Synthesize through the resident service (which writes out_wav atomically)"""
+    resp = request({
+        "op": "synthesize",
+        "text": text,
+        "voice_model": str(Path(model_path).resolve()),
+        "out_wav": str(Path(out_wav).resolve()),
+        "length_scale": length_scale,
+        "sentence_silence": sentence_silence,
+    })
+    if not resp.get("ok"):
+        raise RuntimeError(f"Piper service: {resp.get('error')}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Resident Piper synthesis service")
+    ap.add_argument("--socket", default=settings.PIPER_SERVICE_SOCKET, help="Unix socket path")
+    ap.add_argument("--workers", type=int, default=settings.PIPER_SERVICE_WORKERS, help="Concurrent syntheses")
+    ap.add_argument("--max-voices", type=int, default=settings.PIPER_SERVICE_MAX_VOICES, help="Voices kept loaded")
+    args = ap.parse_args()
+    serve(Path(args.socket), args.workers, args.max_voices)
+
+
+if __name__ == "__main__":
+    main()
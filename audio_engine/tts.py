@@ -1,10 +1,32 @@
+import argparse
+import hashlib
+import io
 import json
 import os
+import re
+import shutil
 import subprocess
+import sys
+import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+
+if __package__ in (None, ""):
+    # Allow `python audio_engine/tts.py` to import project modules
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+from common import media_probe, metrics
+from common.file_cache import FileCache, file_digest, make_key
+from audio_engine import piper_service
 
 VOICE_DIR = Path("assets/piper_voice")
+# One entry per synthesized sentence; a short's WAV is assembled from them
+AUDIO_CACHE = FileCache(Path(settings.AUDIO_CACHE_DIR), max_bytes=settings.AUDIO_CACHE_MAX_BYTES, suffix=".wav")
+TIMINGS_SUFFIX = ".timings.json"
+CLI_PARALLEL = 4  # piper CLI processes at once when the resident service is unavailable
 
 def find_voice_model() -> Path:
     onnx_files = sorted(VOICE_DIR.glob("*.onnx"))
@@ -15,10 +37,8 @@ def find_voice_model() -> Path:
         )
     return onnx_files[0]
 
-def tts_to_wav(text: str, out_wav: Path, voice_model: str, speech_speed: float = 1.0) -> None:
-    """Generate TTS audio using specified voice model"""
-    out_wav.parent.mkdir(parents=True, exist_ok=True)
-    
+def resolve_voice_model(voice_model: str) -> Path:
+    """Find a voice model in the default or user voice folders"""
     # Check default voice folder first
     model_path = Path("assets/piper_voice") / voice_model
     
@@ -28,39 +48,221 @@ def tts_to_wav(text: str, out_wav: Path, voice_model: str, speech_speed: float =
     
     if not model_path.exists():
         raise FileNotFoundError(f"Voice model not found: {voice_model} (checked both assets/piper_voice and assets/user_voices)")
-    
+    return model_path
+
+def normalize_script(text: str) -> str:
+    """Whitespace-normalize a script, keeping one sentence per line"""
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+def split_sentences(text: str) -> List[str]:
+    """Script lines, further split wherever a sentence ends mid-line"""
+    sentences = []
+    for line in normalize_script(text).splitlines():
+        sentences += re.sub(r'([.!?])\s+([A-Z"\'])', r'\1\n\2', line).splitlines()
+    return sentences
+
+def sentence_cache_key(sentence: str, model_path: Path, speech_speed: float) -> str:
+    return make_key("tts-sentence-v1", sentence, file_digest(model_path), f"{speech_speed:.4f}")
+
+def timings_path(wav: Path) -> Path:
+    """Sidecar with each sentence's start/end in the assembled WAV"""
+    return wav.with_suffix(TIMINGS_SUFFIX)
+
+def _synthesize_sentences(todo: List[Tuple[str, Path]], model_path: Path, length_scale: float) -> None:
+    """Write each (sentence, wav) pair with no leading or trailing silence"""
+    if settings.PIPER_SERVICE_ENABLED and piper_service.ensure_running():
+        # Resident service: the voice stays loaded between sentences and shorts
+        try:
+            while todo:
+                sentence, wav = todo[0]
+                piper_service.synthesize(sentence, wav, model_path, length_scale, 0.0)
+                todo = todo[1:]
+            return
+        except piper_service.ServiceUnavailable as e:
+            print(f"⚠️  Piper service stopped answering ({e}); using the piper CLI")
+
+    # One CLI process per sentence, with the flags every piper CLI accepts (the C++
+    # binary and the piper-tts entry point differ on batch input), a few at a time
+    def run(item: Tuple[str, Path]) -> None:
+        sentence, wav = item
+        cmd = [
+            "piper",
+            "--model", str(model_path),
+            "--output_file", str(wav),
+            "--sentence_silence", "0",
+            "--length_scale", str(length_scale),
+        ]
+        result = subprocess.run(cmd, input=sentence.encode("utf-8"), check=True, capture_output=True)
+        if result.stderr:
+            stderr_text = result.stderr.decode('utf-8', errors='ignore')
+            print(f"  Piper stderr: {stderr_text[:200]}")
+
+    with ThreadPoolExecutor(max_workers=min(len(todo), CLI_PARALLEL)) as pool:
+        list(pool.map(run, todo))
+
+def assemble_pcm(parts: List[Path], sentence_silence: float) -> Dict[str, Any]:
+    """Concatenate sentence WAVs in memory with sentence_silence between them.
+
+    Returns the raw PCM with its format and each part's (start, end), counted in samples.
+    """
+    chunks: List[bytes] = []
+    spans: List[Tuple[float, float]] = []
+    params = None
+    frames_so_far = 0
+    for part in parts:
+        with wave.open(str(part), "rb") as w:
+            fmt = (w.getnchannels(), w.getsampwidth(), w.getframerate())
+            frames = w.readframes(w.getnframes())
+        if params is None:
+            params = fmt
+        elif fmt != params:
+            raise ValueError(f"Sentence audio format {fmt} differs from {params}: {part}")
+        else:
+            gap = int(sentence_silence * params[2])
+            chunks.append(b"\x00" * gap * params[0] * params[1])
+            frames_so_far += gap
+
+        length = len(frames) // (params[0] * params[1])
+        spans.append((frames_so_far / params[2], (frames_so_far + length) / params[2]))
+        chunks.append(frames)
+        frames_so_far += length
+    channels, sample_width, sample_rate = params
+    return {
+        "pcm": b"".join(chunks),
+        "channels": channels,
+        "sample_width": sample_width,
+        "sample_rate": sample_rate,
+        "duration": frames_so_far / sample_rate,
+        "spans": spans,
+    }
+
+def wav_bytes(audio: Dict[str, Any]) -> bytes:
+    """The assembled audio as a WAV file, byte-for-byte what tts_to_wav writes"""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(audio["channels"])
+        w.setsampwidth(audio["sample_width"])
+        w.setframerate(audio["sample_rate"])
+        w.writeframes(audio["pcm"])
+    return buf.getvalue()
+
+def synthesize_pcm(text: str, voice_model: str, speech_speed: float = 1.0,
+                   sentence_silence: float = settings.SENTENCE_SILENCE, label: str = "") -> Tuple[Dict[str, Any], bool]:
+    """TTS audio assembled in memory, one cached sentence at a time.
+
+    Only sentences missing from the audio cache go to Piper. Returns
+    (audio, cached): audio is assemble_pcm()'s dict plus "timings" (the
+    sidecar contents, see timings_path()) and "digest" (sha256 of its WAV,
+    so render cache keys match those of the same audio written to disk);
+    cached is True if no sentence needed Piper.
+    """
+    model_path = resolve_voice_model(voice_model)
+    sentences = split_sentences(text)
+    if not sentences:
+        raise ValueError(f"Empty script for {label or 'TTS'}")
+
     # length_scale is inversely related to speed
     length_scale = 1.0 / speech_speed
-    
-    cmd = [
-        "piper",
-        "--model", str(model_path),
-        "--output_file", str(out_wav),
-        "--sentence_silence", "0.3",
-        "--length_scale", str(length_scale),
-    ]
-    result = subprocess.run(cmd, input=text.encode("utf-8"), check=True, 
-                           capture_output=True)
-    
-    # Debug: print if there were any warnings
-    if result.stderr:
-        stderr_text = result.stderr.decode('utf-8', errors='ignore')
-        print(f"  Piper stderr for {out_wav.name}: {stderr_text[:200]}")
+
+    # Sentence parts are hard links into (and new ones are stored from) the cache, on its filesystem
+    AUDIO_CACHE.root.mkdir(parents=True, exist_ok=True)
+    scratch = Path(tempfile.mkdtemp(prefix=".sentences-", dir=AUDIO_CACHE.root))
+    try:
+        parts, todo = [], []
+        for i, sentence in enumerate(sentences):
+            part = scratch / f"{i:04d}.wav"
+            parts.append(part)
+            if not AUDIO_CACHE.fetch(sentence_cache_key(sentence, model_path, speech_speed), part):
+                todo.append((sentence, part))
+
+        if todo:
+            with metrics.timed(metrics.PIPER_SECONDS, voice=model_path.name):
+                _synthesize_sentences(todo, model_path, length_scale)
+            for sentence, part in todo:
+                AUDIO_CACHE.store(sentence_cache_key(sentence, model_path, speech_speed), part)
+            print(f"   🗣️  {label}: synthesized {len(todo)}/{len(sentences)} sentence(s)")
+
+        audio = assemble_pcm(parts, sentence_silence)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    audio["timings"] = {
+        "duration": round(audio["duration"], 3),
+        "sentences": [{"text": s, "start": round(a, 3), "end": round(b, 3)}
+                      for s, (a, b) in zip(sentences, audio.pop("spans"))],
+    }
+    audio["digest"] = hashlib.sha256(wav_bytes(audio)).hexdigest()
+    return audio, not todo
+
+def tts_to_wav(text: str, out_wav: Path, voice_model: str, speech_speed: float = 1.0,
+               sentence_silence: float = settings.SENTENCE_SILENCE) -> bool:
+    """Generate TTS audio using specified voice model, one cached sentence at a time.
+
+    The WAV is assembled by synthesize_pcm(), and each sentence's span is
+    written to the timings sidecar. Returns True if no sentence needed Piper.
+    """
+    out_wav.parent.mkdir(parents=True, exist_ok=True)
+    audio, cached = synthesize_pcm(text, voice_model, speech_speed, sentence_silence, label=out_wav.stem)
+
+    tmp = out_wav.with_name(f".{out_wav.name}.tmp")
+    tmp.write_bytes(wav_bytes(audio))
+    # Replace rather than write through: out_wav may be a hard link from an earlier run
+    tmp.replace(out_wav)
+
+    tmp = out_wav.with_name(f".{timings_path(out_wav).name}.tmp")
+    tmp.write_text(json.dumps(audio["timings"], ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(timings_path(out_wav))
+    return cached
+
+def format_cache_stats(name: str, hits: int, misses: int) -> str:
+    lookups = hits + misses
+    rate = 100.0 * hits / lookups if lookups else 0.0
+    return f"🗃️  {name} cache: {hits} hit(s), {misses} miss(es) ({rate:.0f}% hit rate)"
+
+def _short_voice(short: Dict[str, Any]) -> Tuple[str, str, float]:
+    """(script, voice model, speech speed) of a short, logging them"""
+    script = short["voice_script"].strip()
+    voice_model = short.get("voice_model") or find_voice_model().name  # Get voice from short or use first available
+    speech_speed = float(short.get("speech_speed", "1.0"))
+
+    # Debug: print script details
+    voice_display = voice_model.replace('.onnx', '')
+    print(f"📝 {short['id']}: {len(script)} chars, ~{len(script.split())} words, voice: {voice_display}, speed: {speech_speed}x")
+    return script, voice_model, speech_speed
+
+def synthesize_short(short: Dict[str, Any], out_dir: Path) -> Tuple[Path, bool]:
+    """Synthesize one short's voice_script into out_dir/<id>.wav; returns (path, cache_hit)"""
+    sid = short["id"]
+    script, voice_model, speech_speed = _short_voice(short)
+    out_wav = out_dir / f"{sid}.wav"
+
+    cached = tts_to_wav(script, out_wav=out_wav, voice_model=voice_model, speech_speed=speech_speed)
+    if cached:
+        print(f"♻️  {sid}: audio reused from cache")
+    return out_wav, cached
+
+def stream_short(short: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    """Synthesize one short's voice_script in memory (see synthesize_pcm); returns (audio, cache_hit)"""
+    script, voice_model, speech_speed = _short_voice(short)
+    audio, cached = synthesize_pcm(script, voice_model, speech_speed, label=short["id"])
+    if cached:
+        print(f"♻️  {short['id']}: audio reused from cache")
+    return audio, cached
 
 def main():
-    # Reads from temp directory
-    json_files = sorted(Path("data/temp").glob("shorts_*.json"), key=lambda p: p.stat().st_mtime)
-    if not json_files:
-        raise FileNotFoundError("No data/temp/shorts_*.json found. Run generate_scripts.py first.")
-    json_path = json_files[-1]
-    
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workspace", required=True, help="Run workspace containing shorts.json; audio goes to <workspace>/audio")
+    args = ap.parse_args()
+
+    workspace = Path(args.workspace)
+    json_path = workspace / "shorts.json"
     print(f"📂 Reading shorts from: {json_path}")
     
     with open(json_path, "r", encoding="utf-8") as f:
         payload: Dict[str, Any] = json.load(f)
 
-    date_str = payload.get("date", "unknown-date")
-    out_dir = Path("output") / date_str / "audio"
+    out_dir = workspace / "audio"
 
     # ADD THIS: Clean audio directory before generating new files
     if out_dir.exists():
@@ -73,31 +275,16 @@ def main():
     if not shorts:
         raise ValueError(f"No shorts found in {json_path}. Re-run generate_scripts.py and confirm it outputs shorts.")
 
+    hits = 0
     for s in shorts:
         sid = s["id"]
-        script = s["voice_script"].strip()
-        voice_model = s.get("voice_model", find_voice_model().name)  # Get voice from short or use first available
-        speech_speed = float(s.get("speech_speed", "1.0"))
-        out_wav = out_dir / f"{sid}.wav"
-        
-        # Debug: print script details
-        voice_display = voice_model.replace('.onnx', '')
-        print(f"📝 {sid}: {len(script)} chars, ~{len(script.split())} words, voice: {voice_display}, speed: {speech_speed}x")
-        
-        tts_to_wav(script, out_wav=out_wav, voice_model=voice_model, speech_speed=speech_speed)
-        
+        out_wav, cached = synthesize_short(s, out_dir)
+        hits += cached
+
         # Debug: check output file duration
-        probe = subprocess.run(
-            ["ffprobe", "-i", str(out_wav), "-show_entries", 
-             "format=duration", "-v", "quiet", "-of", "csv=p=0"],
-            capture_output=True, text=True
-        )
-        if probe.returncode == 0:
-            duration = float(probe.stdout.strip())
-            print(f"✅ {sid}: {out_wav} ({duration:.2f}s)")
-        else:
-            print(f"✅ {sid}: {out_wav}")
+        print(f"✅ {sid}: {out_wav} ({media_probe.duration(out_wav):.2f}s)")
 
+    print(format_cache_stats("Audio", hits, len(shorts) - hits))
     print(f"\nDone. Audio in: {out_dir}")
 
 if __name__ == "__main__":
@@ -0,0 +1,207 @@
+# bench/bench_pipeline.py
+"""
+Offline throughput benchmark for the whole pipeline.
+
+Builds a synthetic source in a scratch directory and runs
+make_snippets -> generate_scripts -> TTS -> captions -> render as
+separate processes, then the overlapped pipeline.py on the same shorts.
+Every step reports wall time, CPU time (user + sys, including child
+processes) and peak RSS. Results are written as JSON so runs can be
+compared across commits.
+
+By default piper, ffmpeg, ffprobe and Ollama are deterministic stubs
+(bench/stubs/) with configurable latency; --real uses the installed tools.
+
+    python bench/bench_pipeline.py --words 3000 --out bench_output.json
+    python bench/bench_pipeline.py --real --voice-model assets/piper_voice/x.onnx \
+        --background assets/backgrounds/ocean.mp4
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+STUBS_DIR = Path(__file__).resolve().parent / "stubs"
+
+if __package__ in (None, ""):
+    # Allow `python bench/bench_pipeline.py` to import project modules
+    sys.path.insert(0, str(ROOT))
+
+from config import settings
+from bench.stubs.ollama_server import serve
+
+VOCABULARY = (
+    "pipeline prospect discovery call objection pricing value proof follow-up "
+    "champion budget timeline decision process quota territory outreach referral "
+    "renewal expansion negotiation urgency clarity trust question listen summarize "
+    "commit next step calendar email short video founder consultant buyer"
+).split()
+
+
+def synthetic_source(words: int, seed: int) -> str:
+    """Deterministic prose: sentences of 8-16 words, paragraphs of 3-6 sentences"""
+    rng = random.Random(seed)
+    paragraphs, written = [], 0
+    while written < words:
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            n = rng.randint(8, 16)
+            sentences.append(" ".join(rng.choice(VOCABULARY) for _ in range(n)).capitalize() + ".")
+            written += n
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs) + "\n"
+
+
+def measure(name: str, cmd: List[str], cwd: Path, env: Dict[str, str]) -> Dict[str, Any]:
+    """Run cmd to completion; wall time plus the child's CPU time and peak RSS from wait4()"""
+    print(f"⏱️  {name}: {' '.join(cmd[1:3])}")
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = proc.stderr.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} failed ({proc.returncode}):\n{stderr.decode(errors='ignore')[-2000:]}")
+    return {
+        "wall_s": round(wall, 3),
+        "cpu_s": round(usage.ru_utime + usage.ru_stime, 3),
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),  # ru_maxrss is KiB on Linux
+    }
+
+
+def prepare_workdir(workdir: Path, args: argparse.Namespace) -> None:
+    (workdir / "data").mkdir(parents=True)
+    (workdir / "assets" / "backgrounds").mkdir(parents=True)
+    (workdir / "assets" / "piper_voice").mkdir(parents=True)
+    (workdir / "data" / "bench.txt").write_text(synthetic_source(args.words, args.seed), encoding="utf-8")
+
+    if args.real:
+        shutil.copy2(args.voice_model, workdir / "assets" / "piper_voice" / Path(args.voice_model).name)
+        json_config = Path(str(args.voice_model) + ".json")
+        if json_config.exists():
+            shutil.copy2(json_config, workdir / "assets" / "piper_voice" / json_config.name)
+        shutil.copy2(args.background, workdir / "assets" / "backgrounds" / "ocean.mp4")
+    else:
+        (workdir / "assets" / "piper_voice" / "bench.onnx").write_bytes(b"stub voice")
+        (workdir / "assets" / "backgrounds" / "ocean.mp4").write_bytes(b"stub video")
+
+
+def run_benchmark(args: argparse.Namespace, workdir: Path) -> Dict[str, Any]:
+    prepare_workdir(workdir, args)
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    server = None
+    if not args.real:
+        env["PATH"] = f"{STUBS_DIR}{os.pathsep}{env.get('PATH', '')}"
+        env["BENCH_PIPER_LATENCY"] = str(args.piper_latency)
+        env["BENCH_FFPROBE_LATENCY"] = str(args.ffprobe_latency)
+        env["BENCH_FFMPEG_SPEED"] = str(args.ffmpeg_speed)
+        server, env["OLLAMA_HOST"] = serve(args.ollama_latency)
+
+    py = sys.executable
+    snippets = workdir / "data" / "snippets_bench.json"
+    shorts = workdir / "data" / "shorts_bench.json"
+    workspace = workdir / "output" / "bench"
+    steps = [
+        ("make_snippets", [py, str(ROOT / "content_engine/make_snippets.py"), "--source", "bench.txt", "--out", str(snippets)]),
+        ("generate_scripts", [py, str(ROOT / "content_engine/generate_scripts.py"), "--snippets", str(snippets),
+                              "--out", str(shorts), "--max_shorts", str(args.max_shorts),
+                              "--concurrency", str(args.llm_concurrency)]),
+        ("tts", [py, str(ROOT / "audio_engine/tts.py"), "--workspace", str(workspace)]),
+        ("captions", [py, str(ROOT / "caption_engine/captions.py"), "--workspace", str(workspace)]),
+        ("render", [py, str(ROOT / "visual_engine/render_short.py"), "--workspace", str(workspace), "--force"]),
+    ]
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    try:
+        for name, cmd in steps:
+            if name == "tts":
+                # Stage CLIs read the shorts from their workspace
+                workspace.mkdir(parents=True)
+                shutil.copy2(shorts, workspace / "shorts.json")
+            stages[name] = measure(name, cmd, workdir, env)
+
+        # The same shorts through the overlapped in-process pipeline, with cold caches
+        shutil.rmtree(workdir / "cache", ignore_errors=True)
+        pipeline = measure("pipeline", [py, str(ROOT / "pipeline.py"), "--shorts", str(shorts)], workdir, env)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    n = len(json.loads(shorts.read_text(encoding="utf-8"))["shorts"])
+    sequential_media = sum(stages[s]["wall_s"] for s in ("tts", "captions", "render"))
+    pipeline["shorts_per_minute"] = round(60 * n / pipeline["wall_s"], 2) if pipeline["wall_s"] else None
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "backend": "real" if args.real else "stub",
+        "config": {
+            "words": args.words, "seed": args.seed, "max_shorts": args.max_shorts,
+            "llm_concurrency": args.llm_concurrency,
+            **({} if args.real else {
+                "piper_latency": args.piper_latency, "ffprobe_latency": args.ffprobe_latency,
+                "ffmpeg_speed": args.ffmpeg_speed, "ollama_latency": args.ollama_latency,
+            }),
+        },
+        "shorts": n,
+        "stages": stages,
+        "stages_total_wall_s": round(sum(s["wall_s"] for s in stages.values()), 3),
+        "stages_shorts_per_minute": round(60 * n / sequential_media, 2) if sequential_media else None,
+        "pipeline": pipeline,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the pipeline end to end")
+    ap.add_argument("--words", type=int, default=2000, help="Size of the synthetic source")
+    ap.add_argument("--seed", type=int, default=1, help="Seed for the synthetic source")
+    ap.add_argument("--max_shorts", type=int, default=9999, help="Cap on generated shorts")
+    ap.add_argument("--llm-concurrency", type=int, default=settings.LLM_CONCURRENCY,
+                    help="generate_scripts.py requests in flight at once")
+    ap.add_argument("--real", action="store_true", help="Use the installed piper/ffmpeg/ffprobe and Ollama")
+    ap.add_argument("--voice-model", default="", help="Piper .onnx voice (required with --real)")
+    ap.add_argument("--background", default="", help="Background video (required with --real)")
+    ap.add_argument("--piper-latency", type=float, default=0.5, help="Stub piper seconds per call")
+    ap.add_argument("--ffprobe-latency", type=float, default=0.05, help="Stub ffprobe seconds per call")
+    ap.add_argument("--ffmpeg-speed", type=float, default=4.0, help="Stub ffmpeg speed, x real time")
+    ap.add_argument("--ollama-latency", type=float, default=1.0, help="Stub Ollama seconds per request")
+    ap.add_argument("--workdir", default="", help="Scratch directory (default: a temp dir, removed afterwards)")
+    ap.add_argument("--out", default="", help="Write the JSON report here as well as to stdout")
+    args = ap.parse_args()
+
+    if args.real and not (args.voice_model and args.background):
+        ap.error("--real needs --voice-model and --background")
+
+    if args.workdir:
+        workdir = Path(args.workdir).resolve()
+        if workdir.exists():
+            ap.error(f"--workdir must not exist yet: {workdir}")
+        report = run_benchmark(args, workdir)
+    else:
+        with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+            report = run_benchmark(args, Path(tmp) / "work")
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
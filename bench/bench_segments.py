@@ -0,0 +1,153 @@
+# bench/bench_segments.py
+"""
+Single-process vs segment-parallel encode of one long short.
+
+Builds a scratch workspace with one silent voiceover of --duration seconds
+and evenly spaced captions, then renders it with render_one once as a
+single ffmpeg encode and once per --segment-seconds value, reporting wall
+time, CPU time of the ffmpeg children and the speedup over the single encode.
+
+By default ffmpeg/ffprobe are the bench/stubs, which only check the
+mechanics (a stub encode sleeps, so segments scale perfectly); use --real
+with a background video for meaningful numbers:
+
+    python bench/bench_segments.py --real --background assets/backgrounds/ocean.mp4 \
+        --duration 60 --segment-seconds 5 10 20
+"""
+import argparse
+import atexit
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+from typing import Any, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+STUBS_DIR = Path(__file__).resolve().parent / "stubs"
+
+if __package__ in (None, ""):
+    # Allow `python bench/bench_segments.py` to import project modules
+    sys.path.insert(0, str(ROOT))
+
+from bench.bench_pipeline import git_commit
+
+SID = "b1"
+SAMPLE_RATE = 22050
+CAPTION_SECONDS = 3.0
+
+
+def prepare_workspace(workdir: Path, args: argparse.Namespace) -> None:
+    from caption_engine.captions import render_ass
+
+    (workdir / "assets" / "backgrounds").mkdir(parents=True)
+    if args.real:
+        shutil.copy2(args.background, workdir / "assets" / "backgrounds" / "bench.mp4")
+    else:
+        (workdir / "assets" / "backgrounds" / "bench.mp4").write_bytes(b"stub video")
+
+    (workdir / "audio").mkdir()
+    with wave.open(str(workdir / "audio" / f"{SID}.wav"), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(b"\x00\x00" * int(args.duration * SAMPLE_RATE))
+
+    (workdir / "captions").mkdir()
+    cues, t, n = [], 0.0, 1
+    while t < args.duration:
+        cues.append((t, min(args.duration, t + CAPTION_SECONDS), f"Caption line {n}\nfor the benchmark"))
+        t, n = t + CAPTION_SECONDS, n + 1
+    (workdir / "captions" / f"{SID}.ass").write_text(render_ass(cues), encoding="utf-8")
+
+
+def timed_render(segment_seconds: float, threads: int) -> Dict[str, Any]:
+    from visual_engine.render_short import render_one
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    out = render_one(Path("."), SID, "bench.mp4", "bench", "bench", threads=threads, force=True,
+                     segment_seconds=segment_seconds)
+    wall = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return {"wall_s": round(wall, 3), "cpu_s": round(cpu, 3), "output": str(out)}
+
+
+def run_benchmark(args: argparse.Namespace, workdir: Path) -> Dict[str, Any]:
+    if not args.real:
+        os.environ["PATH"] = f"{STUBS_DIR}{os.pathsep}{os.environ.get('PATH', '')}"
+        os.environ["BENCH_FFMPEG_SPEED"] = str(args.ffmpeg_speed)
+        os.environ["BENCH_FFPROBE_LATENCY"] = "0"
+    workdir.mkdir(parents=True)
+    os.chdir(workdir)  # backgrounds, caches and probe store are relative to the working directory
+    from common import metrics
+    atexit.unregister(metrics.flush)  # no snapshot for a scratch dir that is gone by exit
+    prepare_workspace(workdir, args)
+
+    def best(segment_seconds: float) -> Dict[str, Any]:
+        runs = [timed_render(segment_seconds, args.threads) for _ in range(args.repeat)]
+        return min(runs, key=lambda r: r["wall_s"])
+
+    print(f"⏱️  single encode of {args.duration:g}s")
+    single = best(0)
+    segmented = {}
+    for seconds in args.segment_seconds:
+        print(f"⏱️  {seconds:g}s segments")
+        result = best(seconds)
+        result["speedup"] = round(single["wall_s"] / result["wall_s"], 2) if result["wall_s"] else None
+        segmented[f"{seconds:g}"] = result
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "backend": "real" if args.real else "stub",
+        "config": {"duration": args.duration, "threads": args.threads, "repeat": args.repeat,
+                   "cpus": len(os.sched_getaffinity(0)),
+                   **({} if args.real else {"ffmpeg_speed": args.ffmpeg_speed})},
+        "single": single,
+        "segmented": segmented,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark segment-parallel encoding of one short")
+    ap.add_argument("--duration", type=float, default=60.0, help="Voiceover length in seconds")
+    ap.add_argument("--segment-seconds", type=float, nargs="+", default=[5.0, 10.0, 20.0],
+                    help="Segment lengths to compare")
+    ap.add_argument("--threads", type=int, default=0, help="Thread budget per render (0 = all CPUs)")
+    ap.add_argument("--repeat", type=int, default=1, help="Runs per mode; the fastest is reported")
+    ap.add_argument("--real", action="store_true", help="Use the installed ffmpeg/ffprobe")
+    ap.add_argument("--background", default="", help="Background video (required with --real)")
+    ap.add_argument("--ffmpeg-speed", type=float, default=4.0, help="Stub ffmpeg speed, x real time")
+    ap.add_argument("--workdir", default="", help="Scratch directory (default: a temp dir, removed afterwards)")
+    ap.add_argument("--out", default="", help="Write the JSON report here as well as to stdout")
+    args = ap.parse_args()
+
+    if args.real and not args.background:
+        ap.error("--real needs --background")
+    if args.background:
+        args.background = str(Path(args.background).resolve())
+    out = Path(args.out).resolve() if args.out else None
+
+    if args.workdir:
+        workdir = Path(args.workdir).resolve()
+        if workdir.exists():
+            ap.error(f"--workdir must not exist yet: {workdir}")
+        report = run_benchmark(args, workdir)
+    else:
+        with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+            report = run_benchmark(args, Path(tmp) / "work")
+
+    text = json.dumps(report, indent=2)
+    if out:
+        out.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
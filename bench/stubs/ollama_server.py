@@ -0,0 +1,81 @@
+# bench/stubs/ollama_server.py
+"""
+Deterministic stand-in for the Ollama HTTP API (POST /api/chat only).
+
+Answers every prompt with one valid short built from the prompt's SOURCE
+MATERIAL, after a fixed delay, so generate_scripts.py can be benchmarked
+without a model. Point the ollama client at it with OLLAMA_HOST.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+WORDS_PER_SHORT = 120
+
+
+def fake_short(prompt: str) -> str:
+    match = re.search(r"SOURCE MATERIAL:\s*(.*?)\s*Constraints:", prompt, re.S)
+    words = (match.group(1) if match else prompt).split()[:WORDS_PER_SHORT]
+    script = " ".join(words).rstrip(".") + "."
+    return json.dumps({
+        "date": "2000-01-01",
+        "channel": "High-Performance Sales",
+        "shorts": [{
+            "id": "S001",
+            "hook": " ".join(words[:8]),
+            "voice_script": script,
+            "on_screen_text": [" ".join(words[:3]), " ".join(words[3:6])],
+            "visual_cues": ["highlight keyword", "fade in bullet list"],
+            "title": " ".join(words[:6]),
+            "description": " ".join(words[:20]),
+            "hashtags": ["#sales", "#b2b"],
+        }],
+    })
+
+
+def make_handler(latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/api/chat":
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            prompt = body["messages"][-1]["content"]
+            content = fake_short(prompt)
+            time.sleep(latency)
+
+            self.send_response(200)
+            if body.get("stream"):
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                step = max(1, len(content) // 20)
+                for i in range(0, len(content), step):
+                    chunk = {"model": body["model"], "created_at": "2000-01-01T00:00:00Z",
+                             "message": {"role": "assistant", "content": content[i:i + step]}, "done": False}
+                    self.wfile.write((json.dumps(chunk) + "\n").encode())
+                final = {"model": body["model"], "created_at": "2000-01-01T00:00:00Z",
+                         "message": {"role": "assistant", "content": ""}, "done": True}
+                self.wfile.write((json.dumps(final) + "\n").encode())
+                return
+
+            payload = json.dumps({"model": body["model"], "created_at": "2000-01-01T00:00:00Z",
+                                  "message": {"role": "assistant", "content": content}, "done": True}).encode()
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(latency: float = 1.0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stub on a free localhost port in a daemon thread; returns (server, url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -0,0 +1,134 @@
+# caption_engine/captions.py
+"""
+Single-pass caption engine: (script, audio timings, style) -> styled ASS.
+
+Cues are timed (make_srt.caption_spans), wrapped (rewrap_srt.rewrap) and
+written with the caption style baked into the ASS header, all in memory,
+so there is no SRT to re-read and rewrap and no force_style for libass to
+apply at render time. caption_batch() does a whole run's shorts in one call.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+if __package__ in (None, ""):
+    # Allow `python caption_engine/captions.py` to import project modules
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+from common import metrics
+from audio_engine.tts import normalize_script
+from caption_engine.make_srt import caption_spans
+from caption_engine.rewrap_srt import rewrap
+
+# Same script resolution ffmpeg gives converted SRTs, so the style renders identically
+PLAY_RES = (384, 288)
+
+Cue = Tuple[float, float, str]
+
+
+def _colour(value: str) -> str:
+    """force_style colour (&HBBGGRR&) to an ASS style colour (&HAABBGGRR)"""
+    return "&H" + value.strip("&H").rjust(8, "0").upper()
+
+
+def ass_header(style: Dict[str, str] = settings.CAPTION_STYLE) -> str:
+    fields = [
+        "Default", style["FontName"], style["FontSize"],
+        _colour(style["PrimaryColour"]), _colour(style["PrimaryColour"]),
+        _colour(style["OutlineColour"]), "&H00000000",
+        "0", "0", "0", "0", "100", "100", "0", "0",         # bold .. angle
+        "1", style["Outline"], "0", style["Alignment"],      # border style, outline, shadow, alignment
+        "10", "10", style["MarginV"], "0",                  # margins, encoding
+    ]
+    return "\n".join([
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {PLAY_RES[0]}",
+        f"PlayResY: {PLAY_RES[1]}",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        "Style: " + ",".join(fields),
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ])
+
+
+def ass_timestamp(seconds: float) -> str:
+    """H:MM:SS.cc"""
+    cs = int(round(seconds * 100))
+    return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+
+def ass_text(text: str) -> str:
+    # Braces would open override blocks and backslashes start tags
+    text = text.replace("\\", "⧵").replace("{", "(").replace("}", ")")
+    return text.replace("\n", "\\N")
+
+
+def build_cues(script: str, audio_file: Optional[Path],
+               timings: Optional[Dict[str, Any]] = None) -> Tuple[List[Cue], str]:
+    """One wrapped cue per script line, timed against the audio; also returns the timing method"""
+    lines = normalize_script(script).splitlines()
+    spans, method = caption_spans(lines, audio_file, timings)
+    # Captions drop the line's trailing period, as the SRT captions always have
+    with metrics.timed(metrics.REWRAP_SECONDS):
+        cues = [(start, end, rewrap(line.rstrip("."))) for line, (start, end) in zip(lines, spans)]
+    return cues, method
+
+
+def render_ass(cues: List[Cue], style: Dict[str, str] = settings.CAPTION_STYLE) -> str:
+    events = [f"Dialogue: 0,{ass_timestamp(start)},{ass_timestamp(end)},Default,,0,0,0,,{ass_text(text)}"
+              for start, end, text in cues]
+    return ass_header(style) + "\n" + "\n".join(events) + "\n"
+
+
+@metrics.timed(metrics.SRT_SECONDS)
+def caption_short(short: Dict[str, Any], audio_file: Optional[Path], captions_dir: Path,
+                  timings: Optional[Dict[str, Any]] = None) -> Path:
+    """Write <captions_dir>/<id>.ass for one short.
+
+    Streamed audio has no file: pass audio_file None and its in-memory TTS timings.
+    """
+    sid = short["id"]
+    if audio_file is not None and not audio_file.exists():
+        raise FileNotFoundError(f"Audio not found: {audio_file}")
+
+    cues, method = build_cues(short["voice_script"], audio_file, timings)
+    captions_dir.mkdir(parents=True, exist_ok=True)
+    out = captions_dir / f"{sid}.ass"
+    # Replace, never write through: the file may be hard-linked from a previous run's workspace
+    tmp = out.with_name(f".{out.name}.tmp")
+    tmp.write_text(render_ass(cues), encoding="utf-8")
+    tmp.replace(out)
+
+    duration = cues[-1][1] if cues else 0.0
+    print(f"✅ {sid}: {out} ({duration:.2f}s, {len(cues)} cues, {method})")
+    return out
+
+
+def caption_batch(shorts: List[Dict[str, Any]], audio_dir: Path, captions_dir: Path) -> Dict[str, Path]:
+    """Captions for a whole batch of shorts in one call; sid -> .ass path"""
+    return {s["id"]: caption_short(s, audio_dir / f"{s['id']}.wav", captions_dir) for s in shorts}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workspace", required=True, help="Run workspace containing shorts.json and audio/")
+    args = ap.parse_args()
+
+    workspace = Path(args.workspace)
+    payload = json.loads((workspace / "shorts.json").read_text(encoding="utf-8"))
+    captions = caption_batch(payload.get("shorts", []), workspace / "audio", workspace / "captions")
+    print(f"\nDone. {len(captions)} caption file(s) in: {workspace / 'captions'}")
+
+
+if __name__ == "__main__":
+    main()
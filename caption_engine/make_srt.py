@@ -1,60 +1,172 @@
 # caption_engine/make_srt.py
+"""
+One caption per script line, timed against the short's audio.
+
+With settings.CAPTION_TIMING = "audio", line boundaries come from the
+sentence spans the TTS engine recorded while assembling the WAV, or, when
+there is no timings sidecar, from a NumPy silence scan of the samples.
+"words" (and the fallback when neither works) spreads the duration across
+lines by word count.
+"""
+import argparse
 import json
-import subprocess
+import sys
+import wave
 from pathlib import Path
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+if __package__ in (None, ""):
+    # Allow `python caption_engine/make_srt.py` to import project modules
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+from common import media_probe, metrics
+from audio_engine.tts import normalize_script, split_sentences, timings_path
+
+FRAME_SECONDS = 0.01  # silence-scan resolution
+
+Span = Tuple[float, float]
 
 def get_audio_duration(audio_path: Path) -> float:
     """Get duration of audio file in seconds"""
-    probe = subprocess.run(
-        ["ffprobe", "-i", str(audio_path), "-show_entries", 
-         "format=duration", "-v", "quiet", "-of", "csv=p=0"],
-        capture_output=True, text=True, check=True
-    )
-    return float(probe.stdout.strip())
+    return media_probe.duration(audio_path)
 
-def create_srt_from_text(text: str, duration: float, out_srt: Path) -> None:
-    """Create SRT file from text using line breaks as caption boundaries, 
-    with timing based on word count per line"""
-    out_srt.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Split on line breaks - each line is a caption
-    lines = [line.strip() for line in text.split('\n') if line.strip()]
-    
-    # Remove periods from captions
-    lines = [line.rstrip('.') for line in lines]
-    
-    # Calculate word count for each line
+def spans_from_word_counts(lines: List[str], duration: float) -> List[Span]:
+    """Spread duration across lines by word count"""
     word_counts = [len(line.split()) for line in lines]
     total_words = sum(word_counts)
-    
     if total_words == 0:
-        return
-    
+        return []
+
     # Calculate time per word
     time_per_word = duration / total_words
-    
-    srt_content = []
-    current_time = 0.0
-    
-    for i, (line, word_count) in enumerate(zip(lines, word_counts), start=1):
-        start_time = current_time
-        line_duration = word_count * time_per_word
-        end_time = current_time + line_duration
+    spans, current_time = [], 0.0
+    for word_count in word_counts:
+        end_time = current_time + word_count * time_per_word
+        spans.append((current_time, end_time))
         current_time = end_time
-        
-        # Format timestamps
-        start_ts = format_timestamp(start_time)
-        end_ts = format_timestamp(end_time)
-        
-        # SRT format: index, timestamp, text, blank line
+    return spans
+
+def load_timings(audio_file: Path) -> Optional[Dict[str, Any]]:
+    """The TTS timings sidecar of audio_file, if there is one"""
+    path = timings_path(audio_file)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def spans_from_timings(lines: List[str], timings: Dict[str, Any]) -> Optional[List[Span]]:
+    """Line spans from the TTS sentence timings, if they match the script"""
+    sentences = timings["sentences"]
+
+    spans, i = [], 0
+    for line in lines:
+        parts = split_sentences(line)
+        chunk = sentences[i:i + len(parts)]
+        if [s["text"] for s in chunk] != parts:
+            return None  # audio was made from a different script
+        spans.append((chunk[0]["start"], chunk[-1]["end"]))
+        i += len(parts)
+    return spans if i == len(sentences) else None
+
+def detect_pauses(audio_file: Path) -> Optional[Tuple[np.ndarray, float, float, float]]:
+    """Centers of interior silences of at least CAPTION_MIN_PAUSE, plus speech start/end and duration.
+
+    Frame RMS over 10 ms windows; frames below CAPTION_SILENCE_RATIO of the
+    loudest frame count as silence. None for audio this can't scan.
+    """
+    with wave.open(str(audio_file), "rb") as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    if width != 2:
+        return None
+
+    samples = np.frombuffer(raw, dtype="<i2").astype(np.float32)
+    if channels > 1:
+        samples = samples[: len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+    hop = max(1, int(rate * FRAME_SECONDS))
+    n = len(samples) // hop
+    if n == 0:
+        return None
+
+    rms = np.sqrt(np.square(samples[: n * hop].reshape(n, hop)).mean(axis=1))
+    loud = rms >= max(float(rms.max()) * settings.CAPTION_SILENCE_RATIO, 1.0)
+    if not loud.any():
+        return None
+
+    # Runs of silent frames: starts at rising edges of ~loud, ends at falling edges
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], (~loud).astype(np.int8), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    speech_start = float(np.argmax(loud)) * FRAME_SECONDS
+    speech_end = float(n - np.argmax(loud[::-1])) * FRAME_SECONDS
+    interior = (starts > 0) & (ends < n) & ((ends - starts) * FRAME_SECONDS >= settings.CAPTION_MIN_PAUSE)
+    centers = (starts[interior] + ends[interior]) / 2 * FRAME_SECONDS
+    return centers, speech_start, speech_end, len(samples) / float(rate)
+
+def spans_from_pauses(lines: List[str], audio_file: Path) -> Optional[List[Span]]:
+    """Snap word-count line boundaries to the nearest detected pauses"""
+    scan = detect_pauses(audio_file)
+    if scan is None:
+        return None
+    pauses, speech_start, speech_end, duration = scan
+
+    estimate = spans_from_word_counts(lines, speech_end - speech_start)
+    tolerance = (speech_end - speech_start) / max(1, len(lines))  # about one line's length
+    boundaries, used = [], -1
+    for _, end in estimate[:-1]:
+        target = speech_start + end
+        candidates = np.arange(used + 1, len(pauses))
+        if len(candidates):
+            best = candidates[np.argmin(np.abs(pauses[candidates] - target))]
+            if abs(pauses[best] - target) <= tolerance:
+                used = int(best)
+                target = float(pauses[best])
+        boundaries.append(max(target, boundaries[-1] if boundaries else 0.0))
+
+    edges = [0.0, *boundaries, duration]
+    return list(zip(edges[:-1], edges[1:]))
+
+def caption_spans(lines: List[str], audio_file: Optional[Path],
+                  timings: Optional[Dict[str, Any]] = None) -> Tuple[List[Span], str]:
+    """(start, end) per caption line and the method that produced them.
+
+    Audio that was never written to disk (audio_file None) is timed from its
+    in-memory TTS timings alone.
+    """
+    duration = get_audio_duration(audio_file) if audio_file is not None else timings["duration"]
+    if settings.CAPTION_TIMING == "audio":
+        if timings is None:
+            timings = load_timings(audio_file)
+        spans = spans_from_timings(lines, timings) if timings else None
+        if spans is not None:
+            # Hold each caption through the pause after it; the last runs to the end
+            starts = [0.0] + [start for start, _ in spans[1:]]
+            return list(zip(starts, starts[1:] + [max(duration, spans[-1][1])])), "sentence timings"
+        spans = spans_from_pauses(lines, audio_file) if audio_file is not None else None
+        if spans is not None:
+            return spans, "silence scan"
+    return spans_from_word_counts(lines, duration), "word counts"
+
+def write_srt(lines: List[str], spans: List[Span], out_srt: Path) -> None:
+    out_srt.parent.mkdir(parents=True, exist_ok=True)
+    srt_content = []
+    for i, (line, (start_time, end_time)) in enumerate(zip(lines, spans), start=1):
+        # SRT format: index, timestamp, text (without its trailing period), blank line
         srt_content.append(f"{i}")
-        srt_content.append(f"{start_ts} --> {end_ts}")
-        srt_content.append(line)
+        srt_content.append(f"{format_timestamp(start_time)} --> {format_timestamp(end_time)}")
+        srt_content.append(line.rstrip('.'))
         srt_content.append("")  # blank line
-    
     out_srt.write_text('\n'.join(srt_content), encoding='utf-8')
 
+def create_srt_from_text(text: str, duration: float, out_srt: Path) -> None:
+    """Create SRT file from text using line breaks as caption boundaries, 
+    with timing based on word count per line"""
+    lines = normalize_script(text).splitlines()
+    spans = spans_from_word_counts(lines, duration)
+    if spans:
+        write_srt(lines, spans, out_srt)
+
 def format_timestamp(seconds: float) -> str:
     """Convert seconds to SRT timestamp format: HH:MM:SS,mmm"""
     hours = int(seconds // 3600)
@@ -64,39 +176,50 @@ def format_timestamp(seconds: float) -> str:
     
     return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
 
+@metrics.timed(metrics.SRT_SECONDS)
+def caption_short(short: dict, audio_file: Path, srt_dir: Path) -> Path:
+    """Create the SRT for one short, timed against its audio file"""
+    sid = short["id"]
+    script = short["voice_script"].strip()
+    srt_file = srt_dir / f"{sid}.srt"
+
+    if not audio_file.exists():
+        raise FileNotFoundError(f"Audio not found: {audio_file}")
+
+    # The file may be hard-linked from a previous run's workspace; replace it, don't write through it
+    srt_file.unlink(missing_ok=True)
+
+    # One caption per script line, timed against the audio
+    lines = normalize_script(script).splitlines()
+    spans, method = caption_spans(lines, audio_file)
+    if spans:
+        write_srt(lines, spans, srt_file)
+
+    duration = spans[-1][1] if spans else 0.0
+    print(f"✅ {sid}: {srt_file} ({duration:.2f}s, {len(script.split())} words, {method})")
+    return srt_file
+
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workspace", required=True, help="Run workspace containing shorts.json and audio/")
+    args = ap.parse_args()
+
     # Read shorts JSON to get the original scripts
-    json_files = sorted(Path("data/temp").glob("shorts_*.json"), key=lambda p: p.stat().st_mtime)
-    if not json_files:
-        raise FileNotFoundError("No data/temp/shorts_*.json found. Run generate_scripts.py first.")
-    json_path = json_files[-1]
-    
-    with open(json_path, "r", encoding="utf-8") as f:
+    workspace = Path(args.workspace)
+    with open(workspace / "shorts.json", "r", encoding="utf-8") as f:
         payload = json.load(f)
     
-    date_str = payload.get("date", "unknown-date")
-    audio_dir = Path("output") / date_str / "audio"
-    srt_dir = Path("output") / date_str / "captions"
+    audio_dir = workspace / "audio"
+    srt_dir = workspace / "captions"
     srt_dir.mkdir(parents=True, exist_ok=True)
     
     for short in payload.get("shorts", []):
-        sid = short["id"]
-        script = short["voice_script"].strip()
-        
-        audio_file = audio_dir / f"{sid}.wav"
-        srt_file = srt_dir / f"{sid}.srt"
-        
+        audio_file = audio_dir / f"{short['id']}.wav"
         if not audio_file.exists():
             print(f"⚠️  Audio not found: {audio_file}")
             continue
-        
-        # Get audio duration
-        duration = get_audio_duration(audio_file)
-        
-        # Create SRT from original script text
-        create_srt_from_text(script, duration, srt_file)
-        
-        print(f"✅ {sid}: {srt_file} ({duration:.2f}s, {len(script.split())} words)")
+
+        caption_short(short, audio_file, srt_dir)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
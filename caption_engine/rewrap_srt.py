@@ -1,7 +1,15 @@
+import argparse
+import sys
 from pathlib import Path
 import re
 import textwrap
 
+if __package__ in (None, ""):
+    # Allow `python caption_engine/rewrap_srt.py` to import project modules
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from common import metrics
+
 MAX_CHARS = 24   # For 52pt font with margins - keeps 2-3 words per line max
 
 def rewrap(text: str) -> str:
@@ -12,6 +20,7 @@ def rewrap(text: str) -> str:
     lines = textwrap.wrap(text, width=MAX_CHARS, break_long_words=False, break_on_hyphens=False)
     return "\n".join(lines)
 
+@metrics.timed(metrics.REWRAP_SECONDS)
 def rewrap_srt(path: Path) -> None:
     raw = path.read_text(encoding="utf-8").strip()
     blocks = raw.split("\n\n")
@@ -31,8 +40,11 @@ def rewrap_srt(path: Path) -> None:
     path.write_text("\n\n".join(out_blocks) + "\n", encoding="utf-8")
 
 def main():
-    day_dir = sorted(Path("output").glob("20??-??-??"))[-1]
-    cap_dir = day_dir / "captions"
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workspace", required=True, help="Run workspace whose captions/ should be rewrapped")
+    args = ap.parse_args()
+
+    cap_dir = Path(args.workspace) / "captions"
     for srt in sorted(cap_dir.glob("*.srt")):
         rewrap_srt(srt)
         print("✅ Rewrapped:", srt)
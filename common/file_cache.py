@@ -0,0 +1,157 @@
+# common/file_cache.py
+"""
+Content-addressed file cache shared by the pipeline stages.
+
+Entries live at <root>/<key[:2]>/<key><suffix>. A hit is hard-linked (or
+copied, across filesystems) to the destination, and its mtime is bumped so
+eviction can drop the least recently used entries first. Eviction scans the
+whole cache, so stores only trigger it when a running size estimate goes
+over the bound, or every RESCAN_SECONDS to pick up other processes' entries;
+once over, it evicts down to EVICT_TO of the bound so a full cache isn't
+rescanned on every store.
+"""
+import hashlib
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+RESCAN_SECONDS = 60.0
+EVICT_TO = 0.9
+
+_digest_memo: Dict[Tuple[str, int, int], str] = {}
+_digest_lock = threading.Lock()
+
+
+def file_digest(path: Path) -> str:
+    """sha256 of a file's contents, memoized by (path, size, mtime)"""
+    st = path.stat()
+    memo_key = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+    with _digest_lock:
+        if memo_key in _digest_memo:
+            return _digest_memo[memo_key]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    with _digest_lock:
+        _digest_memo[memo_key] = digest
+    return digest
+
+
+def make_key(*parts: Any) -> str:
+    """Stable sha256 key from a sequence of str()-able parts"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def link_or_copy(src: Path, dest: Path) -> None:
+    """Hard-link src to dest, falling back to a copy; dest is replaced, never written through"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.exists() and os.path.samefile(src, dest):
+        return  # already the same file; rename() would be a no-op and leave tmp behind
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+
+
+class FileCache:
+    def __init__(self, root: Path, max_bytes: int, max_age: Optional[float] = None, suffix: str = ""):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # bytes as of the last scan plus stores since; None until scanned
+        self._scanned = 0.0
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}{self.suffix}"
+
+    def fetch(self, key: str, dest: Path) -> bool:
+        """Materialize a cached entry at dest; returns False on a miss"""
+        entry = self.path_for(key)
+        try:
+            if self.max_age is not None and time.time() - entry.stat().st_mtime > self.max_age:
+                entry.unlink()
+                raise FileNotFoundError(entry)
+            link_or_copy(entry, dest)
+            os.utime(entry)  # mark as recently used
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key: str, src: Path) -> None:
+        """Add src to the cache under key, then evict down to the size bound if it may be exceeded"""
+        entry = self.path_for(key)
+        existed = entry.exists()
+        link_or_copy(src, entry)
+        with self._lock:
+            if self._size is not None and not existed:
+                self._size += entry.stat().st_size
+            due = (self._size is None or self._size > self.max_bytes
+                   or time.monotonic() - self._scanned > RESCAN_SECONDS)
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then (if over max_bytes) least recently used ones down to EVICT_TO of it"""
+        now = time.time()
+        entries = []
+        for p in self.root.glob(f"*/*{self.suffix}"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+
+        removed = 0
+        total = 0
+        kept = []
+        for mtime, size, p in entries:
+            if self.max_age is not None and now - mtime > self.max_age:
+                p.unlink(missing_ok=True)
+                removed += 1
+            else:
+                kept.append((mtime, size, p))
+                total += size
+
+        target = self.max_bytes * EVICT_TO if total > self.max_bytes else self.max_bytes
+        for mtime, size, p in sorted(kept):
+            if total <= target:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._size = total
+            self._scanned = time.monotonic()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,164 @@
+# common/job_store.py
+"""
+SQLite store of pipeline runs and their progress events.
+
+Every /process call gets a row here plus its own workspace directory, so
+concurrent requests (and several gunicorn workers) never share files. The
+database uses WAL mode and a fresh connection per call, which makes it safe
+to use from any thread or process on the same machine.
+"""
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,              -- queued | running | finished | failed
+    source_file TEXT NOT NULL DEFAULT '',
+    workspace   TEXT NOT NULL,
+    parent_id   TEXT,                       -- run whose outputs seeded this workspace
+    total       INTEGER NOT NULL DEFAULT 0,
+    done        INTEGER NOT NULL DEFAULT 0,
+    failed      INTEGER NOT NULL DEFAULT 0,
+    error       TEXT NOT NULL DEFAULT '',
+    results     TEXT NOT NULL DEFAULT '[]', -- JSON list of per-short results
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created_at);
+CREATE TABLE IF NOT EXISTS events (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id      TEXT NOT NULL,
+    short_id    TEXT NOT NULL DEFAULT '',
+    stage       TEXT NOT NULL,              -- queued | tts | captions | rendering | progress | done | failed
+    data        TEXT NOT NULL DEFAULT '{}', -- JSON extras (render fps/speed/eta, error, video)
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_run ON events (run_id, id);
+CREATE INDEX IF NOT EXISTS events_created ON events (created_at);
+"""
+
+UPDATABLE = {"status", "total", "done", "failed", "error", "results"}
+
+
+def _connect() -> sqlite3.Connection:
+    path = Path(settings.JOB_STORE_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _row_to_run(row: sqlite3.Row) -> Dict[str, Any]:
+    run = dict(row)
+    run["results"] = json.loads(run["results"] or "[]")
+    return run
+
+
+def create_run(source_file: str, total: int, parent_id: Optional[str] = None) -> Dict[str, Any]:
+    """Insert a new queued run with its own workspace path; returns the row.
+
+    Also prunes old progress events (see prune_events).
+    """
+    prune_events()
+    run_id = uuid.uuid4().hex[:12]
+    workspace = Path(settings.RUNS_DIR) / run_id
+    now = time.time()
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "INSERT INTO runs (id, status, source_file, workspace, parent_id, total, created_at, updated_at)"
+            " VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+            (run_id, source_file, str(workspace), parent_id, total, now, now),
+        )
+    return get_run(run_id)
+
+
+def update_run(run_id: str, **fields: Any) -> None:
+    unknown = set(fields) - UPDATABLE
+    if unknown:
+        raise ValueError(f"Cannot update run fields: {sorted(unknown)}")
+    if "results" in fields:
+        fields["results"] = json.dumps(fields["results"], ensure_ascii=False)
+    fields["updated_at"] = time.time()
+
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    with closing(_connect()) as conn, conn:
+        conn.execute(f"UPDATE runs SET {columns} WHERE id = ?", (*fields.values(), run_id))
+
+
+def get_run(run_id: str) -> Optional[Dict[str, Any]]:
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+    return _row_to_run(row) if row else None
+
+
+def list_runs(limit: int = 20, status: Optional[str] = None, source_file: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Most recent runs first, optionally filtered by status and source file (limit -1 = all)"""
+    query, args, where = "SELECT * FROM runs", [], []
+    if status:
+        where.append("status = ?")
+        args.append(status)
+    if source_file is not None:
+        where.append("source_file = ?")
+        args.append(source_file)
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY created_at DESC LIMIT ?"
+    args.append(limit)
+    with closing(_connect()) as conn:
+        rows = conn.execute(query, args).fetchall()
+    return [_row_to_run(r) for r in rows]
+
+
+def delete_run(run_id: str) -> None:
+    """Remove a run's row and its events (its workspace is the caller's to delete)"""
+    with closing(_connect()) as conn, conn:
+        conn.execute("DELETE FROM events WHERE run_id = ?", (run_id,))
+        conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+
+def add_event(run_id: str, short_id: str, stage: str, **data: Any) -> None:
+    """Append a per-short progress event; any process may write them"""
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "INSERT INTO events (run_id, short_id, stage, data, created_at) VALUES (?, ?, ?, ?, ?)",
+            (run_id, short_id, stage, json.dumps(data, ensure_ascii=False), time.time()),
+        )
+
+
+def list_events(run_id: str, after: int = 0) -> List[Dict[str, Any]]:
+    """Events of a run with id > after, oldest first"""
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            "SELECT * FROM events WHERE run_id = ? AND id > ? ORDER BY id", (run_id, after)
+        ).fetchall()
+    events = []
+    for row in rows:
+        event = dict(row)
+        event["data"] = json.loads(event["data"] or "{}")
+        events.append(event)
+    return events
+
+
+def prune_events() -> int:
+    """Delete events of runs that ended over EVENTS_RETENTION seconds ago, and any older than EVENTS_MAX_AGE.
+
+    A rendering short adds about one progress event per second, and only
+    /runs/<id>/events (including its reconnects) ever reads them.
+    """
+    now = time.time()
+    with closing(_connect()) as conn, conn:
+        return conn.execute(
+            "DELETE FROM events WHERE created_at < ? OR run_id IN ("
+            " SELECT id FROM runs WHERE status IN ('finished', 'failed') AND updated_at < ?)",
+            (now - settings.EVENTS_MAX_AGE, now - settings.EVENTS_RETENTION),
+        ).rowcount
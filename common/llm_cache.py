@@ -0,0 +1,192 @@
+# common/llm_cache.py
+"""
+Persistent cache of LLM responses, shared by every process.
+
+Script generation (Ollama) and the editor's AI enhance (OpenAI, Claude,
+Perplexity, Grok) send the same prompts again whenever a user re-runs them
+on unchanged blocks. Responses are kept in SQLite (settings.LLM_CACHE_DB),
+keyed by provider, model, system prompt, user prompt, temperature and max
+tokens. Entries expire after settings.LLM_CACHE_TTL_DAYS, and the least
+recently used ones are evicted past settings.LLM_CACHE_MAX_BYTES.
+
+    text = llm_cache.cached_call("openai", "gpt-4", system_prompt, user_prompt, 0.7, 500,
+                                 call=lambda: ..., bypass=regenerate)
+
+    python common/llm_cache.py              # entries, size and hit rate
+    python common/llm_cache.py --clear
+"""
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+if __package__ in (None, ""):
+    # Allow `python common/llm_cache.py` to import project modules
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+from common import metrics
+from common.file_cache import make_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key        TEXT PRIMARY KEY,
+    provider   TEXT NOT NULL,
+    model      TEXT NOT NULL,
+    response   TEXT NOT NULL,
+    size       INTEGER NOT NULL,     -- bytes of response, for size-based eviction
+    created_at REAL NOT NULL,        -- TTL runs from here
+    used_at    REAL NOT NULL         -- last hit, for LRU eviction
+);
+CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at);
+
+CREATE TABLE IF NOT EXISTS lookups (
+    provider TEXT PRIMARY KEY,
+    hits     INTEGER NOT NULL DEFAULT 0,
+    misses   INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_lock = threading.Lock()  # serializes this process's evictions
+_session = {"hits": 0, "misses": 0}  # this process's lookups
+
+
+def _connect() -> sqlite3.Connection:
+    path = Path(settings.LLM_CACHE_DB)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def cache_key(provider: str, model: str, system_prompt: str, user_prompt: str,
+              temperature: Optional[float], max_tokens: Optional[int]) -> str:
+    return make_key("llm-v1", provider, model, system_prompt, user_prompt, temperature, max_tokens)
+
+
+def _count(conn: sqlite3.Connection, provider: str, result: str) -> None:
+    metrics.LLM_CACHE_LOOKUPS.inc(provider=provider, result=result)
+    column = {"hit": "hits", "miss": "misses"}[result]
+    with _lock:
+        _session[column] += 1
+    conn.execute(f"INSERT INTO lookups (provider, {column}) VALUES (?, 1) "
+                 f"ON CONFLICT(provider) DO UPDATE SET {column} = {column} + 1", (provider,))
+
+
+def get(key: str, provider: str) -> Optional[str]:
+    """The cached response for key, or None if missing or expired"""
+    now = time.time()
+    with closing(_connect()) as conn, conn:
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row and now - row[1] > settings.LLM_CACHE_TTL_DAYS * 24 * 3600:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            row = None
+        if row:
+            conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        _count(conn, provider, "hit" if row else "miss")
+    return row[0] if row else None
+
+
+def put(key: str, provider: str, model: str, response: str) -> None:
+    """Store a response, then evict down to the size bound"""
+    now = time.time()
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, provider, model, response, size, created_at, used_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, provider, model, response, len(response.encode("utf-8")), now, now),
+        )
+    evict()
+
+
+def evict() -> int:
+    """Drop expired entries, then least recently used ones until under LLM_CACHE_MAX_BYTES"""
+    cutoff = time.time() - settings.LLM_CACHE_TTL_DAYS * 24 * 3600
+    with _lock, closing(_connect()) as conn, conn:
+        removed = conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > settings.LLM_CACHE_MAX_BYTES:
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY used_at").fetchall():
+                if total <= settings.LLM_CACHE_MAX_BYTES:
+                    break
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+    return removed
+
+
+def cached_call(provider: str, model: str, system_prompt: str, user_prompt: str,
+                temperature: Optional[float], max_tokens: Optional[int], call: Callable[[], str],
+                bypass: bool = False, validate: Optional[Callable[[str], Any]] = None) -> str:
+    """call()'s response for this request, from the cache when possible.
+
+    bypass ("regenerate") skips the lookup but still stores the fresh response.
+    validate, if given, is run on a fresh response first; if it raises, the
+    response is not cached and the exception propagates.
+    """
+    key = cache_key(provider, model, system_prompt, user_prompt, temperature, max_tokens)
+    if bypass:
+        metrics.LLM_CACHE_LOOKUPS.inc(provider=provider, result="bypass")
+    else:
+        cached = get(key, provider)
+        if cached is not None:
+            return cached
+
+    response = call()
+    if validate is not None:
+        validate(response)
+    put(key, provider, model, response)
+    return response
+
+
+def stats() -> Dict[str, Any]:
+    """Entries, bytes and hit rate (all processes, since the last clear), overall and per provider"""
+    with closing(_connect()) as conn:
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        providers = {}
+        for provider, hits, misses in conn.execute("SELECT provider, hits, misses FROM lookups ORDER BY provider"):
+            providers[provider] = {"hits": hits, "misses": misses,
+                                   "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0}
+    hits = sum(p["hits"] for p in providers.values())
+    misses = sum(p["misses"] for p in providers.values())
+    return {
+        "entries": entries,
+        "bytes": size,
+        "max_bytes": settings.LLM_CACHE_MAX_BYTES,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        "providers": providers,
+        "process": dict(_session),
+    }
+
+
+def clear() -> None:
+    with closing(_connect()) as conn, conn:
+        conn.execute("DELETE FROM responses")
+        conn.execute("DELETE FROM lookups")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect or clear the LLM response cache")
+    ap.add_argument("--clear", action="store_true", help="Remove every cached response and reset the counters")
+    args = ap.parse_args()
+
+    if args.clear:
+        clear()
+        print(f"🗑️  Cleared: {settings.LLM_CACHE_DB}")
+    s = stats()
+    print(f"🗃️  LLM cache: {s['entries']} response(s), {s['bytes'] / 1024:.0f} KiB of "
+          f"{s['max_bytes'] / 1024 ** 2:.0f} MiB; {s['hits']} hit(s), {s['misses']} miss(es) "
+          f"({100 * s['hit_rate']:.0f}% hit rate)")
+    for provider, p in s["providers"].items():
+        print(f"   {provider:<12} {p['hits']} hit(s), {p['misses']} miss(es) ({100 * p['hit_rate']:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# common/media_probe.py
+"""
+Media metadata for every stage, without repeated ffprobe subprocesses.
+
+WAV files are read straight from their RIFF header. Anything else is
+ffprobed once; the result (duration, resolution, fps, codec, keyframes) is
+kept in a small SQLite store keyed by path and validated against the file's
+size and mtime, so it survives restarts and is shared between processes.
+"""
+import json
+import sqlite3
+import statistics
+import subprocess
+import threading
+import wave
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from config import settings
+from common import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    data     TEXT NOT NULL
+);
+"""
+
+_memo: Dict[Tuple[str, int, int], Dict[str, Any]] = {}
+_memo_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    path = Path(settings.MEDIA_PROBE_DB)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def probe_wav(path: Path) -> Dict[str, Any]:
+    with wave.open(str(path), "rb") as w:
+        rate = w.getframerate()
+        return {
+            "duration": w.getnframes() / float(rate),
+            "sample_rate": rate,
+            "channels": w.getnchannels(),
+            "codec": f"pcm_s{8 * w.getsampwidth()}le",
+        }
+
+
+def _ffprobe(args: List[str]) -> str:
+    with metrics.timed(metrics.FFPROBE_SECONDS):
+        return subprocess.run(["ffprobe", "-v", "error", *args], capture_output=True, text=True, check=True).stdout
+
+
+def _fps(rate: str) -> float:
+    num, _, den = (rate or "0/1").partition("/")
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def probe_ffprobe(path: Path) -> Dict[str, Any]:
+    """One ffprobe for format/streams, one packet scan (no decoding) for keyframe times"""
+    info = json.loads(_ffprobe(["-print_format", "json", "-show_format", "-show_streams", str(path)]))
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    data: Dict[str, Any] = {"duration": float(info.get("format", {}).get("duration") or 0.0)}
+    if audio:
+        data.update(sample_rate=int(audio.get("sample_rate") or 0), channels=audio.get("channels", 0),
+                    audio_codec=audio.get("codec_name", ""))
+    if video:
+        data.update(width=video.get("width", 0), height=video.get("height", 0),
+                    fps=round(_fps(video.get("avg_frame_rate") or video.get("r_frame_rate")), 3),
+                    codec=video.get("codec_name", ""))
+        packets = _ffprobe(["-select_streams", "v:0", "-show_entries", "packet=pts_time,flags",
+                            "-of", "csv=p=0", str(path)])
+        keyframes = []
+        for row in packets.splitlines():
+            pts, _, flags = row.partition(",")
+            if "K" in flags and pts not in ("", "N/A"):
+                keyframes.append(round(float(pts), 3))
+        keyframes.sort()
+        data["keyframes"] = keyframes
+        gaps = [b - a for a, b in zip(keyframes, keyframes[1:])]
+        data["keyframe_interval"] = round(statistics.median(gaps), 3) if gaps else None
+    elif audio:
+        data["codec"] = audio.get("codec_name", "")
+    return data
+
+
+def probe(path: Path) -> Dict[str, Any]:
+    """Metadata for a media file; WAVs in-process, everything else via the probe cache"""
+    path = Path(path)
+    try:
+        return probe_wav(path)  # a header read; cheaper than any cache lookup
+    except (wave.Error, EOFError):
+        pass
+
+    st = path.stat()
+    memo_key = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+    with _memo_lock:
+        if memo_key in _memo:
+            return _memo[memo_key]
+    data = _cached_ffprobe(*memo_key)
+    with _memo_lock:
+        _memo[memo_key] = data
+    return data
+
+
+def _cached_ffprobe(resolved: str, size: int, mtime_ns: int) -> Dict[str, Any]:
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT size, mtime_ns, data FROM probes WHERE path = ?", (resolved,)).fetchone()
+    if row and row[0] == size and row[1] == mtime_ns:
+        return json.loads(row[2])
+
+    data = probe_ffprobe(Path(resolved))
+    with closing(_connect()) as conn, conn:
+        conn.execute("INSERT OR REPLACE INTO probes (path, size, mtime_ns, data) VALUES (?, ?, ?, ?)",
+                     (resolved, size, mtime_ns, json.dumps(data)))
+    return data
+
+
+def duration(path: Path) -> float:
+    """Length in seconds"""
+    return probe(path)["duration"]
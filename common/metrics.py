@@ -0,0 +1,273 @@
+# common/metrics.py
+"""
+In-process Prometheus-style metrics: counters and latency histograms.
+
+Recording is a dict update under a lock. Each process (gunicorn workers, rq
+workers and their per-job work horses, the generate_scripts.py subprocess)
+periodically writes a snapshot to settings.METRICS_DIR, and /metrics merges
+those snapshots with the live values of the serving process, so the numbers
+cover the whole machine. Snapshots of processes that have exited are folded
+into one <host>.merged.json so the directory doesn't grow with every restart.
+
+    with metrics.timed(metrics.PIPER_SECONDS, voice="en_US-amy.onnx"):
+        subprocess.run(...)
+"""
+import atexit
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from config import settings
+
+PREFIX = "facelessvideos_"
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_registry: Dict[str, "_Metric"] = {}
+_lock = threading.Lock()
+_last_flush = [0.0]
+_snapshot = {"pid": 0, "path": Path()}  # this process's snapshot file, named on first use
+
+
+def _snapshot_path() -> Path:
+    if _snapshot["pid"] != os.getpid():
+        _snapshot["pid"] = os.getpid()
+        _snapshot["path"] = Path(settings.METRICS_DIR) / f"{socket.gethostname()}-{os.getpid()}-{int(time.time())}.json"
+    return _snapshot["path"]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], Any] = {}
+        _registry[self.name] = self
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+        _maybe_flush()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with _lock:
+            # [per-bucket counts (non-cumulative, last one is +Inf), sum, count]
+            entry = self.values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            i = next((i for i, b in enumerate(self.buckets) if value <= b), len(self.buckets))
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+        _maybe_flush()
+
+
+# --- Pipeline metrics ---
+
+PIPER_SECONDS = Histogram("piper_synthesis_seconds", "Piper TTS synthesis time per call (one script's uncached sentences)", ["voice"])
+FFPROBE_SECONDS = Histogram("ffprobe_seconds", "ffprobe duration lookups", buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+SRT_SECONDS = Histogram("srt_generation_seconds", "Caption (SRT or ASS) generation per short")
+REWRAP_SECONDS = Histogram("srt_rewrap_seconds", "Caption line wrapping per short (captions.build_cues, or rewrap_srt for SRTs)", buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1))
+ENCODE_SECONDS = Histogram("ffmpeg_encode_seconds", "ffmpeg encode time per short (render cache misses)", ["background"])
+LLM_SECONDS = Histogram("llm_request_seconds", "LLM request latency", ["provider", "model"])
+LLM_CACHE_LOOKUPS = Counter("llm_cache_lookups_total", "LLM response cache lookups (hit, miss or bypass)", ["provider", "result"])
+FAILURES = Counter("operation_failures_total", "Timed operations that raised", ["operation"])
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels: Any) -> Iterator[None]:
+    """Observe the block's wall time in histogram; count it in FAILURES if it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        FAILURES.inc(operation=histogram.name[len(PREFIX):])
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+
+
+# --- Snapshots and exposition ---
+
+def snapshot() -> Dict[str, Any]:
+    """JSON-able copy of every metric's current values in this process"""
+    with _lock:
+        return {
+            m.name: {"values": [[list(k), v if m.kind == "counter" else [list(v[0]), v[1], v[2]]]
+                                for k, v in m.values.items()]}
+            for m in _registry.values()
+        }
+
+
+def flush() -> None:
+    """Write this process's snapshot for other processes' /metrics to merge"""
+    _last_flush[0] = time.monotonic()
+    if not any(m.values for m in _registry.values()):
+        return  # nothing recorded; don't leave an empty file behind
+    try:
+        path = _snapshot_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(snapshot()), encoding="utf-8")
+        tmp.replace(path)
+    except OSError as e:
+        print(f"⚠️  Could not write metrics snapshot: {e}")
+
+
+def _maybe_flush() -> None:
+    if time.monotonic() - _last_flush[0] >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def _after_fork() -> None:
+    """A forked child (e.g. an rq work horse) starts from zero with a snapshot file of its own.
+
+    Otherwise it would re-report the parent's values, and overwrite the parent's file with them.
+    """
+    global _lock
+    _lock = threading.Lock()
+    for metric in _registry.values():
+        metric.values = {}
+    _last_flush[0] = time.monotonic()
+
+
+atexit.register(flush)  # work horses leave through os._exit, so jobs call flush() themselves
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def compact() -> int:
+    """Fold snapshots of this host's exited processes into <host>.merged.json; returns how many"""
+    metrics_dir = Path(settings.METRICS_DIR)
+    if not metrics_dir.is_dir():
+        return 0
+    host = socket.gethostname()
+    archive = metrics_dir / f"{host}.merged.json"
+    with open(metrics_dir / ".compact.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        stale = []
+        for path in metrics_dir.glob(f"{host}-*.json"):
+            parts = path.stem.rsplit("-", 2)  # <host>-<pid>-<started>
+            if len(parts) == 3 and parts[0] == host and parts[1].isdigit() and not _pid_alive(int(parts[1])):
+                stale.append(path)
+        if not stale:
+            return 0
+
+        snapshots = []
+        for path in [archive, *stale]:
+            try:
+                snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue  # no archive yet
+        merged = _combine(snapshots)
+        tmp = archive.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            name: {"values": [[list(k), v] for k, v in values.items()]} for name, values in merged.items()
+        }), encoding="utf-8")
+        tmp.replace(archive)
+        for path in stale:
+            path.unlink(missing_ok=True)
+    return len(stale)
+
+
+def _merged() -> Dict[str, Dict[Tuple[str, ...], Any]]:
+    try:
+        compact()
+    except OSError as e:
+        print(f"⚠️  Could not compact metrics snapshots: {e}")
+    snapshots = [snapshot()]
+    for path in Path(settings.METRICS_DIR).glob("*.json"):
+        if path == _snapshot_path():
+            continue  # this process: live values above are newer
+        try:
+            snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue  # being replaced right now
+    return _combine(snapshots)
+
+
+def _combine(snapshots: List[Dict[str, Any]]) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+    merged: Dict[str, Dict[Tuple[str, ...], Any]] = {name: {} for name in _registry}
+    for snap in snapshots:
+        for name, data in snap.items():
+            metric = _registry.get(name)
+            if metric is None:
+                continue
+            values = merged[name]
+            for key, value in data["values"]:
+                key = tuple(key)
+                if metric.kind == "counter":
+                    values[key] = values.get(key, 0.0) + value
+                else:
+                    entry = values.setdefault(key, [[0] * (len(metric.buckets) + 1), 0.0, 0])
+                    entry[0] = [a + b for a, b in zip(entry[0], value[0])]
+                    entry[1] += value[1]
+                    entry[2] += value[2]
+    return merged
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render() -> str:
+    """All metrics, merged across processes, in the Prometheus text format"""
+    lines: List[str] = []
+    for name, values in _merged().items():
+        metric = _registry[name]
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(values.items()):
+            if metric.kind == "counter":
+                lines.append(f"{name}{_labels(metric.labelnames, key)} {value}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, n in zip((*metric.buckets, "+Inf"), counts):
+                cumulative += n
+                le = 'le="%s"' % bound
+                lines.append(f"{name}_bucket{_labels(metric.labelnames, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labelnames, key)} {total}")
+            lines.append(f"{name}_count{_labels(metric.labelnames, key)} {count}")
+    return "\n".join(lines) + "\n"
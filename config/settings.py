@@ -1,6 +1,87 @@
+import os
+
 AUTO_PUBLISH = True
 SHORTS_PER_DAY = 3
 VOICE_ENABLED = True
 STYLE = "calm_authority"
 CHANNEL_NAME = "High-Performance Sales"
 OLLAMA_MODEL = "llama3:latest"
+LLM_CONCURRENCY = 4         # script-generation requests in flight at once; match Ollama's OLLAMA_NUM_PARALLEL
+LLM_STREAM = True           # stream script generation, aborting a reply as soon as it can't match the schema
+LLM_CACHE_DB = "cache/llm_responses.db"     # responses keyed by provider/model/prompts/temperature/max tokens
+LLM_CACHE_TTL_DAYS = 30
+LLM_CACHE_MAX_BYTES = 64 * 1024 ** 2        # least recently used responses are evicted past this
+
+# Rendering
+RENDER_WORKERS = 0          # concurrent ffmpeg renders; 0 = auto from CPU count
+RENDER_CORES_PER_JOB = 8    # used by auto mode; libx264 stops scaling well past ~8 threads at 1080x1920
+RENDER_CACHE_DIR = "cache/renders"          # finished MP4s keyed by audio/captions/background/style/encoder
+RENDER_CACHE_MAX_BYTES = 20 * 1024 ** 3
+RENDER_CACHE_MAX_AGE_DAYS = 14
+RENDER_SHARED_DECODE = False        # batch renders: one ffmpeg per background, decoded once and split per short
+RENDER_SHARED_DECODE_GAP = 5.0      # shared decode: shorts whose background stretches are further apart get separate decodes
+RENDER_SEGMENT_SECONDS = 0  # encode shorts longer than this as parallel keyframe-aligned segments; 0 = off
+MEDIA_PROBE_DB = "cache/media_probe.db"     # ffprobe results keyed by path, validated by size + mtime
+BACKGROUND_LIBRARY_DIR = "cache/backgrounds"    # uploads transcoded once to 1080x1920 30fps for rendering
+BACKGROUND_CATALOG_DB = "data/backgrounds.db"   # normalization status of every background
+BACKGROUND_GOP_SECONDS = 1                      # keyframe interval of the normalized backgrounds
+# Extra outputs render_one makes alongside the 1080x1920 master, in the same ffmpeg pass
+# (decode, scale and captions once, then split): names from OUTPUT_PROFILES
+RENDER_PROFILES = []
+OUTPUT_PROFILES = {
+    "720p": {
+        "width": 720, "height": 1280,
+        "video_args": ["-c:v", "libx264", "-b:v", "2M", "-maxrate", "2M", "-bufsize", "4M", "-pix_fmt", "yuv420p"],
+        "audio_args": ["-c:a", "aac", "-b:a", "128k"],
+    },
+    "poster": {
+        "width": 1080, "height": 1920,
+        "image_at": 1.0,                        # seconds into the short (capped at its midpoint)
+        "image_args": ["-q:v", "2"],
+    },
+}
+
+# Job queue (rq/redis). When enabled, /process enqueues per-short jobs and returns immediately.
+JOB_QUEUE_ENABLED = os.environ.get("JOB_QUEUE_ENABLED", "0") == "1"
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")  # fakeredis:// for local testing
+TTS_JOB_TIMEOUT = 600        # seconds
+RENDER_JOB_TIMEOUT = 1800    # seconds
+
+# TTS
+SENTENCE_SILENCE = 0.3                      # seconds of silence Piper inserts between sentences
+AUDIO_CACHE_DIR = "cache/audio"             # content-addressed WAVs keyed by script/voice/speed
+AUDIO_CACHE_MAX_BYTES = 2 * 1024 ** 3       # least recently used entries are evicted past this
+PIPER_SERVICE_ENABLED = os.environ.get("PIPER_SERVICE_ENABLED", "1") == "1"  # resident voices instead of a CLI per short
+PIPER_SERVICE_SOCKET = "data/piper.sock"
+PIPER_SERVICE_WORKERS = 2                   # concurrent syntheses (each ONNX session is multi-threaded already)
+PIPER_SERVICE_MAX_VOICES = 4                # voices kept loaded, least recently used unloaded first
+AUDIO_STREAMING = False     # pipeline: pipe each short's voiceover from memory into its render, no WAV on disk
+AUDIO_ARCHIVE = False       # with AUDIO_STREAMING, also keep a compact audio/<id>.m4a of it
+
+# Captions
+CAPTION_TIMING = "audio"            # "audio": TTS sentence timings, else a silence scan; "words": by word count
+CAPTION_MIN_PAUSE = 0.15            # seconds of silence that can separate two caption lines
+CAPTION_SILENCE_RATIO = 0.05        # frames quieter than this fraction of the loudest frame are silence
+CAPTION_STYLE = {                   # libass style baked into each short's .ass captions
+    "FontName": "Arial",
+    "FontSize": "18",
+    "PrimaryColour": "&HFFFFFF&",
+    "OutlineColour": "&H000000&",
+    "Outline": "2",
+    "Alignment": "2",
+    "MarginV": "80",
+}
+
+# Runs
+RUNS_DIR = "output/runs"            # one isolated workspace per run
+RUNS_KEEP_PER_SOURCE = 5            # newest finished runs (and workspaces) kept per source file; 0 = keep all
+PREVIEW_DIR = "output/previews"     # editor draft previews, a scratch workspace per request
+PREVIEW_SECONDS = 10                # default length of a /preview draft; 0 = the whole short
+JOB_STORE_PATH = "data/jobs.db"     # SQLite table of runs shared by all web/worker processes
+EVENTS_POLL_INTERVAL = 0.5          # seconds between job-store polls of a /runs/<id>/events stream
+EVENTS_RETENTION = 3600             # seconds a finished run's progress events are kept (for reconnecting streams)
+EVENTS_MAX_AGE = 7 * 24 * 3600      # events of runs that never finished (e.g. a killed worker) go after this
+
+# Metrics
+METRICS_DIR = "data/metrics"        # per-process snapshots merged by /metrics
+METRICS_FLUSH_INTERVAL = 5          # seconds between snapshot writes
@@ -2,12 +2,21 @@
 
 import json
 print("🔥 generate_scripts.py LOADED:", __file__)
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import ollama
 import argparse
 from pathlib import Path
 
+if __package__ in (None, ""):
+    # Allow `python content_engine/generate_scripts.py` to import project modules
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+from common import llm_cache, metrics
+
 
 
 
@@ -92,98 +101,328 @@ def _extract_json(text: str) -> Dict[str, Any]:
     return obj
 
 
+REQUIRED_KEYS = {"id", "hook", "voice_script", "on_screen_text", "visual_cues", "title", "description", "hashtags"}
+LIST_KEYS = ("on_screen_text", "visual_cues")
+
+
+def _validate_short(s: Any, i: int) -> None:
+    if not isinstance(s, dict):
+        raise ValueError(f"Short #{i} is not an object.")
+    missing = REQUIRED_KEYS - set(s.keys())
+    if missing:
+        raise ValueError(f"Short #{i} missing keys: {sorted(missing)}")
+    if not str(s["voice_script"]).strip():
+        raise ValueError(f"Short #{i} has empty voice_script.")
+    if not isinstance(s["on_screen_text"], list) or not s["on_screen_text"]:
+        raise ValueError(f"Short #{i} on_screen_text must be a non-empty list.")
+    if not isinstance(s["visual_cues"], list) or not s["visual_cues"]:
+        raise ValueError(f"Short #{i} visual_cues must be a non-empty list.")
+
+
 def _validate_payload(data: Dict[str, Any], n_expected: int) -> None:
     shorts = data.get("shorts")
     if not isinstance(shorts, list) or len(shorts) != n_expected:
         got = 0 if shorts is None else (len(shorts) if isinstance(shorts, list) else "non-list")
         raise ValueError(f"Invalid 'shorts'. Expected {n_expected} items, got {got}.")
 
-    required = {"id", "hook", "voice_script", "on_screen_text", "visual_cues", "title", "description", "hashtags"}
-
     for i, s in enumerate(shorts, start=1):
-        if not isinstance(s, dict):
-            raise ValueError(f"Short #{i} is not an object.")
-        missing = required - set(s.keys())
-        if missing:
-            raise ValueError(f"Short #{i} missing keys: {sorted(missing)}")
-        if not str(s["voice_script"]).strip():
-            raise ValueError(f"Short #{i} has empty voice_script.")
-        if not isinstance(s["on_screen_text"], list) or not s["on_screen_text"]:
-            raise ValueError(f"Short #{i} on_screen_text must be a non-empty list.")
-        if not isinstance(s["visual_cues"], list) or not s["visual_cues"]:
-            raise ValueError(f"Short #{i} visual_cues must be a non-empty list.")
-
-
-def _call_model(user_prompt: str) -> str:
-    resp = ollama.chat(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
-        options={"temperature": 0.6, "num_predict": 1600},
-    )
-    return resp["message"]["content"]
-
-
-def generate_shorts(source: str, n: int = SHORTS_PER_RUN) -> Dict[str, Any]:
-    prompt = USER_PROMPT_TEMPLATE.format(n=n, source=source)
-
-    # Attempt 1
-    try:
-        content = _call_model(prompt)
-        with open("data/_last_model_output.txt", "w", encoding="utf-8") as f:
-            f.write(content)
-
-        data = _extract_json(content)
-
-        # Never trust model for date; force today's date
-        data["date"] = str(date.today())
-        data["channel"] = CHANNEL
-
-        # Ensure IDs exist
-        shorts: List[Dict[str, Any]] = data.get("shorts", [])
-        for i, s in enumerate(shorts, start=1):
-            if isinstance(s, dict):
-                s.setdefault("id", f"S{i:03d}")
-
-        _validate_payload(data, n)
-        return data
-        
-    except Exception as e:
-        print(f"   ⚠️  Attempt 1 failed: {e}")
-        print(f"   🔄 Retrying with stricter prompt...")
-        
-        # Attempt 2 (strict retry)
-        strict_prompt = (
-            prompt
-            + "\n\nIMPORTANT:\n"
-              f"- Output ONLY valid JSON. No extra text.\n"
-              f"- shorts MUST contain exactly {n} items.\n"
-              f"- Every short MUST include every required key.\n"
-              f"- Use proper JSON formatting with double quotes.\n"
+        _validate_short(s, i)
+
+
+class SchemaMismatch(ValueError):
+    """A streamed reply that can no longer match the schema; carries the shorts that were complete"""
+
+    def __init__(self, message: str, text: str = "", salvaged: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.text = text
+        self.salvaged = salvaged or []
+
+
+PREAMBLE_LIMIT = 400  # characters of prose/fences a streamed reply may have before its opening brace
+
+
+class StreamValidator:
+    """Incremental check of a streamed shorts payload, fed one chunk at a time.
+
+    Follows just enough JSON structure (strings, nesting, object keys) to
+    raise SchemaMismatch as soon as the reply can't match the schema: a
+    non-list "shorts", more than n shorts, a short that closes without its
+    required keys. A preamble or ```json fence before the opening brace is
+    skipped, as _extract_json does, up to PREAMBLE_LIMIT characters. Each short that closes
+    valid is kept in .shorts, so an aborted reply can still be salvaged.
+    Full validation is still _parse_payload's job once the reply is done.
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.text = ""
+        self.end: Optional[int] = None  # index of the top-level closing brace, once seen
+        self.shorts: List[Dict[str, Any]] = []
+        self._stack: List[Dict[str, Any]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+
+    def feed(self, chunk: str) -> bool:
+        """Check another chunk of the reply; True once the top-level object has closed"""
+        start = len(self.text)
+        self.text += chunk
+        for pos in range(start, len(self.text)):
+            if self.end is not None:
+                break  # anything after the payload is ignored, as _extract_json does
+            self._char(self.text[pos], pos)
+        return self.end is not None
+
+    def fail(self, message: str) -> SchemaMismatch:
+        return SchemaMismatch(message, self.text, self.shorts)
+
+    def _char(self, c: str, pos: int) -> None:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                frame = self._stack[-1]
+                if frame["type"] == "{" and frame["key"] is None:
+                    frame["key"] = json.loads(self.text[self._string_start:pos + 1])
+                    frame["keys"].add(frame["key"])
+            return
+        if c.isspace():
+            return
+
+        if not self._stack:
+            if c == "{":
+                self._push(c, (), pos)
+            elif pos >= PREAMBLE_LIMIT:
+                raise self.fail(f"No JSON object in the first {PREAMBLE_LIMIT} characters: "
+                                f"{self.text.strip()[:40]!r}...")
+            return  # preamble or code fence
+
+        frame = self._stack[-1]
+        if c in "}]":
+            self._close(c, pos)
+        elif frame["awaiting"]:
+            # A value starts here: its first character tells its type
+            frame["awaiting"] = False
+            path = self._value_path(frame, c)
+            if c == '"':
+                self._in_string, self._string_start = True, pos
+            elif c in "{[":
+                self._push(c, path, pos)
+        elif c == '"':
+            self._in_string, self._string_start = True, pos  # an object key
+        elif c == ":":
+            frame["awaiting"] = True
+        elif c == ",":
+            if frame["type"] == "{":
+                frame["key"] = None
+            else:
+                frame["awaiting"] = True
+        # anything else continues a number, true, false or null
+
+    def _push(self, c: str, path: Tuple[Any, ...], pos: int) -> None:
+        self._stack.append({"type": c, "path": path, "start": pos, "key": None, "keys": set(),
+                            "items": 0, "awaiting": c == "["})
+
+    def _value_path(self, frame: Dict[str, Any], c: str) -> Tuple[Any, ...]:
+        if frame["type"] == "{":
+            path = frame["path"] + (frame["key"],)
+        else:
+            frame["items"] += 1
+            path = frame["path"] + (frame["items"] - 1,)
+
+        if path == ("shorts",) and c != "[":
+            raise self.fail("'shorts' is not a list")
+        if len(path) == 2 and path[0] == "shorts":
+            if path[1] >= self.n:
+                raise self.fail(f"More than {self.n} shorts")
+            if c != "{":
+                raise self.fail(f"Short #{path[1] + 1} is not an object")
+        if len(path) == 3 and path[0] == "shorts" and path[2] in LIST_KEYS and c != "[":
+            raise self.fail(f"Short #{path[1] + 1} {path[2]} must be a list")
+        return path
+
+    def _close(self, c: str, pos: int) -> None:
+        frame = self._stack.pop()
+        if {"{": "}", "[": "]"}[frame["type"]] != c:
+            raise self.fail(f"Malformed JSON: {frame['type']!r} closed by {c!r}")
+        path = frame["path"]
+
+        if len(path) == 2 and path[0] == "shorts":
+            i = path[1] + 1
+            missing = REQUIRED_KEYS - {"id"} - frame["keys"]  # _parse_payload fills in missing ids
+            if missing:
+                raise self.fail(f"Short #{i} missing keys: {sorted(missing)}")
+            short = json.loads(self.text[frame["start"]:pos + 1])
+            short.setdefault("id", f"S{i:03d}")
+            try:
+                _validate_short(short, i)
+            except ValueError as e:
+                raise self.fail(str(e))
+            self.shorts.append(short)
+        elif path == ("shorts",) and frame["items"] != self.n:
+            raise self.fail(f"Invalid 'shorts'. Expected {self.n} items, got {frame['items']}.")
+        elif path == ():
+            if "shorts" not in frame["keys"]:
+                raise self.fail("No 'shorts' in the output")
+            self.end = pos
+
+
+def _stream_reply(user_prompt: str, n: int) -> str:
+    """Stream the model's reply through a StreamValidator, closing the stream (which stops
+    generation) as soon as it fails, or as soon as the payload is complete"""
+    validator = StreamValidator(n)
+    with metrics.timed(metrics.LLM_SECONDS, provider="ollama", model=MODEL):
+        stream = ollama.chat(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ],
+            options={"temperature": 0.6, "num_predict": 1600},
+            stream=True,
         )
-        content2 = _call_model(strict_prompt)
-        with open("data/_last_model_output_retry.txt", "w", encoding="utf-8") as f:
-            f.write(content2)
+        try:
+            for part in stream:
+                if validator.feed(part["message"]["content"]):
+                    break
+        finally:
+            stream.close()
+    if validator.end is None:
+        raise validator.fail("Output ended before the JSON object was complete")
+    return validator.text[:validator.end + 1]
+
+
+def _call_model(user_prompt: str, n: int, regenerate: bool = False,
+                validate: Optional[Callable[[str], Any]] = None) -> str:
+    """The model's reply, from the LLM cache unless regenerate; only replies that pass validate are cached.
+
+    With settings.LLM_STREAM the reply is streamed and checked as it arrives (see StreamValidator).
+    """
+    def call() -> str:
+        if settings.LLM_STREAM:
+            return _stream_reply(user_prompt, n)
+        with metrics.timed(metrics.LLM_SECONDS, provider="ollama", model=MODEL):
+            resp = ollama.chat(
+                model=MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt},
+                ],
+                options={"temperature": 0.6, "num_predict": 1600},
+            )
+        return resp["message"]["content"]
+
+    return llm_cache.cached_call("ollama", MODEL, SYSTEM_PROMPT, user_prompt, 0.6, 1600, call,
+                                 bypass=regenerate, validate=validate)
+
+
+def _parse_payload(content: str, n: int) -> Dict[str, Any]:
+    data = _extract_json(content)
+
+    # Never trust model for date; force today's date
+    data["date"] = str(date.today())
+    data["channel"] = CHANNEL
+
+    # Ensure IDs exist
+    shorts: List[Dict[str, Any]] = data.get("shorts", [])
+    for i, s in enumerate(shorts, start=1):
+        if isinstance(s, dict):
+            s.setdefault("id", f"S{i:03d}")
+
+    _validate_payload(data, n)
+    return data
 
-        data2 = _extract_json(content2)
-        data2["date"] = str(date.today())
-        data2["channel"] = CHANNEL
 
-        shorts2: List[Dict[str, Any]] = data2.get("shorts", [])
-        for i, s in enumerate(shorts2, start=1):
-            if isinstance(s, dict):
-                s.setdefault("id", f"S{i:03d}")
+def generate_shorts(source: str, n: int = SHORTS_PER_RUN, regenerate: bool = False,
+                    debug_name: str = "", debug_dir: Path = Path("data")) -> Dict[str, Any]:
+    """n shorts for one source; a failed attempt is retried once with a stricter prompt.
 
-        _validate_payload(data2, n)
-        return data2
+    When a streamed attempt is aborted part-way, the shorts it completed are
+    kept and the retry only asks for the rest. The raw replies are written to
+    <debug_dir>/_last_model_output[_<debug_name>][_retry].txt; concurrent callers
+    pass distinct debug_names.
+    """
+    salvaged: List[Dict[str, Any]] = []
+    for attempt in (1, 2):
+        want = n - len(salvaged)
+        prompt = USER_PROMPT_TEMPLATE.format(n=want, source=source)
+        if attempt == 2:
+            prompt += (
+                "\n\nIMPORTANT:\n"
+                f"- Output ONLY valid JSON. No extra text.\n"
+                f"- shorts MUST contain exactly {want} items.\n"
+                f"- Every short MUST include every required key.\n"
+                f"- Use proper JSON formatting with double quotes.\n"
+            )
+        debug_path = debug_dir / f"_last_model_output{'_' + debug_name if debug_name else ''}{'_retry' if attempt == 2 else ''}.txt"
+        content = ""
+        try:
+            content = _call_model(prompt, want, regenerate, lambda reply: _parse_payload(reply, want))
+            data = _parse_payload(content, want)
+            if salvaged:
+                data["shorts"] = salvaged + data["shorts"]
+                for i, s in enumerate(data["shorts"], start=1):
+                    s["id"] = f"S{i:03d}"
+            return data
+        except Exception as e:
+            if isinstance(e, SchemaMismatch):
+                content = e.text
+                salvaged += e.salvaged[:want]
+                if len(salvaged) == n:
+                    # e.g. the model kept going past n shorts: the first n are all we asked for
+                    print(f"   ✂️  Reply cut off after {n} complete short(s): {e}")
+                    return {"date": str(date.today()), "channel": CHANNEL, "shorts": salvaged}
+            if attempt == 2:
+                raise
+            print(f"   ⚠️  Attempt 1 failed: {e}")
+            if salvaged:
+                print(f"   🧩 Kept {len(salvaged)}/{n} complete short(s) from the aborted reply")
+            print(f"   🔄 Retrying with stricter prompt...")
+        finally:
+            if content:
+                with open(debug_path, "w", encoding="utf-8") as f:
+                    f.write(content)
+
+
+def generate_for_snippets(snippets: List[Dict[str, Any]], concurrency: int = settings.LLM_CONCURRENCY,
+                          regenerate: bool = False, debug_dir: Path = Path("data")) -> List[Tuple[Optional[Dict[str, Any]], str]]:
+    """One short per snippet, with at most concurrency model requests in flight.
+
+    Each snippet's raw replies go to debug_dir/_last_model_output_<snippet id>[_retry].txt.
+
+    Returns (short, "") or (None, error) per snippet, in snippet order; a
+    snippet that fails (after generate_shorts' own retry) never stops the others.
+    """
+    results: List[Tuple[Optional[Dict[str, Any]], str]] = [(None, "")] * len(snippets)
+    # Each request is a blocking HTTP call to Ollama, so threads are enough to overlap them
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="llm") as pool:
+        futures = {pool.submit(generate_shorts, source=sn["text"].strip(), n=1, regenerate=regenerate,
+                               debug_name=str(sn["id"]), debug_dir=debug_dir): i for i, sn in enumerate(snippets)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                short = future.result()["shorts"][0]
+                results[i] = (short, "")
+                print(f"   ✅ [{done}/{len(snippets)}] snippet {snippets[i]['id']}: {short['title'][:50]}...")
+            except Exception as e:
+                results[i] = (None, str(e))
+                print(f"   ❌ [{done}/{len(snippets)}] snippet {snippets[i]['id']} failed: {e}")
+    return results
 
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--snippets", default="", help="Path to data/snippets_YYYY-MM-DD.json (if omitted, uses latest)")
     ap.add_argument("--max_shorts", type=int, default=9999, help="Safety cap (we can tune later)")
+    ap.add_argument("--out", default="", help="Output path (default: data/temp/shorts_YYYY-MM-DD_<source>.json)")
+    ap.add_argument("--concurrency", type=int, default=settings.LLM_CONCURRENCY,
+                    help="Model requests in flight at once (default from settings)")
+    ap.add_argument("--regenerate", action="store_true", help="Ask the model again instead of using cached responses")
+    ap.add_argument("--debug-dir", default="data",
+                    help="Where the raw model replies (_last_model_output_<snippet id>.txt) are written")
     args = ap.parse_args()
 
     # Pick snippets file
@@ -205,32 +444,34 @@ def main():
     print(f"🔎 Source file in snippets: {snip_payload.get('source_file')}")
     print(f"🔎 Snippet count: {len(snippets)}")
 
+    snippets = snippets[:args.max_shorts]
+    print(f"🤖 Generating {len(snippets)} short(s), {max(1, args.concurrency)} request(s) at a time...")
+    # Only this run's replies: ids repeat between runs, but earlier runs may have had more snippets
+    debug_dir = Path(args.debug_dir)
+    debug_dir.mkdir(parents=True, exist_ok=True)
+    for stale in debug_dir.glob("_last_model_output*.txt"):
+        stale.unlink(missing_ok=True)
+    results = generate_for_snippets(snippets, args.concurrency, regenerate=args.regenerate, debug_dir=debug_dir)
+
     shorts_out: List[Dict[str, Any]] = []
-    for sn in snippets:
-        if len(shorts_out) >= args.max_shorts:
-            break
-
-        source = sn["text"].strip()
-        print(f"🤖 Generating short {len(shorts_out)+1}/{min(len(snippets), args.max_shorts)}...")
-        one = generate_shorts(source=source, n=1)  # 1 short per snippet
-        if one.get("shorts"):
-            s = one["shorts"][0]
-            s["id"] = f"S{len(shorts_out)+1:03d}"
-            s["source_snippet_id"] = sn["id"]
-            # Copy background_video from snippet to short
-            s["background_video"] = sn.get("background_video", "ocean.mp4")
-            s["speech_speed"] = sn.get("speech_speed", "1.0")
-            
-            # Format voice_script with line breaks for captions
-            original = s["voice_script"]
-            formatted = format_voice_script(original)
-            print(f"   🔍 Original has {original.count(chr(10))} line breaks")
-            print(f"   🔍 Formatted has {formatted.count(chr(10))} line breaks")
-            print(f"   🔍 First 100 chars: {formatted[:100]}...")
-            s["voice_script"] = formatted
-            
-            shorts_out.append(s)
-            print(f"   ✅ Short {s['id']} generated: {s['title'][:50]}...")
+    failed: List[Dict[str, str]] = []
+    for i, (sn, (s, error)) in enumerate(zip(snippets, results), start=1):
+        if s is None:
+            failed.append({"snippet_id": sn["id"], "error": error})
+            continue
+        s["id"] = f"S{i:03d}"  # by snippet position, so a failed sibling doesn't shift it
+        s["source_snippet_id"] = sn["id"]
+        # Copy background_video from snippet to short
+        s["background_video"] = sn.get("background_video", "ocean.mp4")
+        s["speech_speed"] = sn.get("speech_speed", "1.0")
+
+        # Format voice_script with line breaks for captions
+        original = s["voice_script"]
+        formatted = format_voice_script(original)
+        print(f"   🔍 {s['id']}: {original.count(chr(10))} -> {formatted.count(chr(10))} line breaks, "
+              f"first 100 chars: {formatted[:100]}...")
+        s["voice_script"] = formatted
+        shorts_out.append(s)
 
     out = {
         "date": str(date.today()),
@@ -238,21 +479,26 @@ def main():
         "source_file": snip_payload.get("source_file", ""),
         "snippets_file": snip_path.name,
         "shorts": shorts_out,
+        "failed": failed,
     }
 
     # Use source file name in output to avoid overwrites
     source_name = snip_payload.get("source_file", "").replace(".txt", "").replace(".md", "")
-    # Save to temp directory
-    temp_dir = Path("data/temp")
-    temp_dir.mkdir(exist_ok=True)
-    
-    out_path = temp_dir / f"shorts_{out['date']}_{source_name}.json"
+    # Save to temp directory unless the caller gave an explicit path
+    out_path = Path(args.out) if args.out else Path("data/temp") / f"shorts_{out['date']}_{source_name}.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
     tmp_path = out_path.with_suffix(".json.tmp")
     tmp_path.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
     tmp_path.replace(out_path)
 
     print(f"Wrote: {out_path}")
     print(f"✅ Shorts generated: {len(shorts_out)}")
+    cache = llm_cache.stats()["process"]
+    print(f"🗃️  LLM cache: {cache['hits']} hit(s), {cache['misses']} miss(es)")
+    if failed:
+        print(f"⚠️  {len(failed)} snippet(s) failed: " + ", ".join(f["snippet_id"] for f in failed))
+        if not shorts_out:
+            raise SystemExit(f"❌ All {len(failed)} snippet(s) failed")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
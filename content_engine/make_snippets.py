@@ -78,6 +78,7 @@ def main():
     ap.add_argument("--source", default="", help="Source filename inside /data (e.g., source.txt). If omitted, prompts you.")
     ap.add_argument("--max_chars", type=int, default=DEFAULT_MAX_CHARS)
     ap.add_argument("--min_chars", type=int, default=DEFAULT_MIN_CHARS)
+    ap.add_argument("--out", default="", help="Output path (default: data/snippets_YYYY-MM-DD.json)")
     args = ap.parse_args()
 
     files = list_sources()
@@ -102,7 +103,7 @@ def main():
         "snippets": [{"id": f"N{i:03d}", "text": s} for i, s in enumerate(snippets, start=1)]
     }
 
-    out_path = DATA_DIR / f"snippets_{out['date']}.json"
+    out_path = Path(args.out) if args.out else DATA_DIR / f"snippets_{out['date']}.json"
     out_path.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
 
     print(f"\n✅ Wrote: {out_path}")
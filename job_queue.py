@@ -0,0 +1,299 @@
+# job_queue.py
+"""
+Distributed pipeline jobs on rq/redis.
+
+/process registers a run in the job store and calls enqueue_run(), which
+queues one TTS job per short on the "tts" queue and a matching render job on
+the "render" queue that only runs once its TTS job has finished. The two
+queues are served by separate worker pools, which can live on different
+machines as long as they share output/:
+
+    python job_queue.py tts              # or: rq worker tts --url $REDIS_URL
+    python job_queue.py render
+
+Set REDIS_URL=fakeredis:// (needs fakeredis, see requirements-dev.txt) to
+run everything in one process for local testing: the fake server only exists
+in that process, so enqueue_run() drains the queues itself on a background
+thread (see run_local_worker()). Use it with a single web process, e.g.
+`python review_snippets.py`, not several gunicorn workers.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List
+
+from redis import Redis
+from rq import Queue, SimpleWorker, Worker
+from rq.job import Job, JobStatus
+from rq.timeouts import TimerDeathPenalty
+
+from config import settings
+from common import job_store, metrics
+
+RUN_KEY = "pipeline:run:{}"
+RUN_TTL = 7 * 24 * 3600  # keep run metadata for a week
+
+_fake_connection = None
+_fake_lock = threading.Lock()
+_local_lock = threading.Lock()  # one local drain at a time
+
+
+def is_local() -> bool:
+    """True when REDIS_URL is fakeredis://, so no separate worker can see the queues"""
+    return os.environ.get("REDIS_URL", settings.REDIS_URL).startswith("fakeredis://")
+
+
+def get_connection() -> Redis:
+    """Redis connection from REDIS_URL; fakeredis:// gives a shared in-process fake"""
+    global _fake_connection
+    url = os.environ.get("REDIS_URL", settings.REDIS_URL)
+    if is_local():
+        with _fake_lock:
+            if _fake_connection is None:
+                import fakeredis
+                _fake_connection = fakeredis.FakeStrictRedis()
+        return _fake_connection
+    return Redis.from_url(url)
+
+
+def get_queue(name: str, connection: Redis = None) -> Queue:
+    return Queue(name, connection=connection or get_connection())
+
+
+# --- Job functions (executed by workers) ---
+
+def _emit(run_id: str, sid: str, stage: str, **data: Any) -> None:
+    if run_id:
+        job_store.add_event(run_id, sid, stage, **data)
+
+
+def tts_job(workspace: str, short: Dict[str, Any], run_id: str = "") -> Dict[str, Any]:
+    """Synthesize audio and captions for one short"""
+    from audio_engine.tts import synthesize_short
+    from caption_engine.captions import caption_short
+
+    workspace = Path(workspace)
+    stage = "tts"
+    try:
+        _emit(run_id, short["id"], stage)
+        audio, cached = synthesize_short(short, workspace / "audio")
+        stage = "captions"
+        _emit(run_id, short["id"], stage)
+        captions = caption_short(short, audio, workspace / "captions")
+    except Exception as e:
+        _emit(run_id, short["id"], "failed", error=f"{stage}: {e}")
+        raise
+    finally:
+        metrics.flush()  # the work horse exits without running atexit
+    return {"id": short["id"], "audio": str(audio), "captions": str(captions), "audio_cached": cached}
+
+
+def render_job(workspace: str, short: Dict[str, Any], source_file: str, date_str: str,
+               force: bool = False, fingerprints: Dict[str, str] = None, run_id: str = "") -> Dict[str, Any]:
+    """Render one short whose audio and captions already exist"""
+    from pipeline import update_manifest
+    from visual_engine.render_short import (
+        render_one, resolve_render_workers, threads_per_job, DEFAULT_BACKGROUND,
+    )
+
+    sid = short["id"]
+    threads = threads_per_job(resolve_render_workers())
+    try:
+        _emit(run_id, sid, "rendering")
+        out = render_one(Path(workspace), sid, short.get("background_video", DEFAULT_BACKGROUND),
+                         source_file, date_str, threads=threads, force=force,
+                         progress=lambda p: _emit(run_id, sid, "progress", **p))
+        if fingerprints:
+            update_manifest(Path(workspace), {sid: {"fingerprints": fingerprints, "video": str(out)}})
+    except Exception as e:
+        _emit(run_id, sid, "failed", error=f"render: {e}")
+        raise
+    finally:
+        metrics.flush()  # the work horse exits without running atexit
+    _emit(run_id, sid, "done", video=str(out))
+    return {"id": sid, "video": str(out)}
+
+
+# --- Enqueue / status ---
+
+def enqueue_run(payload: Dict[str, Any], workspace: Path, run_id: str, force_render: bool = False) -> None:
+    """Queue TTS and render jobs for every short of a job-store run whose inputs changed"""
+    from pipeline import plan_incremental
+
+    conn = get_connection()
+    tts_queue = get_queue("tts", conn)
+    render_queue = get_queue("render", conn)
+
+    date_str = payload.get("date", str(date.today()))
+    source_file = payload.get("source_file", "unknown")
+    plan = plan_incremental(payload, workspace)
+    (workspace / "audio").mkdir(parents=True, exist_ok=True)
+
+    shorts = []
+    for short in payload.get("shorts", []):
+        sid = short["id"]
+        skip = plan[sid]["skip"]
+        if "render" in skip and not force_render:
+            shorts.append({"id": sid, "tts_job": None, "render_job": None, "video": plan[sid]["video"]})
+            _emit(run_id, sid, "done", video=plan[sid]["video"], skipped=sorted(skip))
+            continue
+
+        _emit(run_id, sid, "queued")
+        tts = None
+        if not {"tts", "captions"} <= skip:
+            tts = tts_queue.enqueue_call(
+                tts_job, args=(str(workspace), short, run_id),
+                job_id=f"{run_id}-{sid}-tts",
+                timeout=settings.TTS_JOB_TIMEOUT,
+                result_ttl=RUN_TTL, failure_ttl=RUN_TTL,
+            )
+        render = render_queue.enqueue_call(
+            render_job, args=(str(workspace), short, source_file, date_str, force_render,
+                              plan[sid]["fingerprints"], run_id),
+            job_id=f"{run_id}-{sid}-render",
+            depends_on=tts,
+            timeout=settings.RENDER_JOB_TIMEOUT,
+            result_ttl=RUN_TTL, failure_ttl=RUN_TTL,
+        )
+        shorts.append({"id": sid, "tts_job": tts.id if tts else None, "render_job": render.id})
+
+    run = {
+        "id": run_id,
+        "created": time.time(),
+        "workspace": str(workspace),
+        "source_file": source_file,
+        "shorts": shorts,
+    }
+    conn.set(RUN_KEY.format(run_id), json.dumps(run), ex=RUN_TTL)
+    print(f"📨 Queued run {run_id}: {len(shorts)} short(s)")
+    if is_local():
+        threading.Thread(target=run_local_worker, name=f"local-worker-{run_id}", daemon=True).start()
+
+
+def _job_error(job: Job) -> str:
+    result = job.latest_result()
+    if result is not None and result.exc_string:
+        return result.exc_string.strip().splitlines()[-1]
+    return ""
+
+
+def _short_state(tts: Job, render: Job) -> Dict[str, str]:
+    if render is None:
+        return {"stage": "failed", "error": "job expired or missing"}
+
+    # No TTS job means the short's audio and captions were unchanged
+    tts_status = tts.get_status() if tts is not None else JobStatus.FINISHED
+    render_status = render.get_status()
+
+    if tts_status == JobStatus.FAILED:
+        return {"stage": "failed", "error": f"tts: {_job_error(tts)}"}
+    if render_status == JobStatus.FAILED:
+        return {"stage": "failed", "error": f"render: {_job_error(render)}"}
+    if render_status == JobStatus.FINISHED:
+        return {"stage": "done", "error": ""}
+    if render_status == JobStatus.STARTED:
+        return {"stage": "rendering", "error": ""}
+    if tts_status == JobStatus.STARTED:
+        return {"stage": "tts", "error": ""}
+    if tts_status == JobStatus.FINISHED:
+        return {"stage": "waiting_render", "error": ""}
+    return {"stage": "queued", "error": ""}
+
+
+def get_run(run_id: str) -> Dict[str, Any]:
+    """Run metadata plus the current stage of every short, or None if unknown"""
+    conn = get_connection()
+    raw = conn.get(RUN_KEY.format(run_id))
+    if raw is None:
+        return None
+    run = json.loads(raw)
+
+    ids = [j for s in run["shorts"] for j in (s["tts_job"], s["render_job"]) if j]
+    jobs = dict(zip(ids, Job.fetch_many(ids, connection=conn)))
+
+    shorts = []
+    for s in run["shorts"]:
+        if s["render_job"] is None:
+            # Unchanged since the last run; nothing was queued
+            shorts.append({"id": s["id"], "stage": "done", "error": "", "video": s["video"]})
+            continue
+        tts, render = jobs.get(s["tts_job"]), jobs[s["render_job"]]
+        if s["tts_job"] and tts is None:
+            shorts.append({"id": s["id"], "stage": "failed", "error": "job expired or missing", "video": ""})
+            continue
+        state = _short_state(tts, render)
+        video = ""
+        if state["stage"] == "done":
+            video = (render.return_value() or {}).get("video", "")
+        shorts.append({"id": s["id"], **state, "video": video})
+
+    stages = [s["stage"] for s in shorts]
+    if all(st in ("done", "failed") for st in stages):
+        status = "failed" if "failed" in stages else "finished"
+    elif any(st != "queued" for st in stages):
+        status = "running"
+    else:
+        status = "queued"
+
+    return {
+        "id": run_id,
+        "status": status,
+        "created": run["created"],
+        "total": len(shorts),
+        "done": stages.count("done"),
+        "failed": stages.count("failed"),
+        "shorts": shorts,
+    }
+
+
+def sync_run(run_id: str) -> None:
+    """Copy a queued run's live status from redis into the job store"""
+    run = get_run(run_id)
+    if run is None:
+        job_store.update_run(run_id, status="failed", error="Run metadata expired from the queue")
+        return
+
+    results = [
+        {"id": s["id"], "status": "ok" if s["stage"] == "done" else ("failed" if s["stage"] == "failed" else s["stage"]),
+         "error": s["error"], "video": s["video"]}
+        for s in run["shorts"]
+    ]
+    job_store.update_run(run_id, status=run["status"], done=run["done"], failed=run["failed"], results=results)
+
+
+# --- Workers ---
+
+class LocalWorker(SimpleWorker):
+    """SimpleWorker that can also run off the main thread: no signal handlers, timer-based job timeouts"""
+    death_penalty_class = TimerDeathPenalty
+
+    def _install_signal_handlers(self):
+        pass
+
+
+def run_local_worker(queues: List[str] = ("tts", "render")) -> None:
+    """Drain the given queues in this process (for fakeredis / local testing)"""
+    conn = get_connection()
+    with _local_lock:
+        worker = LocalWorker([get_queue(q, conn) for q in queues], connection=conn)
+        worker.work(burst=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run a pipeline worker")
+    ap.add_argument("queues", nargs="+", choices=["tts", "render"], help="Queues to serve")
+    ap.add_argument("--burst", action="store_true", help="Exit once the queues are empty")
+    args = ap.parse_args()
+
+    conn = get_connection()
+    worker = Worker([get_queue(q, conn) for q in args.queues], connection=conn)
+    print(f"👷 Worker serving: {', '.join(args.queues)}")
+    worker.work(burst=args.burst)
+
+
+if __name__ == "__main__":
+    main()
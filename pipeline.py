@@ -0,0 +1,443 @@
+# pipeline.py
+"""
+In-process streaming pipeline: TTS -> captions -> render, one short at a time.
+
+Each stage runs on its own worker thread(s) and hands finished shorts to the
+next stage through a queue, so short 2 can be in TTS while short 1 renders.
+The heavy lifting (piper, ffmpeg) happens in subprocesses, so threads are
+enough to keep every stage busy.
+
+Every run gets a row in the job store and its own workspace
+(output/runs/<run_id>/ with shorts.json, audio/, captions/, video/), and
+all stages take explicit paths inside it, so concurrent runs never collide.
+Stage changes and render progress are recorded as job-store events, which
+the editor follows over Server-Sent Events.
+"""
+import argparse
+import fcntl
+import json
+import queue
+import shutil
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from config import settings
+from common import job_store
+from common.file_cache import file_digest, link_or_copy, make_key
+from audio_engine.tts import (
+    synthesize_short, stream_short, format_cache_stats, find_voice_model, normalize_script,
+    resolve_voice_model, timings_path,
+)
+from caption_engine.captions import caption_short
+from caption_engine.rewrap_srt import MAX_CHARS
+from visual_engine.backgrounds import normalized_path
+from visual_engine.render_short import (
+    render_one, output_path, output_files, resolve_render_workers, threads_per_job,
+    BACKGROUNDS_DIR, DEFAULT_BACKGROUND, FORCE_STYLE, WIDTH, HEIGHT, FPS,
+    VIDEO_ENCODER_ARGS, AUDIO_ENCODER_ARGS,
+)
+
+_DONE = object()  # end-of-stream marker passed down the queues
+
+MANIFEST_NAME = "manifest.json"
+SHORTS_NAME = "shorts.json"
+
+
+# --- Incremental runs ---
+#
+# Every workspace keeps a manifest of each short's stage fingerprints. A new
+# run's workspace is seeded from the previous run's outputs and manifest, so
+# a resubmit only re-runs the stages whose inputs changed, and cleans up
+# outputs of blocks that were removed.
+
+def short_fingerprints(short: Dict[str, Any], source_file: str, date_str: str) -> Dict[str, str]:
+    """One fingerprint per stage, each chained to the stage before it"""
+    voice_model = short.get("voice_model") or find_voice_model().name
+    try:
+        voice_digest = file_digest(resolve_voice_model(voice_model))
+    except FileNotFoundError:
+        voice_digest = "missing"
+
+    background_video = short.get("background_video", DEFAULT_BACKGROUND)
+    bg_path = BACKGROUNDS_DIR / background_video
+    bg_stat = bg_path.stat() if bg_path.exists() else None
+    bg_normalized = normalized_path(background_video)  # renders switch to it once it's ready
+
+    tts = make_key("tts-sentences", normalize_script(short["voice_script"]), voice_model, voice_digest,
+                   float(short.get("speech_speed", "1.0")), settings.SENTENCE_SILENCE)
+    captions = make_key("captions-ass", tts, MAX_CHARS, settings.CAPTION_TIMING, settings.CAPTION_STYLE)
+    render = make_key("render-v2", captions, background_video,
+                      (bg_stat.st_size, bg_stat.st_mtime_ns) if bg_stat else "missing",
+                      bg_normalized.name if bg_normalized else "",
+                      source_file, date_str, FORCE_STYLE, WIDTH, HEIGHT, FPS,
+                      VIDEO_ENCODER_ARGS, AUDIO_ENCODER_ARGS,
+                      *([settings.RENDER_SEGMENT_SECONDS] if settings.RENDER_SEGMENT_SECONDS else []),
+                      *[(name, settings.OUTPUT_PROFILES[name]) for name in settings.RENDER_PROFILES])
+    return {"tts": tts, "captions": captions, "render": render}
+
+
+def load_manifest(workspace: Path) -> Optional[Dict[str, Any]]:
+    path = workspace / MANIFEST_NAME
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def update_manifest(workspace: Path, updates: Dict[str, Optional[Dict[str, Any]]]) -> None:
+    """Merge per-short entries into the manifest (None removes an entry).
+
+    Takes an exclusive lock so parallel workers sharing the output dir don't lose updates.
+    """
+    workspace.mkdir(parents=True, exist_ok=True)
+    with open(workspace / f".{MANIFEST_NAME}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = load_manifest(workspace) or {"shorts": {}}
+        for sid, entry in updates.items():
+            if entry is None:
+                manifest["shorts"].pop(sid, None)
+            else:
+                manifest["shorts"][sid] = entry
+        tmp = workspace / f".{MANIFEST_NAME}.tmp"
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(workspace / MANIFEST_NAME)
+
+
+def _remove_outputs(workspace: Path, sid: str, entry: Dict[str, Any]) -> None:
+    for path in (workspace / "audio" / f"{sid}.wav", timings_path(workspace / "audio" / f"{sid}.wav"),
+                 workspace / "audio" / f"{sid}.m4a",
+                 workspace / "captions" / f"{sid}.ass", workspace / "captions" / f"{sid}.srt",
+                 *(output_files(Path(entry["video"])) if entry.get("video") else [])):
+        if path.exists():
+            path.unlink()
+            print(f"   Deleted: {path}")
+
+
+def plan_incremental(payload: Dict[str, Any], workspace: Path, use_manifest: bool = True,
+                     stream_audio: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Diff payload against the workspace manifest (seeded from the previous run) and clean up stale outputs.
+
+    stream_audio: the caller synthesizes audio in memory for every render it runs (the
+    in-process pipeline with AUDIO_STREAMING), so a missing WAV doesn't force a TTS rerun.
+    Queue render jobs read the WAV, so job_queue leaves it off.
+    Returns sid -> {"fingerprints": {...}, "skip": set of stage names whose outputs are current}.
+    """
+    source_file = payload.get("source_file", "unknown")
+    date_str = payload.get("date", str(date.today()))
+    manifest = load_manifest(workspace) if use_manifest else None
+    previous = (manifest or {}).get("shorts", {})
+
+    plan: Dict[str, Dict[str, Any]] = {}
+    for short in payload.get("shorts", []):
+        sid = short["id"]
+        fps = short_fingerprints(short, source_file, date_str)
+        old = previous.get(sid, {})
+        old_fps = old.get("fingerprints", {})
+
+        skip = set()
+        # Streamed audio is never on disk; it is synthesized again (from the sentence cache) if a render needs it
+        audio_ok = stream_audio or (workspace / "audio" / f"{sid}.wav").exists()
+        if old_fps.get("tts") == fps["tts"] and audio_ok:
+            skip.add("tts")
+            if old_fps.get("captions") == fps["captions"] and (workspace / "captions" / f"{sid}.ass").exists():
+                skip.add("captions")
+                if old_fps.get("render") == fps["render"] and old.get("video") and Path(old["video"]).exists():
+                    skip.add("render")
+
+        if "render" not in skip and old.get("video"):
+            for path in output_files(Path(old["video"])):
+                path.unlink(missing_ok=True)  # replaced by this run's render (its name may change)
+        plan[sid] = {"fingerprints": fps, "skip": skip, "video": old.get("video", "")}
+
+    removed = {sid: entry for sid, entry in previous.items() if sid not in plan}
+    if removed:
+        print(f"🗑️  Removing outputs for {len(removed)} deleted block(s)")
+        for sid, entry in removed.items():
+            _remove_outputs(workspace, sid, entry)
+        update_manifest(workspace, {sid: None for sid in removed})
+
+    unchanged = sum(1 for p in plan.values() if "render" in p["skip"])
+    print(f"🔎 Incremental: {unchanged}/{len(plan)} short(s) unchanged since last run")
+    return plan
+
+
+# --- Stages ---
+
+def _tts_stage(job: Dict[str, Any], ctx: Dict[str, Any]) -> None:
+    wav = ctx["workspace"] / "audio" / f"{job['sid']}.wav"
+    if "tts" in job["skip"]:
+        job["audio"] = wav
+        return
+    if not ctx["stream_audio"]:
+        job["audio"], job["audio_cached"] = synthesize_short(job["short"], ctx["workspace"] / "audio")
+        return
+    # Kept in memory and piped into the render; a seeded WAV would be stale
+    job["audio"] = None
+    job["pcm"], job["audio_cached"] = stream_short(job["short"])
+    wav.unlink(missing_ok=True)
+    timings_path(wav).unlink(missing_ok=True)
+
+
+def _caption_stage(job: Dict[str, Any], ctx: Dict[str, Any]) -> None:
+    if "captions" in job["skip"]:
+        job["captions"] = ctx["workspace"] / "captions" / f"{job['sid']}.ass"
+        return
+    job["captions"] = caption_short(job["short"], job["audio"], ctx["workspace"] / "captions",
+                                    timings=job["pcm"]["timings"] if job.get("pcm") else None)
+
+
+def _render_stage(job: Dict[str, Any], ctx: Dict[str, Any]) -> None:
+    if "render" in job["skip"]:
+        job["video"] = Path(job["previous_video"])
+        print(f"⏭️  {job['sid']}: unchanged, keeping {job['video'].name}")
+        return
+    short = job["short"]
+    background_video = short.get("background_video", DEFAULT_BACKGROUND)
+    print(f"🎬 Rendering {job['sid']} with background: {background_video}")
+    archive = ctx["workspace"] / "audio" / f"{job['sid']}.m4a" if settings.AUDIO_ARCHIVE else None
+    try:
+        job["video"] = render_one(ctx["workspace"], job["sid"], background_video,
+                                  ctx["source_file"], ctx["date_str"],
+                                  threads=ctx["render_threads"], force=ctx["force_render"],
+                                  progress=lambda p: ctx["emit"](job["sid"], "progress", **p),
+                                  audio=job.get("pcm"), archive=archive)
+    finally:
+        job.pop("pcm", None)  # jobs outlive their render; don't hold every short's audio until the run ends
+    print(f"   ✅ Rendered: {job['video'].name}")
+
+
+STAGES = [
+    ("tts", _tts_stage),
+    ("captions", _caption_stage),
+    ("render", _render_stage),
+]
+
+# Event reported when a short enters each stage
+STAGE_EVENTS = {"tts": "tts", "captions": "captions", "render": "rendering"}
+
+
+def _no_events(sid: str, stage: str, **data: Any) -> None:
+    pass
+
+
+def _stage_worker(name: str, func: Callable, ctx: Dict[str, Any],
+                  inbox: queue.Queue, outbox: queue.Queue,
+                  remaining: List[int], lock: threading.Lock) -> None:
+    while True:
+        job = inbox.get()
+        if job is _DONE:
+            inbox.put(_DONE)  # let sibling workers of this stage see it too
+            break
+
+        if job["status"] == "ok":
+            job["stage"] = name
+            if name not in job["skip"]:
+                ctx["emit"](job["sid"], STAGE_EVENTS[name])
+            started = time.perf_counter()
+            try:
+                func(job, ctx)
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = f"{name}: {e}"
+                print(f"❌ {job['sid']} failed in {name}: {e}")
+            job["timings"][name] = round(time.perf_counter() - started, 3)
+
+        # Failed jobs still flow downstream so the final results stay complete
+        outbox.put(job)
+
+    # The last worker of a stage closes the next stage's queue
+    with lock:
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            outbox.put(_DONE)
+
+
+def run_pipeline(payload: Dict[str, Any], workspace: Path,
+                 workers: Dict[str, int] = None, force_render: bool = False,
+                 incremental: bool = True, on_event: Callable[..., None] = None) -> List[Dict[str, Any]]:
+    """Run every short in payload through all stages, overlapping stages across shorts.
+
+    workers maps a stage name to its worker-thread count; render defaults to
+    settings.RENDER_WORKERS (auto-sized from the CPU count). force_render
+    bypasses the render cache. With incremental, only stages whose inputs
+    changed since the run that seeded workspace are re-run. on_event(sid, stage, **data)
+    is called as each short is queued, enters a stage, renders, and finishes.
+
+    Returns one result dict per short, in input order, with status "ok" or "failed".
+    """
+    workers = dict(workers or {})
+    workers.setdefault("render", resolve_render_workers())
+    ctx = {
+        "workspace": workspace,
+        "date_str": payload.get("date", str(date.today())),
+        "source_file": payload.get("source_file", "unknown"),
+        "render_threads": threads_per_job(workers["render"]),
+        "force_render": force_render,
+        "stream_audio": settings.AUDIO_STREAMING,
+        "emit": on_event or _no_events,
+    }
+    plan = plan_incremental(payload, workspace, use_manifest=incremental, stream_audio=ctx["stream_audio"])
+    (workspace / "audio").mkdir(parents=True, exist_ok=True)
+
+    jobs = []
+    for s in payload.get("shorts", []):
+        skip = set(plan[s["id"]]["skip"])
+        if force_render:
+            skip.discard("render")
+        if ctx["stream_audio"] and "render" not in skip:
+            skip.discard("tts")  # the render needs the audio in memory
+        jobs.append({
+            "sid": s["id"], "short": s, "status": "ok", "stage": "queued", "error": "", "timings": {},
+            "skip": skip, "previous_video": plan[s["id"]]["video"],
+        })
+
+    queues = [queue.Queue() for _ in range(len(STAGES) + 1)]
+    threads = []
+    for i, (name, func) in enumerate(STAGES):
+        count = max(1, int(workers.get(name, 1)))
+        remaining, lock = [count], threading.Lock()
+        for n in range(count):
+            t = threading.Thread(
+                target=_stage_worker,
+                args=(name, func, ctx, queues[i], queues[i + 1], remaining, lock),
+                name=f"pipeline-{name}-{n}",
+                daemon=True,
+            )
+            t.start()
+            threads.append(t)
+
+    started = time.perf_counter()
+    for job in jobs:
+        ctx["emit"](job["sid"], "queued")
+        queues[0].put(job)
+    queues[0].put(_DONE)
+
+    # Drain the final queue; results arrive in completion order
+    while True:
+        job = queues[-1].get()
+        if job is _DONE:
+            break
+        if job["status"] == "ok":
+            ctx["emit"](job["sid"], "done", video=str(job["video"]), skipped=sorted(job["skip"]))
+        else:
+            ctx["emit"](job["sid"], "failed", error=job["error"])
+    for t in threads:
+        t.join()
+
+    update_manifest(workspace, {
+        j["sid"]: {"fingerprints": plan[j["sid"]]["fingerprints"], "video": str(j["video"])}
+        if j["status"] == "ok" else None  # failed shorts are retried in full next time
+        for j in jobs
+    })
+
+    elapsed = time.perf_counter() - started
+    ok = sum(1 for j in jobs if j["status"] == "ok")
+    print(f"\n⏱️  Pipeline: {ok}/{len(jobs)} shorts in {elapsed:.1f}s")
+    audio_hits = sum(1 for j in jobs if j.get("audio_cached"))
+    audio_misses = sum(1 for j in jobs if j.get("audio_cached") is False)
+    print(format_cache_stats("Audio", audio_hits, audio_misses))
+
+    return [
+        {
+            "id": j["sid"],
+            "status": j["status"],
+            "error": j["error"],
+            "video": str(j["video"]) if j.get("video") else "",
+            "timings": j["timings"],
+            "audio_cached": bool(j.get("audio_cached")),
+            "skipped": sorted(j["skip"]),
+        }
+        for j in jobs
+    ]
+
+
+# --- Runs ---
+
+def prepare_workspace(workspace: Path, payload: Dict[str, Any], parent_workspace: Optional[Path] = None) -> None:
+    """Create a run's workspace, seeded with hard links to the parent run's outputs and manifest"""
+    for sub in ("audio", "captions", "video"):
+        (workspace / sub).mkdir(parents=True, exist_ok=True)
+
+    if parent_workspace is not None and (parent_workspace / MANIFEST_NAME).exists():
+        manifest = load_manifest(parent_workspace)
+        for sub in ("audio", "captions", "video"):
+            for f in (parent_workspace / sub).glob("*"):
+                if f.is_file() and not f.name.startswith("."):
+                    link_or_copy(f, workspace / sub / f.name)
+        # Seeded video paths must point into this workspace, not the parent's
+        for entry in manifest["shorts"].values():
+            if entry.get("video"):
+                entry["video"] = str(workspace / "video" / Path(entry["video"]).name)
+        (workspace / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    (workspace / SHORTS_NAME).write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def start_run(payload: Dict[str, Any], previous_run_id: Optional[str] = None) -> Dict[str, Any]:
+    """Register a new run in the job store and prepare its workspace"""
+    parent = job_store.get_run(previous_run_id) if previous_run_id else None
+    run = job_store.create_run(payload.get("source_file", "unknown"), total=len(payload.get("shorts", [])),
+                               parent_id=parent["id"] if parent else None)
+    prepare_workspace(Path(run["workspace"]), payload, Path(parent["workspace"]) if parent else None)
+    prune_runs(run["source_file"])
+    return run
+
+
+def prune_runs(source_file: str, keep: Optional[int] = None) -> int:
+    """Delete all but the newest keep runs of source_file (default settings.RUNS_KEEP_PER_SOURCE; 0 = keep all).
+
+    Each /continue gets a new workspace seeded from its parent, so without this
+    disk use grows with every resubmit. Runs still queued or running are kept;
+    seeded files are hard links, so deleting a parent never touches its children.
+    """
+    if keep is None:
+        keep = settings.RUNS_KEEP_PER_SOURCE
+    if keep <= 0:
+        return 0
+    stale = [r for r in job_store.list_runs(limit=-1, source_file=source_file)[keep:]
+             if r["status"] in ("finished", "failed")]
+    for run in stale:
+        shutil.rmtree(run["workspace"], ignore_errors=True)
+        job_store.delete_run(run["id"])
+    if stale:
+        print(f"🧹 Pruned {len(stale)} old run(s) of {source_file}")
+    return len(stale)
+
+
+def execute_run(run: Dict[str, Any], payload: Dict[str, Any], **kwargs: Any) -> List[Dict[str, Any]]:
+    """run_pipeline() for a job-store run, recording its status and results"""
+    job_store.update_run(run["id"], status="running")
+    kwargs.setdefault("on_event", lambda sid, stage, **data: job_store.add_event(run["id"], sid, stage, **data))
+    try:
+        results = run_pipeline(payload, Path(run["workspace"]), **kwargs)
+    except Exception as e:
+        job_store.update_run(run["id"], status="failed", error=str(e))
+        raise
+
+    failed = sum(1 for r in results if r["status"] != "ok")
+    job_store.update_run(run["id"], status="failed" if failed else "finished", results=results,
+                         done=len(results) - failed, failed=failed)
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--shorts", required=True, help="Path to a shorts JSON file (e.g. written by generate_scripts.py --out)")
+    ap.add_argument("--previous-run", default="", help="Run id whose outputs seed this run (only changed shorts are redone)")
+    ap.add_argument("--force-render", action="store_true", help="Re-render even if the render cache has a match")
+    args = ap.parse_args()
+
+    payload = json.loads(Path(args.shorts).read_text(encoding="utf-8"))
+    run = start_run(payload, previous_run_id=args.previous_run or None)
+    print(f"📂 Run {run['id']}: {run['workspace']}")
+    results = execute_run(run, payload, force_render=args.force_render)
+
+    for r in results:
+        if r["status"] != "ok":
+            print(f"❌ {r['id']}: {r['error']}")
+
+
+if __name__ == "__main__":
+    main()
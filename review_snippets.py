@@ -1,17 +1,32 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file
 from pathlib import Path
 import json
+import re
 import subprocess
 import sys
+import threading
+import time
 from datetime import date
 import shutil
 import os
+import tempfile
+import uuid
 import requests
 
+import pipeline
+from config import settings
+from common import job_store, llm_cache, metrics
+from visual_engine import backgrounds
+
 app = Flask(__name__)
 DATA_DIR = Path("data")
 BACKGROUNDS_DIR = Path("assets/backgrounds")
-ORIGINAL_SOURCE_FILE = "manual_entry"  # Track original source filename
+
+def request_source_name(payload):
+    """Source filename sent by the editor, without extension ("manual_entry" for typed-in text)"""
+    name = Path(str(payload.get('source_file') or '')).name
+    name = name.replace('.txt', '').replace('.md', '')
+    return name or "manual_entry"
 
 # Clear old snippets at startup
 def clear_old_snippets():
@@ -24,6 +39,19 @@ def clear_old_snippets():
 
 clear_old_snippets()
 
+def warm_piper_service():
+    """Start the resident Piper service and load the default voice before the first run needs it"""
+    from audio_engine import piper_service
+    from audio_engine.tts import find_voice_model
+    try:
+        if piper_service.ensure_running():
+            piper_service.request({"op": "load", "voice_model": str(find_voice_model().resolve())})
+    except Exception as e:
+        print(f"⚠️  Piper service warm-up failed: {e}")
+
+if settings.PIPER_SERVICE_ENABLED:
+    threading.Thread(target=warm_piper_service, name="piper-warmup", daemon=True).start()
+
 def get_available_backgrounds():
     """Scan backgrounds folder and return list of video files"""
     if not BACKGROUNDS_DIR.exists():
@@ -63,7 +91,7 @@ def get_available_voices():
     
     return sorted(voice_files, key=lambda x: x['display_name'])
 
-def enhance_with_openai(blocks, api_key):
+def enhance_with_openai(blocks, api_key, regenerate=False):
     """Enhance snippets using OpenAI API"""
     import requests
     
@@ -88,31 +116,36 @@ Your task is to optimize the provided script for a YouTube Short (35-60 seconds
 
 Return ONLY the optimized script with line breaks after each sentence. No additional commentary."""
         
-        try:
-            response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers={
-                    'Authorization': f'Bearer {api_key}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': 'gpt-4',
-                    'messages': [
-                        {'role': 'system', 'content': system_prompt},
-                        {'role': 'user', 'content': user_prompt}
-                    ],
-                    'temperature': 0.7,
-                    'max_tokens': 500
-                },
-                timeout=30
-            )
+        def call():
+            with metrics.timed(metrics.LLM_SECONDS, provider="openai", model="gpt-4"):
+                response = requests.post(
+                    'https://api.openai.com/v1/chat/completions',
+                    headers={
+                        'Authorization': f'Bearer {api_key}',
+                        'Content-Type': 'application/json'
+                    },
+                    json={
+                        'model': 'gpt-4',
+                        'messages': [
+                            {'role': 'system', 'content': system_prompt},
+                            {'role': 'user', 'content': user_prompt}
+                        ],
+                        'temperature': 0.7,
+                        'max_tokens': 500
+                    },
+                    timeout=30
+                )
             
-            if response.status_code != 200:
-                print(f"OpenAI API error: {response.status_code} - {response.text}")
-                raise Exception(f"OpenAI API returned {response.status_code}")
+                if response.status_code != 200:
+                    print(f"OpenAI API error: {response.status_code} - {response.text}")
+                    raise Exception(f"OpenAI API returned {response.status_code}")
             
             result = response.json()
-            enhanced_text = result['choices'][0]['message']['content'].strip()
+            return result['choices'][0]['message']['content'].strip()
+
+        try:
+            enhanced_text = llm_cache.cached_call("openai", "gpt-4", system_prompt, user_prompt,
+                                                  0.7, 500, call, bypass=regenerate)
             
             enhanced_blocks.append({
                 "id": f"S{i:03d}",
@@ -139,7 +172,7 @@ Return ONLY the optimized script with line breaks after each sentence. No additi
     return enhanced_blocks
 
 
-def enhance_with_claude(blocks, api_key):
+def enhance_with_claude(blocks, api_key, regenerate=False):
     """Enhance snippets using Anthropic Claude API"""
     import requests
     
@@ -164,31 +197,36 @@ Your task is to optimize the provided script for a YouTube Short (35-60 seconds
 
 Return ONLY the optimized script with line breaks after each sentence. No additional commentary."""
         
-        try:
-            response = requests.post(
-                'https://api.anthropic.com/v1/messages',
-                headers={
-                    'x-api-key': api_key,
-                    'anthropic-version': '2023-06-01',
-                    'content-type': 'application/json'
-                },
-                json={
-                    'model': 'claude-sonnet-4-20250514',
-                    'max_tokens': 1024,
-                    'system': system_prompt,
-                    'messages': [
-                        {'role': 'user', 'content': user_prompt}
-                    ]
-                },
-                timeout=30
-            )
+        def call():
+            with metrics.timed(metrics.LLM_SECONDS, provider="claude", model="claude-sonnet-4-20250514"):
+                response = requests.post(
+                    'https://api.anthropic.com/v1/messages',
+                    headers={
+                        'x-api-key': api_key,
+                        'anthropic-version': '2023-06-01',
+                        'content-type': 'application/json'
+                    },
+                    json={
+                        'model': 'claude-sonnet-4-20250514',
+                        'max_tokens': 1024,
+                        'system': system_prompt,
+                        'messages': [
+                            {'role': 'user', 'content': user_prompt}
+                        ]
+                    },
+                    timeout=30
+                )
             
-            if response.status_code != 200:
-                print(f"Claude API error: {response.status_code} - {response.text}")
-                raise Exception(f"Claude API returned {response.status_code}")
+                if response.status_code != 200:
+                    print(f"Claude API error: {response.status_code} - {response.text}")
+                    raise Exception(f"Claude API returned {response.status_code}")
             
             result = response.json()
-            enhanced_text = result['content'][0]['text'].strip()
+            return result['content'][0]['text'].strip()
+
+        try:
+            enhanced_text = llm_cache.cached_call("claude", "claude-sonnet-4-20250514", system_prompt, user_prompt,
+                                                  None, 1024, call, bypass=regenerate)
             
             enhanced_blocks.append({
                 "id": f"S{i:03d}",
@@ -215,7 +253,7 @@ Return ONLY the optimized script with line breaks after each sentence. No additi
     return enhanced_blocks
 
 
-def enhance_with_perplexity(blocks, api_key):
+def enhance_with_perplexity(blocks, api_key, regenerate=False):
     """Enhance snippets using Perplexity API"""
     import requests
     
@@ -240,29 +278,34 @@ Your task is to optimize the provided script for a YouTube Short (35-60 seconds
 
 Return ONLY the optimized script with line breaks after each sentence. No additional commentary."""
         
-        try:
-            response = requests.post(
-                'https://api.perplexity.ai/chat/completions',
-                headers={
-                    'Authorization': f'Bearer {api_key}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': 'llama-3.1-sonar-small-128k-online',
-                    'messages': [
-                        {'role': 'system', 'content': system_prompt},
-                        {'role': 'user', 'content': user_prompt}
-                    ]
-                },
-                timeout=30
-            )
+        def call():
+            with metrics.timed(metrics.LLM_SECONDS, provider="perplexity", model="llama-3.1-sonar-small-128k-online"):
+                response = requests.post(
+                    'https://api.perplexity.ai/chat/completions',
+                    headers={
+                        'Authorization': f'Bearer {api_key}',
+                        'Content-Type': 'application/json'
+                    },
+                    json={
+                        'model': 'llama-3.1-sonar-small-128k-online',
+                        'messages': [
+                            {'role': 'system', 'content': system_prompt},
+                            {'role': 'user', 'content': user_prompt}
+                        ]
+                    },
+                    timeout=30
+                )
             
-            if response.status_code != 200:
-                print(f"Perplexity API error: {response.status_code} - {response.text}")
-                raise Exception(f"Perplexity API returned {response.status_code}")
+                if response.status_code != 200:
+                    print(f"Perplexity API error: {response.status_code} - {response.text}")
+                    raise Exception(f"Perplexity API returned {response.status_code}")
             
             result = response.json()
-            enhanced_text = result['choices'][0]['message']['content'].strip()
+            return result['choices'][0]['message']['content'].strip()
+
+        try:
+            enhanced_text = llm_cache.cached_call("perplexity", "llama-3.1-sonar-small-128k-online", system_prompt, user_prompt,
+                                                  None, None, call, bypass=regenerate)
             
             enhanced_blocks.append({
                 "id": f"S{i:03d}",
@@ -289,7 +332,7 @@ Return ONLY the optimized script with line breaks after each sentence. No additi
     return enhanced_blocks
 
 
-def enhance_with_grok(blocks, api_key):
+def enhance_with_grok(blocks, api_key, regenerate=False):
     """Enhance snippets using Grok (xAI) API"""
     import requests
     
@@ -314,30 +357,35 @@ Your task is to optimize the provided script for a YouTube Short (35-60 seconds
 
 Return ONLY the optimized script with line breaks after each sentence. No additional commentary."""
         
-        try:
-            response = requests.post(
-                'https://api.x.ai/v1/chat/completions',
-                headers={
-                    'Authorization': f'Bearer {api_key}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': 'grok-beta',
-                    'messages': [
-                        {'role': 'system', 'content': system_prompt},
-                        {'role': 'user', 'content': user_prompt}
-                    ],
-                    'temperature': 0.7
-                },
-                timeout=30
-            )
+        def call():
+            with metrics.timed(metrics.LLM_SECONDS, provider="grok", model="grok-beta"):
+                response = requests.post(
+                    'https://api.x.ai/v1/chat/completions',
+                    headers={
+                        'Authorization': f'Bearer {api_key}',
+                        'Content-Type': 'application/json'
+                    },
+                    json={
+                        'model': 'grok-beta',
+                        'messages': [
+                            {'role': 'system', 'content': system_prompt},
+                            {'role': 'user', 'content': user_prompt}
+                        ],
+                        'temperature': 0.7
+                    },
+                    timeout=30
+                )
             
-            if response.status_code != 200:
-                print(f"Grok API error: {response.status_code} - {response.text}")
-                raise Exception(f"Grok API returned {response.status_code}")
+                if response.status_code != 200:
+                    print(f"Grok API error: {response.status_code} - {response.text}")
+                    raise Exception(f"Grok API returned {response.status_code}")
             
             result = response.json()
-            enhanced_text = result['choices'][0]['message']['content'].strip()
+            return result['choices'][0]['message']['content'].strip()
+
+        try:
+            enhanced_text = llm_cache.cached_call("grok", "grok-beta", system_prompt, user_prompt,
+                                                  0.7, None, call, bypass=regenerate)
             
             enhanced_blocks.append({
                 "id": f"S{i:03d}",
@@ -423,28 +471,23 @@ def upload_file():
         file.save(temp_file)
         
         # Run make_snippets on it
+        snip_path = DATA_DIR / f"snippets_{date.today().isoformat()}.json"
         subprocess.run([
             sys.executable,
             "content_engine/make_snippets.py",
             "--source", file.filename,
             "--max_chars", "700",
-            "--min_chars", "120"
+            "--min_chars", "120",
+            "--out", str(snip_path)
         ], check=True)
         
         # Load the created snippets
-        snip_files = sorted(DATA_DIR.glob("snippets_*.json"))
-        if not snip_files:
+        if not snip_path.exists():
             return jsonify({"status": "error", "message": "Failed to create snippets"}), 500
         
-        snip_path = snip_files[-1]
         snip_data = json.loads(snip_path.read_text(encoding="utf-8"))
         snippets = snip_data.get("snippets", [])
         
-        # Store original source filename
-        global ORIGINAL_SOURCE_FILE
-        ORIGINAL_SOURCE_FILE = file.filename.replace('.txt', '').replace('.md', '')
-        print(f"🔍 Stored source filename: '{ORIGINAL_SOURCE_FILE}'")
-        
         # Get defaults for dropdowns
         backgrounds = get_available_backgrounds()
         voices = get_available_voices()
@@ -502,10 +545,13 @@ def upload_videos():
         if not uploaded:
             return jsonify({"status": "error", "message": "No valid video files uploaded"}), 400
         
+        # Transcode to the render-ready 1080x1920 format in the background; see /backgrounds
+        backgrounds.normalize_in_background(uploaded)
+        
         return jsonify({
             "status": "success",
             "uploaded": uploaded,
-            "message": f"Uploaded {len(uploaded)} video(s)"
+            "message": f"Uploaded {len(uploaded)} video(s); preparing them for rendering"
         })
         
     except Exception as e:
@@ -514,6 +560,16 @@ def upload_videos():
         traceback.print_exc()
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/backgrounds', methods=['GET'])
+def background_catalog():
+    """Normalization status of every background (queued | normalizing | ready | failed)"""
+    entries = {e["name"]: e for e in backgrounds.catalog()}
+    return jsonify({"backgrounds": [
+        {"name": name, "status": entries.get(name, {}).get("status", "not normalized"),
+         "error": entries.get(name, {}).get("error", "")}
+        for name in get_available_backgrounds()
+    ]})
+
 @app.route('/upload-voices', methods=['POST'])
 def upload_voices():
     """Handle voice model uploads (.onnx and .onnx.json files)"""
@@ -570,7 +626,7 @@ def save():
         # Create snippets data structure
         temp_snippets = {
             "date": str(date.today()),
-            "source_file": ORIGINAL_SOURCE_FILE if ORIGINAL_SOURCE_FILE != "manual_entry" else "manual_entry",
+            "source_file": request_source_name(request.json),
             "snippets": []
         }
         
@@ -598,24 +654,25 @@ def save():
         traceback.print_exc()
         return jsonify({"status": "error", "message": str(e)}), 500
 
-Step 3: Update Backend /ai-enhance Route
-File: review_snippets.py
-Find the /ai-enhance route (around line 270). Replace the entire function with:
-python@app.route('/ai-enhance', methods=['POST'])
+@app.route('/ai-enhance', methods=['POST'])
 def ai_enhance():
     """Run AI enhancement on all blocks using local Ollama or online AI providers"""
     blocks = request.json.get('blocks', [])
     ai_mode = request.json.get('ai_mode', 'local')
     api_key = request.json.get('api_key', '')
+    regenerate = bool(request.json.get('regenerate'))  # ask the model again instead of using cached responses
     
     if not blocks:
         return jsonify({"status": "error", "message": "No blocks to enhance"}), 400
     
+    # Per-request scratch dir so concurrent enhance calls never read each other's files
+    temp_dir = Path("data/temp") / uuid.uuid4().hex[:12]
+
     try:
         # Create temporary snippets file
         temp_snippets = {
             "date": str(date.today()),
-            "source_file": ORIGINAL_SOURCE_FILE if ORIGINAL_SOURCE_FILE != "manual_entry" else "manual_entry",
+            "source_file": request_source_name(request.json),
             "snippets": []
         }
         
@@ -626,59 +683,68 @@ def ai_enhance():
             })
         
         # Save temp snippets
-        temp_snip_path = DATA_DIR / f"snippets_{date.today().isoformat()}.json"
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        temp_snip_path = temp_dir / "snippets.json"
         temp_snip_path.write_text(json.dumps(temp_snippets, ensure_ascii=False, indent=2), encoding="utf-8")
         
         # Choose AI enhancement method
+        unchanged = 0  # blocks the model failed on, returned as they were
         if ai_mode == 'local':
             # Use local Ollama (existing method)
+            shorts_path = temp_dir / "shorts.json"
             subprocess.run([
                 sys.executable,
                 "content_engine/generate_scripts.py",
-                "--snippets", str(temp_snip_path)
+                "--snippets", str(temp_snip_path),
+                "--out", str(shorts_path),
+                "--debug-dir", str(temp_dir),  # removed with it below
+                *(["--regenerate"] if regenerate else [])
             ], check=True)
             
             # Load enhanced shorts
-            temp_dir = Path("data/temp")
-            shorts_files = sorted(temp_dir.glob("shorts_*.json"), key=lambda p: p.stat().st_mtime)
-            
-            if not shorts_files:
+            if not shorts_path.exists():
                 return jsonify({"status": "error", "message": "AI enhancement failed"}), 500
             
-            shorts_data = json.loads(shorts_files[-1].read_text(encoding="utf-8"))
+            shorts_data = json.loads(shorts_path.read_text(encoding="utf-8"))
             
             # Get default voice
             voices = get_available_voices()
             default_voice = voices[0]['filename'] if voices else "default.onnx"
             
+            # One entry per block, in order; a block whose generation failed keeps its text
+            shorts_by_snippet = {s.get("source_snippet_id"): s for s in shorts_data.get("shorts", [])}
             enhanced_blocks = []
-            for i, short in enumerate(shorts_data.get("shorts", [])):
-                original_voice = blocks[i].get("voice_model", default_voice) if i < len(blocks) else default_voice
+            for i, block in enumerate(blocks, start=1):
+                short = shorts_by_snippet.get(f"N{i:03d}")
+                if short is None:
+                    short = {"id": f"S{i:03d}", "voice_script": block['text']}
                 
                 enhanced_blocks.append({
                     "id": short["id"],
                     "text": short["voice_script"],
                     "title": short.get("title", ""),
-                    "background_video": short.get("background_video", blocks[i].get("background_video", "ocean.mp4") if i < len(blocks) else "ocean.mp4"),
-                    "speech_speed": short.get("speech_speed", blocks[i].get("speech_speed", "1.0") if i < len(blocks) else "1.0"),
-                    "voice_model": short.get("voice_model", original_voice)
+                    "background_video": short.get("background_video", block.get("background_video", "ocean.mp4")),
+                    "speech_speed": short.get("speech_speed", block.get("speech_speed", "1.0")),
+                    "voice_model": short.get("voice_model", block.get("voice_model", default_voice))
                 })
+            unchanged = len(shorts_data.get("failed", []))
         else:
             # Use online AI provider
             if ai_mode == 'openai':
-                enhanced_blocks = enhance_with_openai(blocks, api_key)
+                enhanced_blocks = enhance_with_openai(blocks, api_key, regenerate)
             elif ai_mode == 'claude':
-                enhanced_blocks = enhance_with_claude(blocks, api_key)
+                enhanced_blocks = enhance_with_claude(blocks, api_key, regenerate)
             elif ai_mode == 'perplexity':
-                enhanced_blocks = enhance_with_perplexity(blocks, api_key)
+                enhanced_blocks = enhance_with_perplexity(blocks, api_key, regenerate)
             elif ai_mode == 'grok':
-                enhanced_blocks = enhance_with_grok(blocks, api_key)
+                enhanced_blocks = enhance_with_grok(blocks, api_key, regenerate)
             else:
                 return jsonify({"status": "error", "message": f"Unknown AI mode: {ai_mode}"}), 400
         
         return jsonify({
             "status": "success",
-            "enhanced_blocks": enhanced_blocks
+            "enhanced_blocks": enhanced_blocks,
+            "unchanged": unchanged
         })
         
     except Exception as e:
@@ -686,13 +752,30 @@ def ai_enhance():
         import traceback
         traceback.print_exc()
         return jsonify({"status": "error", "message": str(e)}), 500
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def stable_short_ids(blocks):
+    """Short ids taken from the editor's block ids, so a block keeps its outputs across resubmits"""
+    ids, seen = [], set()
+    for i, block in enumerate(blocks, start=1):
+        sid = re.sub(r"[^A-Za-z0-9_-]", "", str(block.get('id') or "")) or f"S{i:03d}"
+        base, n = sid, 2
+        while sid in seen:
+            sid = f"{base}-{n}"
+            n += 1
+        seen.add(sid)
+        ids.append(sid)
+    return ids
 
 @app.route('/continue', methods=['POST'])
 @app.route('/process', methods=['POST'])
 def process():
-    """Process blocks directly to audio/captions/video"""
+    """Process blocks directly to audio/captions/video in a new, isolated run"""
     print(f"🔍 Raw request.json: {request.json}")
     blocks = request.json.get('blocks', [])
+    force_render = bool(request.json.get('force_render', False))
+    previous_run_id = request.json.get('previous_run_id') or None
     
     print(f"🔍 Received {len(blocks) if blocks else 0} blocks")
     if blocks:
@@ -701,15 +784,13 @@ def process():
     if not blocks:
         return jsonify({"status": "error", "message": "No blocks to process"}), 400
     
-    temp_dir = Path("data/temp")
-    shorts_file = None
-    
+    run = None
     try:
         # Create shorts JSON directly from blocks
         shorts_data = {
             "date": str(date.today()),
             "channel": "High-Performance Sales",
-            "source_file": ORIGINAL_SOURCE_FILE if ORIGINAL_SOURCE_FILE != "manual_entry" else "manual_entry",
+            "source_file": request_source_name(request.json),
             "shorts": []
         }
         
@@ -717,9 +798,9 @@ def process():
         voices = get_available_voices()
         default_voice = voices[0]['filename'] if voices else "default.onnx"
 
-        for i, block in enumerate(blocks, start=1):
+        for i, (sid, block) in enumerate(zip(stable_short_ids(blocks), blocks), start=1):
             shorts_data["shorts"].append({
-                "id": f"S{i:03d}",
+                "id": sid,
                 "voice_script": block.get('voice_script', block.get('text', '')),
                 "title": block.get('title', f"Short {i}"),
                 "background_video": block.get('background_video', 'ocean.mp4'),
@@ -732,75 +813,191 @@ def process():
                 "hashtags": []
             })    
 
-        # Clear old output directory for today's date to avoid mixing old/new videos
-        date_str = str(date.today())
-        output_date_dir = Path("output") / date_str
-        if output_date_dir.exists():
-            print(f"🗑️  Clearing old output directory: {output_date_dir}")
-            shutil.rmtree(output_date_dir)
-                
-        # Save shorts file
-        temp_dir.mkdir(exist_ok=True)
-        source_name = ORIGINAL_SOURCE_FILE if ORIGINAL_SOURCE_FILE != "manual_entry" else "manual"
-        # ADD THIS DEBUG LINE:
-        print(f"🔍 Using source name for file: '{source_name}' (ORIGINAL_SOURCE_FILE = '{ORIGINAL_SOURCE_FILE}')")
-        shorts_file = temp_dir / f"shorts_{date.today().isoformat()}_{source_name}.json"
-        shorts_file.write_text(json.dumps(shorts_data, ensure_ascii=False, indent=2), encoding="utf-8")
-        
-        
-        # Clear temp JSON files
-        for json_file in temp_dir.glob("*.json"):
-            if json_file != shorts_file:  # Don't delete the one we just created
-                json_file.unlink()
+        # Each run gets its own workspace; the previous run's outputs seed it so
+        # only changed shorts are regenerated
+        run = pipeline.start_run(shorts_data, previous_run_id=previous_run_id)
+        print(f"🔍 Run {run['id']} for source '{shorts_data['source_file']}' in {run['workspace']}")
         
-        # Clear old snippets files
+        # Clear old snippets files so the editor starts blank next time
         print(f"🗑️  Cleaning old snippets files")
         for snippets_file in DATA_DIR.glob("snippets_*.json"):
-            snippets_file.unlink()
-        
-        # Run pipeline
-        print("\n🎤 Starting audio generation...")
-        subprocess.run([sys.executable, "audio_engine/tts.py"], check=True)
-        
-        print("\n📝 Starting caption generation...")
-        subprocess.run([sys.executable, "caption_engine/make_srt.py"], check=True)
-        
-        print("\n🔄 Rewrapping captions...")
-        subprocess.run([sys.executable, "caption_engine/rewrap_srt.py"], check=True)
+            snippets_file.unlink(missing_ok=True)
         
-        print("\n🎬 Rendering videos...")
-        subprocess.run([sys.executable, "visual_engine/render_short.py"], check=True)
-        
-        print("\n✅ Pipeline completed!")
-        return jsonify({"status": "success", "message": "Videos created successfully!"})
+        # Hand off to the worker pools and return right away
+        if settings.JOB_QUEUE_ENABLED:
+            import job_queue
+            job_queue.enqueue_run(shorts_data, Path(run["workspace"]), run["id"], force_render=force_render)
+            return jsonify({
+                "status": "queued",
+                "job_id": run["id"],
+                "run_id": run["id"],
+                "message": f"Queued {len(shorts_data['shorts'])} short(s)"
+            }), 202
+
+        # Run pipeline in the background: each short streams through TTS -> captions -> render
+        # and the editor follows progress on /runs/<run_id>/events
+        print("\n🚀 Starting pipeline...")
+        threading.Thread(
+            target=run_in_background, args=(run, shorts_data, force_render),
+            name=f"run-{run['id']}",
+        ).start()
+        return jsonify({
+            "status": "running",
+            "job_id": run["id"],
+            "run_id": run["id"],
+            "message": f"Started {len(shorts_data['shorts'])} short(s)"
+        }), 202
         
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ Pipeline failed: {e}")
-        return jsonify({"status": "error", "message": f"Pipeline failed: {str(e)}"}), 500
     except Exception as e:
         print(f"\n❌ Unexpected error: {e}")
         import traceback
         traceback.print_exc()
+        if run is not None:
+            job_store.update_run(run["id"], status="failed", error=str(e))
         return jsonify({"status": "error", "message": f"Unexpected error: {str(e)}"}), 500
-    finally:
-        # ALWAYS clean up temp files, even if pipeline fails
-        print("\n🗑️  Cleaning up temp files...")
-        if temp_dir.exists():
-            for json_file in temp_dir.glob("*.json"):
-                try:
-                    json_file.unlink()
-                    print(f"   Deleted: {json_file.name}")
-                except Exception as e:
-                    print(f"   Failed to delete {json_file.name}: {e}")
-        
-        # Clean up model debug files
-        for debug_file in DATA_DIR.glob("_last_model_output*.txt"):
-            try:
-                debug_file.unlink()
-                print(f"   Deleted: {debug_file.name}")
-            except Exception as e:
-                print(f"   Failed to delete {debug_file.name}: {e}")
                 
+def run_in_background(run, shorts_data, force_render):
+    """Thread target for an in-process run; its status and errors land in the job store"""
+    try:
+        results = pipeline.execute_run(run, shorts_data, force_render=force_render)
+    except Exception as e:
+        print(f"\n❌ Run {run['id']} crashed: {e}")
+        import traceback
+        traceback.print_exc()
+        return
+
+    failed = [r for r in results if r["status"] != "ok"]
+    if failed:
+        print(f"\n❌ Pipeline finished with {len(failed)} failed short(s)")
+    else:
+        print("\n✅ Pipeline completed!")
+
+def get_run_status(run_id):
+    """Run row from the job store, refreshed from the worker queue for queued runs"""
+    run = job_store.get_run(run_id)
+    if run is not None and run["status"] in ("queued", "running") and settings.JOB_QUEUE_ENABLED:
+        import job_queue
+        job_queue.sync_run(run_id)
+        run = job_store.get_run(run_id)
+    return run
+
+@app.route('/preview', methods=['POST'])
+def preview():
+    """Draft 540x960 render of one block, streamed back as soon as it's encoded"""
+    from audio_engine.tts import synthesize_short
+    from caption_engine.captions import caption_short
+    from visual_engine.render_short import render_preview
+    from io import BytesIO
+
+    block = request.json.get('block') or {}
+    if not block.get('voice_script', '').strip():
+        return jsonify({"status": "error", "message": "Nothing to preview"}), 400
+    seconds = float(request.json.get('seconds', settings.PREVIEW_SECONDS)) or None
+
+    sid = re.sub(r'[^A-Za-z0-9_-]', '', str(block.get('id') or 'preview')) or 'preview'
+    voices = get_available_voices()
+    short = {
+        "id": sid,
+        "voice_script": block['voice_script'],
+        "background_video": block.get('background_video', 'ocean.mp4'),
+        "voice_model": block.get('voice_model', voices[0]['filename'] if voices else "default.onnx"),
+        "speech_speed": block.get('speech_speed', '1.0'),
+    }
+    # Sentence-level TTS cache and the preview cache make re-previews of small edits fast.
+    # Each request gets its own workspace, so concurrent previews of a block never touch each other's files.
+    Path(settings.PREVIEW_DIR).mkdir(parents=True, exist_ok=True)
+    source = re.sub(r'[^A-Za-z0-9_.-]', '_', request_source_name(request.json))
+    workspace = Path(tempfile.mkdtemp(prefix=f"{source}-", dir=settings.PREVIEW_DIR))
+    try:
+        audio, _ = synthesize_short(short, workspace / "audio")
+        caption_short(short, audio, workspace / "captions")
+        video = render_preview(workspace, sid, short["background_video"], seconds).read_bytes()  # a small draft
+    except Exception as e:
+        print(f"❌ Preview of {sid} failed: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+    return send_file(BytesIO(video), mimetype='video/mp4', conditional=True)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Current status of a run and its shorts"""
+    run = get_run_status(job_id)
+    if run is None:
+        return jsonify({"status": "error", "message": f"Unknown job: {job_id}"}), 404
+    return jsonify(run)
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Per-short results of a run once every short has finished or failed"""
+    run = get_run_status(job_id)
+    if run is None:
+        return jsonify({"status": "error", "message": f"Unknown job: {job_id}"}), 404
+    if run["status"] not in ("finished", "failed"):
+        return jsonify({"status": run["status"], "message": "Job still running"}), 202
+
+    return jsonify({"status": "success" if run["status"] == "finished" else "error", "results": run["results"]})
+
+@app.route('/llm-cache', methods=['GET'])
+def llm_cache_stats():
+    """Size and hit rate of the LLM response cache"""
+    return jsonify(llm_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint: stage latency histograms and failure counters"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def sse_message(event, data, event_id=None):
+    """One Server-Sent Events message"""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, ensure_ascii=False)}"]
+    return "\n".join(lines) + "\n\n"
+
+@app.route('/runs/<run_id>/events', methods=['GET'])
+def run_events(run_id):
+    """Server-Sent Events: per-short stage changes and render progress, then a final "run" event"""
+    if job_store.get_run(run_id) is None:
+        return jsonify({"status": "error", "message": f"Unknown run: {run_id}"}), 404
+
+    # EventSource sends Last-Event-ID when it reconnects, so nothing is replayed twice
+    try:
+        after = max(0, int(request.headers.get('Last-Event-ID') or request.args.get('after') or 0))
+    except ValueError:
+        after = 0
+
+    def stream():
+        last_id = after
+        last_sent = time.monotonic()
+        finished = False
+        while True:
+            events = job_store.list_events(run_id, after=last_id)
+            for ev in events:
+                last_id = ev["id"]
+                kind = "progress" if ev["stage"] == "progress" else "stage"
+                yield sse_message(kind, {"id": ev["short_id"], "stage": ev["stage"], **ev["data"]}, ev["id"])
+                last_sent = time.monotonic()
+
+            # One more pass after the run ends picks up events written just before it did
+            if finished and not events:
+                run = job_store.get_run(run_id)
+                if run is None:  # pruned (see pipeline.prune_runs) while we were streaming
+                    yield sse_message("run", {"id": run_id, "status": "failed", "total": 0, "done": 0, "failed": 0,
+                                              "error": "Run no longer exists", "results": []})
+                else:
+                    yield sse_message("run", {k: run[k] for k in ("id", "status", "total", "done", "failed", "error", "results")})
+                return
+            run = get_run_status(run_id)
+            finished = run is None or run["status"] in ("finished", "failed")
+
+            if time.monotonic() - last_sent > 15:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(settings.EVENTS_POLL_INTERVAL)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/download-videos', methods=['GET'])
 def download_videos():
     """Create a ZIP file of all generated videos and send to user"""
@@ -808,19 +1005,23 @@ def download_videos():
     from io import BytesIO
     
     try:
-        # Find the most recent output directory
-        output_dirs = sorted(Path("output").glob("20??-??-??"), reverse=True)
-        if not output_dirs:
+        # Videos of the requested run, or the most recent one
+        run_id = request.args.get('run_id', '')
+        if run_id:
+            run = job_store.get_run(run_id)
+        else:
+            runs = job_store.list_runs(limit=1)
+            run = runs[0] if runs else None
+        if run is None:
             return jsonify({"status": "error", "message": "No videos found"}), 404
         
-        latest_dir = output_dirs[0]
-        video_dir = latest_dir / "video"
+        video_dir = Path(run["workspace"]) / "video"
         
         if not video_dir.exists():
             return jsonify({"status": "error", "message": "No videos found"}), 404
         
-        # Get all video files
-        video_files = list(video_dir.glob("*.mp4"))
+        # Get all video files (and poster frames of any extra output profiles)
+        video_files = sorted(p for p in video_dir.iterdir() if p.suffix in (".mp4", ".jpg"))
         if not video_files:
             return jsonify({"status": "error", "message": "No videos found"}), 404
         
@@ -837,7 +1038,7 @@ def download_videos():
             zip_buffer,
             mimetype='application/zip',
             as_attachment=True,
-            download_name=f'videos_{latest_dir.name}.zip'
+            download_name=f'videos_{run["id"]}.zip'
         )
         
     except Exception as e:
@@ -0,0 +1,40 @@
+# tests/conftest.py
+"""Shared fixtures: run from the repo root with `python -m pytest -q`."""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The project is script-style modules, not an installed package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in a scratch directory, with the caches, job store and metrics kept inside it"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "METRICS_DIR", str(tmp_path / "data" / "metrics"))
+    monkeypatch.setattr(settings, "JOB_STORE_PATH", str(tmp_path / "data" / "jobs.db"))
+    monkeypatch.setattr(settings, "LLM_CACHE_DB", str(tmp_path / "cache" / "llm_responses.db"))
+    return tmp_path
+
+
+STUBS_DIR = Path(__file__).resolve().parent.parent / "bench" / "stubs"
+
+
+@pytest.fixture
+def stub_tools(workdir, monkeypatch):
+    """bench/stubs' piper, ffmpeg and ffprobe on PATH, with a stub voice and background to feed them"""
+    monkeypatch.setenv("PATH", f"{STUBS_DIR}:{os.environ.get('PATH', '')}")
+    monkeypatch.setenv("BENCH_PIPER_LATENCY", "0")
+    monkeypatch.setenv("BENCH_FFPROBE_LATENCY", "0")
+    monkeypatch.setenv("BENCH_FFMPEG_SPEED", "1000")
+    monkeypatch.setattr(settings, "PIPER_SERVICE_ENABLED", False)
+    (workdir / "assets" / "piper_voice").mkdir(parents=True)
+    (workdir / "assets" / "piper_voice" / "bench.onnx").write_bytes(b"stub voice")
+    (workdir / "assets" / "backgrounds").mkdir(parents=True)
+    (workdir / "assets" / "backgrounds" / "ocean.mp4").write_bytes(b"stub video")
+    return workdir
@@ -0,0 +1,96 @@
+import json
+import wave
+
+import numpy as np
+import pytest
+
+from config import settings
+from audio_engine.tts import timings_path
+from caption_engine import captions
+
+RATE = 16000
+
+
+def timings(*sentences, duration):
+    return {"duration": duration,
+            "sentences": [{"text": text, "start": start, "end": end} for text, start, end in sentences]}
+
+
+def write_wav(path, *segments):
+    """segments: (seconds, loud) pairs"""
+    parts = [np.full(int(seconds * RATE), 8000 if loud else 0, dtype="<i2") for seconds, loud in segments]
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(np.concatenate(parts).tobytes())
+    return path
+
+
+def test_cues_from_sentence_timings(workdir):
+    script = "The ocean covers most of our planet. It hides.\nWhy it matters."
+    tts = timings(("The ocean covers most of our planet.", 0.0, 2.0), ("It hides.", 2.3, 3.0),
+                  ("Why it matters.", 3.4, 4.5), duration=5.0)
+
+    cues, method = captions.build_cues(script, None, tts)
+
+    assert method == "sentence timings"
+    # Each line holds through the pause after it; the last runs to the end of the audio
+    assert [(start, end) for start, end, _ in cues] == [(0.0, 3.4), (3.4, 5.0)]
+    assert cues[1][2] == "Why it matters"
+    assert cues[0][2].split("\n") == ["The ocean covers most of", "our planet. It hides"]
+
+
+def test_timings_sidecar_is_read_next_to_the_audio(workdir):
+    wav = write_wav(workdir / "S001.wav", (1.0, True), (0.5, False), (1.0, True))
+    sidecar = timings(("One.", 0.0, 1.0), ("Two.", 1.5, 2.5), duration=2.5)
+    timings_path(wav).write_text(json.dumps(sidecar), encoding="utf-8")
+
+    cues, method = captions.build_cues("One.\nTwo.", wav)
+    assert method == "sentence timings"
+    assert [(start, end) for start, end, _ in cues] == [(0.0, 1.5), (1.5, 2.5)]
+
+
+def test_stale_timings_fall_back_to_a_silence_scan(workdir):
+    wav = write_wav(workdir / "S001.wav", (1.0, True), (0.6, False), (2.0, True))
+    stale = timings(("Something else entirely.", 0.0, 3.6), duration=3.6)
+
+    cues, method = captions.build_cues("Short line.\nA much longer line of many more words here.", wav, stale)
+    assert method == "silence scan"
+    # Word counts alone would put the boundary near 0.5s; the scan snaps it into the pause
+    assert cues[0][1] == pytest.approx(1.3, abs=0.02)
+    assert cues[1] == (cues[0][1], pytest.approx(3.6), "A much longer line of\nmany more words here")
+
+
+def test_word_count_timing(workdir, monkeypatch):
+    monkeypatch.setattr(settings, "CAPTION_TIMING", "words")
+    tts = timings(("One two three.", 0.0, 1.0), ("Four.", 1.2, 2.0), duration=4.0)
+
+    cues, method = captions.build_cues("One two three.\nFour.", None, tts)
+    assert method == "word counts"
+    assert [(start, end) for start, end, _ in cues] == [(0.0, 3.0), (3.0, 4.0)]
+
+
+def test_render_ass_escapes_and_times_cues():
+    ass = captions.render_ass([(0.0, 1.234, "{bold} a\\b\nnext line"), (61.5, 3725.0, "end")])
+    events = [line for line in ass.splitlines() if line.startswith("Dialogue:")]
+
+    assert "[V4+ Styles]" in ass and f"PlayResX: {captions.PLAY_RES[0]}" in ass
+    assert events == [
+        "Dialogue: 0,0:00:00.00,0:00:01.23,Default,,0,0,0,,(bold) a⧵b\\Nnext line",
+        "Dialogue: 0,0:01:01.50,1:02:05.00,Default,,0,0,0,,end",
+    ]
+
+
+def test_caption_short_replaces_linked_file(workdir):
+    out_dir = workdir / "captions"
+    out_dir.mkdir()
+    previous = workdir / "previous.ass"
+    previous.write_text("old run", encoding="utf-8")
+    (out_dir / "S001.ass").hardlink_to(previous)
+    short = {"id": "S001", "voice_script": "Hello there."}
+
+    out = captions.caption_short(short, None, out_dir, timings(("Hello there.", 0.0, 1.0), duration=1.0))
+
+    assert "Hello there" in out.read_text(encoding="utf-8")
+    assert previous.read_text(encoding="utf-8") == "old run"
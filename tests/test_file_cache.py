@@ -0,0 +1,101 @@
+import os
+import time
+
+import pytest
+
+from common import file_cache
+from common.file_cache import FileCache, make_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FileCache(tmp_path / "cache", max_bytes=5000, suffix=".wav")
+
+
+def source(tmp_path, name, size=1000):
+    path = tmp_path / "src" / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(name.encode() * (size // len(name)) + b"x" * (size % len(name)))
+    return path
+
+
+def entries(cache):
+    return sorted(p.stem for p in cache.root.glob("*/*.wav"))
+
+
+def test_store_and_fetch(tmp_path, cache):
+    src = source(tmp_path, "a")
+    cache.store(make_key("a"), src)
+    dest = tmp_path / "out" / "a.wav"
+
+    assert cache.fetch(make_key("a"), dest)
+    assert dest.read_bytes() == src.read_bytes()
+    assert not cache.fetch(make_key("b"), tmp_path / "out" / "b.wav")
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_fetched_file_is_replaced_not_written_through(tmp_path, cache):
+    cache.store(make_key("a"), source(tmp_path, "a"))
+    dest = tmp_path / "a.wav"
+    cache.fetch(make_key("a"), dest)
+    cache.store(make_key("b"), source(tmp_path, "b"))
+    cache.fetch(make_key("b"), dest)  # over a hard link to entry "a"
+
+    cache.fetch(make_key("a"), tmp_path / "again.wav")
+    assert (tmp_path / "again.wav").read_bytes().startswith(b"aaa")
+
+
+def test_evicts_least_recently_used_down_to_low_water(tmp_path, cache):
+    for i in range(5):
+        cache.store(make_key(i), source(tmp_path, f"s{i}"))
+        os.utime(cache.path_for(make_key(i)), (1000 + i, 1000 + i))  # s0 oldest
+    cache.fetch(make_key(0), tmp_path / "used.wav")  # s0 becomes most recently used
+
+    cache.store(make_key(5), source(tmp_path, "s5"))  # 6000 bytes > 5000
+
+    kept = entries(cache)
+    assert make_key(0) in kept and make_key(5) in kept
+    assert make_key(1) not in kept
+    assert len(kept) * 1000 <= 5000 * file_cache.EVICT_TO
+
+
+def test_store_under_the_bound_does_not_rescan(tmp_path, cache, monkeypatch):
+    scans = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: scans.append(1) or evict())
+
+    for i in range(4):
+        cache.store(make_key(i), source(tmp_path, f"s{i}"))
+    assert len(scans) == 1  # only the first store, to learn the size
+
+    cache.store(make_key(0), source(tmp_path, "s0"))  # replacing an entry doesn't grow the estimate
+    assert len(scans) == 1
+
+    cache.store(make_key(4), source(tmp_path, "s4"))
+    cache.store(make_key(5), source(tmp_path, "s5"))  # over the bound
+    assert len(scans) == 2
+
+
+def test_rescans_after_interval(tmp_path, cache, monkeypatch):
+    cache.store(make_key(0), source(tmp_path, "s0"))
+    # Another process fills the cache behind our back
+    other = FileCache(cache.root, max_bytes=10 ** 9, suffix=".wav")
+    for i in range(1, 6):
+        other.store(make_key(i), source(tmp_path, f"s{i}"))
+
+    cache.store(make_key(6), source(tmp_path, "s6"))
+    assert len(entries(cache)) == 7  # estimate still says 2000 bytes
+
+    monkeypatch.setattr(file_cache, "RESCAN_SECONDS", 0.0)
+    cache.store(make_key(7), source(tmp_path, "s7"))
+    assert len(entries(cache)) * 1000 <= 5000
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = FileCache(tmp_path / "cache", max_bytes=10 ** 6, max_age=60, suffix=".wav")
+    cache.store(make_key("a"), source(tmp_path, "a"))
+    old = time.time() - 120
+    os.utime(cache.path_for(make_key("a")), (old, old))
+
+    assert not cache.fetch(make_key("a"), tmp_path / "a.wav")
+    assert not cache.path_for(make_key("a")).exists()
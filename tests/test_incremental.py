@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pytest
+
+import pipeline
+
+
+def payload(**overrides):
+    shorts = {
+        "S001": {"id": "S001", "voice_script": "Unchanged script. Stays the same.", "background_video": "ocean.mp4"},
+        "S002": {"id": "S002", "voice_script": "This one gets edited.", "background_video": "ocean.mp4"},
+        "S003": {"id": "S003", "voice_script": "Only the background moves.", "background_video": "ocean.mp4"},
+        "S004": {"id": "S004", "voice_script": "This block is deleted.", "background_video": "ocean.mp4"},
+    }
+    for sid, change in overrides.items():
+        if change is None:
+            del shorts[sid]
+        else:
+            shorts[sid] = {**shorts[sid], **change}
+    return {"source_file": "inc.txt", "date": "2026-01-01", "shorts": list(shorts.values())}
+
+
+@pytest.fixture
+def previous_run(stub_tools):
+    (stub_tools / "assets" / "backgrounds" / "beach.mp4").write_bytes(b"another stub video")
+    first = payload()
+    run = pipeline.start_run(first)
+    results = pipeline.execute_run(run, first)
+    assert [r["status"] for r in results] == ["ok"] * 4
+    return run
+
+
+def test_plan_skips_only_unchanged_stages(previous_run):
+    edited = payload(S002={"voice_script": "This one was edited."}, S003={"background_video": "beach.mp4"}, S004=None)
+    run = pipeline.start_run(edited, previous_run_id=previous_run["id"])
+    workspace = Path(run["workspace"])
+    old_video = Path(pipeline.load_manifest(workspace)["shorts"]["S004"]["video"])
+    assert old_video.exists()
+
+    plan = pipeline.plan_incremental(edited, workspace)
+
+    assert plan["S001"]["skip"] == {"tts", "captions", "render"}
+    assert plan["S002"]["skip"] == set()
+    assert plan["S003"]["skip"] == {"tts", "captions"}
+    assert "S004" not in plan
+    assert not old_video.exists()  # the deleted block's outputs are cleaned up
+    assert "S004" not in pipeline.load_manifest(workspace)["shorts"]
+
+
+def test_rerun_reports_skipped_stages(previous_run):
+    edited = payload(S002={"voice_script": "This one was edited."})
+    run = pipeline.start_run(edited, previous_run_id=previous_run["id"])
+    results = {r["id"]: r for r in pipeline.execute_run(run, edited)}
+
+    assert results["S001"]["skipped"] == ["captions", "render", "tts"]
+    assert results["S002"]["skipped"] == []
+    assert all(r["status"] == "ok" and Path(r["video"]).exists() for r in results.values())
+
+
+def test_missing_wav_is_only_fine_when_streaming(previous_run):
+    run = pipeline.start_run(payload(), previous_run_id=previous_run["id"])
+    workspace = Path(run["workspace"])
+    (workspace / "audio" / "S001.wav").unlink()
+
+    assert "tts" in pipeline.plan_incremental(payload(), workspace, stream_audio=True)["S001"]["skip"]
+    assert pipeline.plan_incremental(payload(), workspace)["S001"]["skip"] == set()
+
+
+def test_without_manifest_nothing_is_skipped(previous_run):
+    run = pipeline.start_run(payload(), previous_run_id=previous_run["id"])
+    plan = pipeline.plan_incremental(payload(), Path(run["workspace"]), use_manifest=False)
+    assert all(p["skip"] == set() for p in plan.values())
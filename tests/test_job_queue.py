@@ -0,0 +1,36 @@
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fakeredis")
+pytest.importorskip("rq")
+
+import job_queue
+import pipeline
+
+
+@pytest.fixture
+def local_queue(stub_tools, monkeypatch):
+    monkeypatch.setenv("REDIS_URL", "fakeredis://")
+    return stub_tools
+
+
+def test_local_run_completes(local_queue):
+    payload = {"source_file": "q.txt", "shorts": [
+        {"id": "S001", "voice_script": "First sentence. Second sentence.", "background_video": "ocean.mp4"},
+        {"id": "S002", "voice_script": "Another short entirely.", "background_video": "ocean.mp4"},
+    ]}
+    run = pipeline.start_run(payload)
+    job_queue.enqueue_run(payload, Path(run["workspace"]), run["id"])
+    job_queue.run_local_worker()
+
+    deadline = time.monotonic() + 30
+    status = job_queue.get_run(run["id"])
+    while status["status"] not in ("finished", "failed") and time.monotonic() < deadline:
+        time.sleep(0.1)
+        status = job_queue.get_run(run["id"])
+
+    assert status["status"] == "finished", status
+    assert [s["stage"] for s in status["shorts"]] == ["done", "done"]
+    assert all(Path(s["video"]).exists() for s in status["shorts"])
@@ -0,0 +1,39 @@
+import pytest
+
+from config import settings
+from visual_engine.render_short import background_offset, decode_windows
+
+BG = {"duration": 60.0, "keyframes": [float(k) for k in range(0, 60, 2)]}
+
+
+def pending(*stretches):
+    return [{"bg": {"offset": offset}, "duration": duration} for offset, duration in stretches]
+
+
+def test_background_offset_is_a_keyframe_with_room_for_the_short():
+    offsets = {background_offset(f"S{i:03d}", "ocean.mp4", BG, 20.0) for i in range(40)}
+    assert offsets <= {k for k in BG["keyframes"] if k + 20.0 <= 60.0}
+    assert len(offsets) > 1  # shorts spread across the clip
+
+
+def test_background_offset_is_deterministic():
+    assert background_offset("S001", "ocean.mp4", BG, 20.0) == background_offset("S001", "ocean.mp4", BG, 20.0)
+
+
+@pytest.mark.parametrize("bg_info", [{"duration": 15.0, "keyframes": [0.0, 2.0]}, {"duration": 60.0}, {}])
+def test_background_offset_without_a_usable_keyframe(bg_info):
+    assert background_offset("S001", "ocean.mp4", bg_info, 20.0) == 0.0
+
+
+def test_decode_windows_groups_nearby_stretches():
+    # 0-20 and 22-42 are within the gap; 50-70 is not; 30-35 lies inside the first group
+    shorts = pending((50.0, 20.0), (0.0, 20.0), (30.0, 5.0), (22.0, 20.0))
+    assert decode_windows(shorts, gap=5.0) == [[1, 3, 2], [0]]
+
+
+def test_decode_windows_gap_defaults_to_setting(monkeypatch):
+    shorts = pending((0.0, 10.0), (13.0, 10.0))
+    monkeypatch.setattr(settings, "RENDER_SHARED_DECODE_GAP", 2.0)
+    assert decode_windows(shorts) == [[0], [1]]
+    monkeypatch.setattr(settings, "RENDER_SHARED_DECODE_GAP", 5.0)
+    assert decode_windows(shorts) == [[0, 1]]
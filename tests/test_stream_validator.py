@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from content_engine.generate_scripts import PREAMBLE_LIMIT, SchemaMismatch, StreamValidator, _parse_payload
+
+GOOD = {"hook": "h", "voice_script": "v", "on_screen_text": ["a"], "visual_cues": ["b"],
+        "title": "t", "description": "d", "hashtags": ["#x"]}
+
+
+def payload(*shorts):
+    return json.dumps({"date": "x", "channel": "c", "shorts": list(shorts)}, indent=2)
+
+
+def feed(validator, text, size=7):
+    """Feed text in small chunks, as a stream would; True once the object closed"""
+    done = False
+    for i in range(0, len(text), size):
+        done = validator.feed(text[i:i + size])
+        if done:
+            break
+    return done
+
+
+@pytest.mark.parametrize("reply", [
+    payload(GOOD),
+    "```json\n" + payload(GOOD) + "\n```",
+    "Sure! Here is the JSON you asked for:\n\n" + payload(GOOD),
+    payload(GOOD) + "\nHope this helps!",
+])
+def test_accepts_fenced_prefaced_and_trailing_text(reply):
+    v = StreamValidator(1)
+    assert feed(v, reply)
+    data = _parse_payload(v.text[:v.end + 1], 1)
+    assert data["shorts"][0]["title"] == "t"
+    assert [s["id"] for s in v.shorts] == ["S001"]
+
+
+def test_strings_with_brackets_and_escapes():
+    short = dict(GOOD, voice_script='he said "}]" \\" {[ ok')
+    v = StreamValidator(1)
+    assert feed(v, payload(short))
+    assert v.shorts[0]["voice_script"] == short["voice_script"]
+
+
+def test_aborts_on_prose_without_json():
+    v = StreamValidator(1)
+    with pytest.raises(SchemaMismatch, match="No JSON object"):
+        feed(v, "I'm sorry, I can't help with that. " * 40)
+    assert len(v.text) <= PREAMBLE_LIMIT + 7
+
+
+def test_aborts_when_a_short_closes_without_required_keys():
+    bad = dict(GOOD)
+    del bad["title"]
+    text = payload(bad, GOOD)
+    v = StreamValidator(2)
+    with pytest.raises(SchemaMismatch, match="missing keys"):
+        feed(v, text)
+    assert len(v.text) < text.index('"hook"', text.index('"hook"') + 1)  # stopped before the second short
+
+
+def test_salvages_shorts_completed_before_the_failure():
+    bad = dict(GOOD, on_screen_text=[])
+    v = StreamValidator(3)
+    with pytest.raises(SchemaMismatch) as e:
+        feed(v, payload(GOOD, bad, GOOD))
+    assert [s["hook"] for s in e.value.salvaged] == ["h"]
+
+
+@pytest.mark.parametrize("reply, message", [
+    (json.dumps({"shorts": {"a": 1}}), "not a list"),
+    (payload(GOOD, GOOD), "More than 1"),
+    (json.dumps({"shorts": [dict(GOOD, visual_cues="x")]}), "must be a list"),
+    (json.dumps({"date": "x"}), "No 'shorts'"),
+])
+def test_schema_violations(reply, message):
+    with pytest.raises(SchemaMismatch, match=message):
+        feed(StreamValidator(1), reply)
+
+
+def test_too_few_shorts():
+    with pytest.raises(SchemaMismatch, match="Expected 2 items, got 1"):
+        feed(StreamValidator(2), payload(GOOD))
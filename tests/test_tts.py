@@ -0,0 +1,65 @@
+import wave
+
+import pytest
+
+from audio_engine import tts
+
+
+def test_split_sentences():
+    script = "First line. Second sentence!  Third?\n\n  \"Quoted\" start. lower case stays.\nLast"
+    assert tts.split_sentences(script) == [
+        "First line.", "Second sentence!", "Third?", "\"Quoted\" start. lower case stays.", "Last",
+    ]
+
+
+def test_assemble_pcm_spans_include_silence(tmp_path):
+    parts = []
+    for i, frames in enumerate((22050, 11025)):
+        path = tmp_path / f"{i}.wav"
+        with wave.open(str(path), "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(22050)
+            w.writeframes(b"\x01\x00" * frames)
+        parts.append(path)
+
+    audio = tts.assemble_pcm(parts, sentence_silence=0.5)
+    assert audio["spans"] == [(0.0, 1.0), (1.5, 2.0)]
+    assert audio["duration"] == 2.0
+    assert len(audio["pcm"]) == 2 * 22050 * 2
+
+
+@pytest.fixture
+def synthesized(stub_tools, monkeypatch):
+    """Records which sentences reach Piper"""
+    calls = []
+    synthesize = tts._synthesize_sentences
+
+    def record(todo, model_path, length_scale):
+        calls.append([sentence for sentence, _ in todo])
+        synthesize(todo, model_path, length_scale)
+
+    monkeypatch.setattr(tts, "_synthesize_sentences", record)
+    return calls
+
+
+def test_only_changed_sentences_are_synthesized(synthesized):
+    audio, cached = tts.synthesize_pcm("One sentence here. Another one here.", "bench.onnx")
+    assert not cached
+    assert synthesized == [["One sentence here.", "Another one here."]]
+
+    again, cached = tts.synthesize_pcm("One sentence here. Another one here.", "bench.onnx")
+    assert cached and again["digest"] == audio["digest"]
+
+    tts.synthesize_pcm("One sentence here. A new ending.", "bench.onnx")
+    assert synthesized[-1] == ["A new ending."]
+
+
+def test_timings_follow_sentence_audio(synthesized):
+    audio, _ = tts.synthesize_pcm("Short one. This sentence is quite a lot longer.", "bench.onnx",
+                                  sentence_silence=0.25)
+    first, second = audio["timings"]["sentences"]
+    assert first["text"] == "Short one." and first["start"] == 0.0
+    assert second["start"] == pytest.approx(first["end"] + 0.25, abs=0.001)
+    assert second["end"] - second["start"] > first["end"] - first["start"]
+    assert audio["timings"]["duration"] == pytest.approx(second["end"], abs=0.001)
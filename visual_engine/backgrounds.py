@@ -0,0 +1,217 @@
+# visual_engine/backgrounds.py
+"""
+Normalized background library.
+
+Uploaded backgrounds come in any codec, resolution and frame rate (often
+4K 60fps phone footage). Each one is transcoded once into a 1080x1920,
+30fps H.264 intermediate with a short, fixed GOP, so renders can use it
+as-is: no per-frame scale/crop, cheap decoding, and keyframes to seek to.
+
+The catalog (SQLite, settings.BACKGROUND_CATALOG_DB) tracks every
+background's normalization status. Entries are tied to the source's size
+and mtime, so replacing an upload makes its old intermediate stale.
+
+    python visual_engine/backgrounds.py            # normalize every background
+    python visual_engine/backgrounds.py --list     # show the catalog
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+if __package__ in (None, ""):
+    # Allow `python visual_engine/backgrounds.py` to import project modules
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+from common import media_probe
+from common.file_cache import make_key
+from visual_engine.render_short import BACKGROUNDS_DIR, WIDTH, HEIGHT, FPS
+
+VIDEO_EXTENSIONS = [".mp4", ".mov", ".avi", ".webm"]
+
+GOP = max(1, int(FPS * settings.BACKGROUND_GOP_SECONDS))
+NORMALIZE_ENCODER_ARGS = [
+    "-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p",
+    "-g", str(GOP), "-keyint_min", str(GOP), "-sc_threshold", "0",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backgrounds (
+    name            TEXT PRIMARY KEY,           -- file name in assets/backgrounds
+    status          TEXT NOT NULL,              -- queued | normalizing | ready | failed
+    source_size     INTEGER NOT NULL,
+    source_mtime_ns INTEGER NOT NULL,
+    normalized      TEXT NOT NULL DEFAULT '',   -- path of the intermediate once ready
+    info            TEXT NOT NULL DEFAULT '{}', -- JSON probe of the intermediate
+    error           TEXT NOT NULL DEFAULT '',
+    updated_at      REAL NOT NULL
+);
+"""
+
+# One transcode at a time per process; each is already multi-threaded
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bg-normalize")
+_name_locks: Dict[str, threading.Lock] = {}
+_name_locks_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    path = Path(settings.BACKGROUND_CATALOG_DB)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _row_to_entry(row: sqlite3.Row) -> Dict[str, Any]:
+    entry = dict(row)
+    entry["info"] = json.loads(entry["info"] or "{}")
+    return entry
+
+
+def _set(name: str, source: Path, status: str, **fields: Any) -> None:
+    st = source.stat()
+    with closing(_connect()) as conn, conn:
+        # Keeps the previous intermediate's path until a new one is ready, so it can be cleaned up
+        conn.execute(
+            "INSERT INTO backgrounds (name, status, source_size, source_mtime_ns, normalized, info, error, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET status = excluded.status, source_size = excluded.source_size, "
+            "source_mtime_ns = excluded.source_mtime_ns, info = excluded.info, error = excluded.error, "
+            "updated_at = excluded.updated_at, "
+            "normalized = CASE WHEN excluded.normalized != '' THEN excluded.normalized ELSE normalized END",
+            (name, status, st.st_size, st.st_mtime_ns, fields.get("normalized", ""),
+             json.dumps(fields.get("info", {})), fields.get("error", ""), time.time()),
+        )
+
+
+def get_entry(name: str) -> Optional[Dict[str, Any]]:
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT * FROM backgrounds WHERE name = ?", (name,)).fetchone()
+    return _row_to_entry(row) if row else None
+
+
+def catalog() -> List[Dict[str, Any]]:
+    with closing(_connect()) as conn:
+        rows = conn.execute("SELECT * FROM backgrounds ORDER BY name").fetchall()
+    return [_row_to_entry(r) for r in rows]
+
+
+def _is_current(entry: Optional[Dict[str, Any]], source: Path) -> bool:
+    if not entry or not source.exists():
+        return False
+    st = source.stat()
+    return entry["source_size"] == st.st_size and entry["source_mtime_ns"] == st.st_mtime_ns
+
+
+def normalized_path(name: str) -> Optional[Path]:
+    """The background's ready-to-use intermediate, or None if it isn't (or is no longer) current"""
+    entry = get_entry(name)
+    if not entry or entry["status"] != "ready" or not _is_current(entry, BACKGROUNDS_DIR / name):
+        return None
+    path = Path(entry["normalized"])
+    return path if path.exists() else None
+
+
+def _target_path(source: Path) -> Path:
+    st = source.stat()
+    key = make_key("bg-normalize-v1", source.name, st.st_size, st.st_mtime_ns,
+                   WIDTH, HEIGHT, FPS, " ".join(NORMALIZE_ENCODER_ARGS))
+    return Path(settings.BACKGROUND_LIBRARY_DIR) / f"{source.stem}.{key[:16]}.mp4"
+
+
+def normalize(name: str, force: bool = False) -> Path:
+    """Transcode one background into the library (no-op if already current)"""
+    source = BACKGROUNDS_DIR / name
+    if not source.exists():
+        raise FileNotFoundError(f"Background video not found: {source}")
+
+    with _name_locks_lock:
+        lock = _name_locks.setdefault(name, threading.Lock())
+    with lock:
+        existing = normalized_path(name)
+        if existing and not force:
+            return existing
+
+        old = get_entry(name)
+        out = _target_path(source)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_name(f".{out.name}.{os.getpid()}.tmp.mp4")
+        _set(name, source, "normalizing")
+        print(f"🎞️  Normalizing background: {name}")
+        started = time.monotonic()
+        try:
+            subprocess.run([
+                "ffmpeg", "-y", "-i", str(source), "-an",
+                "-vf", f"scale={WIDTH}:{HEIGHT}:force_original_aspect_ratio=increase,crop={WIDTH}:{HEIGHT},fps={FPS}",
+                *NORMALIZE_ENCODER_ARGS, "-movflags", "+faststart", str(tmp),
+            ], check=True, capture_output=True)
+            tmp.replace(out)
+            info = media_probe.probe(out)
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            stderr = getattr(e, "stderr", b"") or b""
+            error = stderr.decode("utf-8", "replace").strip().splitlines()[-1:] or [str(e)]
+            _set(name, source, "failed", error=error[0])
+            print(f"❌ Background {name} failed to normalize: {error[0]}")
+            raise
+
+        _set(name, source, "ready", normalized=str(out), info=info)
+        if old and old["normalized"] and old["normalized"] != str(out):
+            Path(old["normalized"]).unlink(missing_ok=True)  # intermediate of a replaced upload
+        print(f"✅ Background {name} ready in {time.monotonic() - started:.1f}s: {out}")
+        return out
+
+
+def _normalize_logged(name: str) -> None:
+    try:
+        normalize(name)
+    except Exception:
+        pass  # recorded as failed in the catalog
+
+
+def normalize_in_background(names: List[str]) -> None:
+    """Queue transcodes of freshly uploaded backgrounds; progress is tracked in the catalog"""
+    for name in names:
+        source = BACKGROUNDS_DIR / name
+        if source.exists() and normalized_path(name) is None:
+            _set(name, source, "queued")
+            _executor.submit(_normalize_logged, name)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Normalize background videos for rendering")
+    ap.add_argument("names", nargs="*", help="Background file names (default: all in assets/backgrounds)")
+    ap.add_argument("--force", action="store_true", help="Re-transcode even if current")
+    ap.add_argument("--list", action="store_true", help="Print the catalog and exit")
+    args = ap.parse_args()
+
+    if args.list:
+        for entry in catalog():
+            print(f"{entry['name']:<32} {entry['status']:<12} {entry['normalized'] or entry['error']}")
+        return
+
+    names = args.names or sorted(p.name for p in BACKGROUNDS_DIR.iterdir() if p.suffix.lower() in VIDEO_EXTENSIONS)
+    failed = 0
+    for name in names:
+        try:
+            normalize(name, force=args.force)
+        except Exception:
+            failed += 1
+    print(f"\nDone. {len(names) - failed}/{len(names)} background(s) normalized in: {settings.BACKGROUND_LIBRARY_DIR}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,97 +1,711 @@
 # visual_engine/render_short.py
+import argparse
 import json
+import math
+import os
+import shutil
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+if __package__ in (None, ""):
+    # Allow `python visual_engine/render_short.py` to import project modules
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+from common import media_probe, metrics
+from common.file_cache import FileCache, file_digest, make_key
 
 WIDTH, HEIGHT = 1080, 1920
 FPS = 30
 BACKGROUNDS_DIR = Path("assets/backgrounds")
 DEFAULT_BACKGROUND = "ocean.mp4"
 
-def render_one(day_dir: Path, sid: str, background_video: str, source_file: str, date_str: str) -> Path:
-    # Get the background video path
-    bg_video_path = BACKGROUNDS_DIR / background_video
-    
-    audio = day_dir / "audio" / f"{sid}.wav"
-    srt = day_dir / "captions" / f"{sid}.srt"
-    
+# Minimal caption style - focus on readability. Baked into .ass captions;
+# only legacy .srt captions need it applied as a force_style override.
+FORCE_STYLE = ",".join(f"{k}={v}" for k, v in settings.CAPTION_STYLE.items())
+
+VIDEO_ENCODER_ARGS = ["-c:v", "libx264", "-pix_fmt", "yuv420p"]
+AUDIO_ENCODER_ARGS = ["-c:a", "aac", "-b:a", "192k"]
+ARCHIVE_AUDIO_ARGS = ["-c:a", "aac", "-b:a", "64k"]   # voiceover archive of a streamed render
+
+# A short's voiceover: its WAV, or PCM streamed from memory (audio_engine.tts.synthesize_pcm)
+Audio = Union[Path, Dict[str, Any]]
+
+# Draft previews for the editor: quarter the pixels, fastest preset
+PREVIEW_WIDTH, PREVIEW_HEIGHT = 540, 960
+PREVIEW_VIDEO_ARGS = ["-c:v", "libx264", "-preset", "ultrafast", "-crf", "28", "-pix_fmt", "yuv420p"]
+PREVIEW_AUDIO_ARGS = ["-c:a", "aac", "-b:a", "96k"]
+
+PROGRESS_INTERVAL = 1.0  # seconds between progress callbacks while ffmpeg encodes
+
+RENDER_CACHE = FileCache(
+    Path(settings.RENDER_CACHE_DIR),
+    max_bytes=settings.RENDER_CACHE_MAX_BYTES,
+    max_age=settings.RENDER_CACHE_MAX_AGE_DAYS * 24 * 3600,
+    suffix=".mp4",
+)
+POSTER_CACHE = FileCache(  # image variants (see settings.OUTPUT_PROFILES)
+    Path(settings.RENDER_CACHE_DIR) / "posters",
+    max_bytes=settings.RENDER_CACHE_MAX_BYTES // 20,
+    max_age=settings.RENDER_CACHE_MAX_AGE_DAYS * 24 * 3600,
+    suffix=".jpg",
+)
+PREVIEW_CACHE = FileCache(  # editor drafts, keyed by their inputs so unchanged previews are reused
+    Path(settings.RENDER_CACHE_DIR) / "previews",
+    max_bytes=settings.RENDER_CACHE_MAX_BYTES // 20,
+    max_age=settings.RENDER_CACHE_MAX_AGE_DAYS * 24 * 3600,
+    suffix=".mp4",
+)
+
+def cpu_count() -> int:
+    """CPUs this process may actually use (respects taskset/cgroup affinity)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def resolve_render_workers(workers: int = None) -> int:
+    """Number of concurrent renders: explicit value, settings.RENDER_WORKERS, or auto"""
+    if workers is None:
+        workers = settings.RENDER_WORKERS
+    if workers and workers > 0:
+        return int(workers)
+    return max(1, cpu_count() // settings.RENDER_CORES_PER_JOB)
+
+def threads_per_job(workers: int) -> int:
+    """Split the machine's cores evenly across concurrent ffmpeg jobs"""
+    return max(1, cpu_count() // max(1, workers))
+
+def output_path(day_dir: Path, sid: str, background_video: str, source_file: str, date_str: str) -> Path:
     # Build descriptive filename: sourcefile_videoselected_voice_date.mp4
     source_name = source_file.replace(".txt", "").replace(".md", "")
     video_name = background_video.replace(".mp4", "").replace(".mov", "")
     # TODO: Get voice from shorts data, for now use "piper"
     voice_name = "piper"
-    
+
     output_filename = f"{source_name}_{video_name}_{voice_name}_{date_str}_{sid}.mp4"
-    out = day_dir / "video" / output_filename
-    out.parent.mkdir(parents=True, exist_ok=True)
+    return day_dir / "video" / output_filename
+
+def variant_path(out: Path, profile_name: str) -> Path:
+    """Where a settings.OUTPUT_PROFILES variant of the master out is written"""
+    if profile_name not in settings.OUTPUT_PROFILES:
+        raise ValueError(f"Unknown output profile: {profile_name}")
+    image = "image_at" in settings.OUTPUT_PROFILES[profile_name]
+    return out.with_name(f"{out.stem}_{profile_name}{'.jpg' if image else out.suffix}")
+
+def output_files(out: Path, profiles: Optional[List[str]] = None) -> List[Path]:
+    """A short's master plus its variants (default: settings.RENDER_PROFILES)"""
+    if profiles is None:
+        profiles = settings.RENDER_PROFILES
+    return [out, *(variant_path(out, name) for name in profiles)]
+
+def caption_file(day_dir: Path, sid: str) -> Path:
+    """The short's captions: styled .ass, or an .srt from the older caption CLIs"""
+    ass = day_dir / "captions" / f"{sid}.ass"
+    return ass if ass.exists() else ass.with_suffix(".srt")
+
+def subtitles_filter(captions: Path) -> str:
+    if captions.suffix == ".ass":
+        return f"ass='{captions.as_posix()}'"
+    return f"subtitles='{captions.as_posix()}':force_style='{FORCE_STYLE}'"
+
+def background_offset(sid: str, background_video: str, bg_info: Dict[str, Any], audio_duration: float) -> float:
+    """Keyframe to start the background at, picked deterministically per short.
+
+    Only keyframes with at least audio_duration of footage after them qualify,
+    so the short never has to loop; 0.0 (and a loop) if the clip is too short.
+    """
+    duration = bg_info.get("duration") or 0.0
+    candidates = [k for k in bg_info.get("keyframes") or [] if k + audio_duration <= duration]
+    if not candidates:
+        return 0.0
+    return candidates[int(make_key("bg-offset", sid, background_video), 16) % len(candidates)]
 
+def audio_seconds(audio: Audio) -> float:
+    return audio["duration"] if isinstance(audio, dict) else media_probe.duration(audio)
+
+def audio_digest(audio: Audio) -> str:
+    """sha256 of the voiceover's WAV; streamed PCM carries that of the WAV it would have been"""
+    return audio["digest"] if isinstance(audio, dict) else file_digest(audio)
+
+def audio_input_args(audio: Audio) -> List[str]:
+    """ffmpeg input options for the voiceover; streamed PCM is read raw from stdin"""
+    if isinstance(audio, dict):
+        return ["-f", f"s{8 * audio['sample_width']}le", "-ar", str(audio["sample_rate"]),
+                "-ac", str(audio["channels"]), "-i", "pipe:0"]
+    return ["-i", str(audio)]
+
+def archive_output_args(archive: Optional[Path]) -> List[str]:
+    """An extra audio-only output of the voiceover (input 1), encoded in the same ffmpeg pass"""
+    return ["-map", "1:a:0", *ARCHIVE_AUDIO_ARGS, str(archive)] if archive else []
+
+def _run_ffmpeg(cmd: List[str], audio: Optional[Audio] = None) -> None:
+    """Run ffmpeg to completion, feeding it streamed PCM on stdin if audio is any"""
+    subprocess.run(cmd, input=audio["pcm"] if isinstance(audio, dict) else None, check=True, capture_output=True)
+
+def render_cache_key(audio: Audio, captions: Path, bg_video_path: Path, bg_offset: float = 0.0,
+                     segment_seconds: float = 0) -> str:
+    """Everything that affects the rendered pixels and samples, nothing that doesn't"""
+    return make_key(
+        "render-v2",
+        audio_digest(audio), file_digest(captions), file_digest(bg_video_path), bg_offset,
+        *([segment_seconds] if segment_seconds else []),  # keeps unsegmented keys unchanged
+        FORCE_STYLE, WIDTH, HEIGHT, FPS,
+        " ".join(VIDEO_ENCODER_ARGS), " ".join(AUDIO_ENCODER_ARGS),
+    )
+
+def _to_float(value: str) -> float:
+    try:
+        return float(value.rstrip("x"))
+    except (AttributeError, ValueError):
+        return 0.0  # ffmpeg reports N/A before the first frame
+
+def parse_progress(stats: Dict[str, str], duration: float) -> Dict[str, Any]:
+    """fps, speed, percent and ETA from one block of ffmpeg -progress key=value output"""
+    # out_time_ms is in microseconds too (long-standing ffmpeg quirk); prefer out_time_us
+    out_time = _to_float(stats.get("out_time_us") or stats.get("out_time_ms") or "0") / 1_000_000
+    speed = _to_float(stats.get("speed", ""))
+    remaining = max(0.0, duration - out_time)
+    done = stats.get("progress") == "end"
+    return {
+        "fps": round(_to_float(stats.get("fps", "")), 1),
+        "speed": round(speed, 2),
+        "out_time": round(out_time, 2),
+        "percent": 100.0 if done else (round(min(100.0, 100 * out_time / duration), 1) if duration else None),
+        "eta": 0.0 if done else (round(remaining / speed, 1) if speed > 0 and duration else None),
+    }
+
+def _feed_stdin(stdin: Any, data: bytes) -> None:
+    try:
+        stdin.write(data)
+        stdin.close()
+    except BrokenPipeError:
+        pass  # ffmpeg exited early; its exit status says why
+
+def _run_ffmpeg_with_progress(cmd: List[str], duration: float, progress: Callable[[Dict[str, Any]], None],
+                              audio: Optional[Audio] = None) -> None:
+    """Run ffmpeg with -progress on stdout, calling progress about once per PROGRESS_INTERVAL"""
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    streamed = isinstance(audio, dict)
+    # stderr goes to a file so a chatty ffmpeg can't block on a full pipe while we read stdout
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if streamed else None,
+                                stdout=subprocess.PIPE, stderr=stderr, text=True)
+        if streamed:
+            # A writer thread, so ffmpeg can't stall on a full stdout pipe while we block on its stdin
+            threading.Thread(target=_feed_stdin, args=(proc.stdin.buffer, audio["pcm"]), daemon=True).start()
+        stats: Dict[str, str] = {}
+        last = 0.0
+        for line in proc.stdout:
+            key, _, value = line.strip().partition("=")
+            stats[key] = value
+            if key != "progress":
+                continue
+            now = time.monotonic()
+            if value == "end" or now - last >= PROGRESS_INTERVAL:
+                last = now
+                progress(parse_progress(stats, duration))
+        if proc.wait() != 0:
+            stderr.seek(0)
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr.read())
+
+def frame_filter(normalized: bool, width: int = WIDTH, height: int = HEIGHT) -> str:
+    """Filters that bring the background to width x height (none for a full-size normalized one)"""
+    if normalized and (width, height) == (WIDTH, HEIGHT):
+        return ""
+    if normalized:
+        return f"scale={width}:{height},"
+    return f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},"
+
+def plan_background(sid: str, background_video: str, audio_duration: float) -> Dict[str, Any]:
+    """Which file to read the background from, where in it to start, and whether to loop"""
+    bg_video_path = BACKGROUNDS_DIR / background_video
     if not bg_video_path.exists():
         raise FileNotFoundError(f"Background video not found: {bg_video_path}")
-    if not audio.exists():
-        raise FileNotFoundError(f"Audio not found: {audio}")
-    if not srt.exists():
-        raise FileNotFoundError(f"Captions not found: {srt}")
-
-    # Minimal caption style - focus on readability
-    force_style = (
-        "FontName=Arial,"             
-        "FontSize=18,"                
-        "PrimaryColour=&HFFFFFF&,"    
-        "OutlineColour=&H000000&,"    
-        "Outline=2,"                  
-        "Alignment=2,"                
-        "MarginV=80"
-    )
 
-    vf = (
-        f"scale={WIDTH}:{HEIGHT}:force_original_aspect_ratio=increase,"
-        f"crop={WIDTH}:{HEIGHT},"
-        f"subtitles='{srt.as_posix()}':force_style='{force_style}'"
-    )
+    # Prefer the background's normalized intermediate: already 1080x1920 30fps, no scale/crop
+    from visual_engine.backgrounds import normalized_path
+    normalized = normalized_path(background_video)
+    bg_input = normalized or bg_video_path
+
+    # Catch unusable backgrounds before ffmpeg does (probe results are cached on disk)
+    bg_info = media_probe.probe(bg_input)
+    if "width" not in bg_info:
+        raise ValueError(f"Background has no video stream: {bg_input}")
+
+    # Each short gets its own stretch of the background, starting on a keyframe
+    offset = background_offset(sid, background_video, bg_info, audio_duration)
+    return {
+        "input": bg_input,
+        "normalized": normalized is not None,
+        "offset": offset,
+        "duration": bg_info.get("duration", 0.0),
+        "loop": bg_info.get("duration", 0.0) - offset < audio_duration,
+    }
+
+def build_render_cmd(bg: Dict[str, Any], audio: Optional[Audio], captions: Path, out: Path,
+                     width: int = WIDTH, height: int = HEIGHT,
+                     video_args: List[str] = VIDEO_ENCODER_ARGS, audio_args: List[str] = AUDIO_ENCODER_ARGS,
+                     threads: int = 0, seconds: Optional[float] = None, start: float = 0.0) -> List[str]:
+    """The ffmpeg command for a short; final renders, previews and segments share it so they match.
+
+    start/seconds select a time range of the short; with audio=None only its video is encoded.
+    """
+    seek = bg["offset"] + start
+    if bg["loop"] and bg["duration"]:
+        seek %= bg["duration"]
+    vf = frame_filter(bg["normalized"], width, height)
+    if start:
+        # Shift frames to the short's timeline for the captions, then back to start at 0
+        vf += f"setpts=PTS+{start:g}/TB,{subtitles_filter(captions)},setpts=PTS-STARTPTS"
+    else:
+        vf += subtitles_filter(captions)
 
     cmd = [
         "ffmpeg",
         "-y",
-        "-stream_loop", "-1",
-        "-i", str(bg_video_path),
-        "-i", str(audio),
+        *(["-stream_loop", "-1"] if bg["loop"] else []),
+        *(["-ss", f"{seek:.3f}"] if seek else []),  # input seek: decoding starts at the keyframe
+        "-i", str(bg["input"]),
+        *(audio_input_args(audio) if audio else []),
         "-vf", vf,
         "-r", str(FPS),
         "-map", "0:v:0",
-        "-map", "1:a:0",
-        "-c:v", "libx264",
-        "-pix_fmt", "yuv420p",
-        "-c:a", "aac",
-        "-b:a", "192k",
-        "-shortest",
-        str(out),
+        *(["-map", "1:a:0"] if audio else []),
+        *video_args,
+        *(audio_args if audio else ["-an"]),
+        *(["-shortest"] if audio else []),
+    ]
+    if seconds:
+        cmd += ["-t", f"{seconds:g}"]
+    if threads > 0:
+        cmd += ["-threads", str(threads)]
+    cmd.append(str(out))
+    return cmd
+
+def build_variants_cmd(bg: Dict[str, Any], audio: Audio, captions: Path, out: Path,
+                       variants: Dict[str, Path], audio_duration: float, threads: int = 0) -> List[str]:
+    """One ffmpeg for the master and every profile variant: decode, scale and burn captions
+    once, then split into a branch per output (scaled, or a single frame for images)."""
+    graph = [f"[0:v]{frame_filter(bg['normalized'])}{subtitles_filter(captions)},split={len(variants) + 1}[m]"
+             + "".join(f"[p{i}]" for i in range(len(variants)))]
+    for i, name in enumerate(variants):
+        profile = settings.OUTPUT_PROFILES[name]
+        chain = []
+        if "image_at" in profile:
+            chain.append(f"trim=start={min(profile['image_at'], audio_duration / 2):g},setpts=PTS-STARTPTS")
+        if (profile["width"], profile["height"]) != (WIDTH, HEIGHT):
+            chain.append(f"scale={profile['width']}:{profile['height']}")
+        graph.append(f"[p{i}]{','.join(chain) or 'null'}[v{i}]")
+
+    thread_args = ["-threads", str(threads)] if threads > 0 else []
+    cmd = [
+        "ffmpeg",
+        "-y",
+        *(["-stream_loop", "-1"] if bg["loop"] else []),
+        *(["-ss", f"{bg['offset']:.3f}"] if bg["offset"] else []),
+        "-i", str(bg["input"]),
+        *audio_input_args(audio),
+        "-filter_complex", ";".join(graph),
+        "-map", "[m]", "-map", "1:a:0", "-r", str(FPS),
+        *VIDEO_ENCODER_ARGS, *AUDIO_ENCODER_ARGS, "-shortest", *thread_args, str(out),
     ]
-    subprocess.run(cmd, check=True)
+    for i, (name, path) in enumerate(variants.items()):
+        profile = settings.OUTPUT_PROFILES[name]
+        if "image_at" in profile:
+            cmd += ["-map", f"[v{i}]", "-frames:v", "1", *profile.get("image_args", []), str(path)]
+        else:
+            cmd += ["-map", f"[v{i}]", "-map", "1:a:0", "-r", str(FPS),
+                    *profile["video_args"], *profile["audio_args"], "-shortest", *thread_args, str(path)]
+    return cmd
+
+def segment_bounds(duration: float, segment_seconds: float) -> List[Tuple[float, float]]:
+    """(start, length) of each segment; a sub-frame remainder is folded into the last one"""
+    starts = [i * segment_seconds for i in range(max(1, math.ceil(duration / segment_seconds)))]
+    if len(starts) > 1 and duration - starts[-1] < 1.0 / FPS:
+        starts.pop()
+    return [(start, (starts[i + 1] if i + 1 < len(starts) else duration) - start) for i, start in enumerate(starts)]
+
+def _encode_segmented(bg: Dict[str, Any], audio: Audio, captions: Path, out: Path, audio_duration: float,
+                      segment_seconds: float, threads: int,
+                      progress: Optional[Callable[[Dict[str, Any]], None]], archive: Optional[Path] = None) -> None:
+    """Encode the video in parallel time segments, then concat them (stream copy) and add the audio.
+
+    Segments start on whole multiples of segment_seconds: keyframes of a normalized background
+    (offsets are keyframes and its GOP divides whole seconds), and each encode starts with its own
+    IDR frame, so the concat demuxer can join them without re-encoding. The audio is encoded once,
+    in the final mux, so there are no per-segment AAC priming gaps.
+    """
+    bounds = segment_bounds(audio_duration, segment_seconds)
+    budget = threads if threads > 0 else cpu_count()
+    workers = min(len(bounds), budget)
+    seg_threads = max(1, budget // workers)
+
+    seg_dir = out.with_name(f".{out.stem}.segments")
+    shutil.rmtree(seg_dir, ignore_errors=True)
+    seg_dir.mkdir(parents=True)
+    started, done = time.monotonic(), [0.0]
+    lock = threading.Lock()
+
+    def encode(i: int) -> Path:
+        start, length = bounds[i]
+        seg = seg_dir / f"{i:04d}.mp4"
+        subprocess.run(build_render_cmd(bg, None, captions, seg, threads=seg_threads, seconds=length, start=start),
+                       check=True, capture_output=True)
+        if progress is not None:
+            with lock:
+                done[0] += length
+                elapsed = time.monotonic() - started
+                speed = done[0] / elapsed if elapsed else 0.0
+                progress({"fps": round(speed * FPS, 1), "speed": round(speed, 2), "out_time": round(done[0], 2),
+                          "percent": round(min(100.0, 100 * done[0] / audio_duration), 1),
+                          "eta": round((audio_duration - done[0]) / speed, 1) if speed else None})
+        return seg
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="segment") as pool:
+            segments = list(pool.map(encode, range(len(bounds))))
+        concat_list = seg_dir / "segments.txt"
+        concat_list.write_text("".join(f"file '{p.name}'\n" for p in segments), encoding="utf-8")
+        _run_ffmpeg([
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0", "-i", str(concat_list),
+            *audio_input_args(audio),
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "copy", *AUDIO_ENCODER_ARGS,
+            "-shortest", str(out),
+            *archive_output_args(archive),
+        ], audio)
+    finally:
+        shutil.rmtree(seg_dir, ignore_errors=True)
+
+def _short_inputs(day_dir: Path, sid: str, audio: Optional[Audio] = None) -> Tuple[Audio, Path]:
+    """The short's voiceover (its WAV unless streamed audio is given) and captions"""
+    if audio is None:
+        audio = day_dir / "audio" / f"{sid}.wav"
+        if not audio.exists():
+            raise FileNotFoundError(f"Audio not found: {audio}")
+    captions = caption_file(day_dir, sid)
+    if not captions.exists():
+        raise FileNotFoundError(f"Captions not found: {captions}")
+    return audio, captions
+
+def render_one(day_dir: Path, sid: str, background_video: str, source_file: str, date_str: str,
+               threads: int = 0, force: bool = False,
+               progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+               segment_seconds: Optional[float] = None, profiles: Optional[List[str]] = None,
+               audio: Optional[Dict[str, Any]] = None, archive: Optional[Path] = None) -> Path:
+    """Render one short, reusing a cached MP4 when its inputs are unchanged (unless force).
+
+    progress, if given, is called with fps/speed/percent/eta while ffmpeg encodes.
+    profiles (default settings.RENDER_PROFILES) names extra outputs from
+    settings.OUTPUT_PROFILES, made in the same ffmpeg pass; see variant_path().
+    Without extra profiles, shorts longer than segment_seconds (default
+    settings.RENDER_SEGMENT_SECONDS; 0 = off) are encoded as parallel segments.
+    audio, if given, is the voiceover as in-memory PCM (tts.synthesize_pcm),
+    piped to ffmpeg instead of reading the workspace WAV; archive then names
+    a compact encoded copy of it to write alongside.
+    Returns the master's path.
+    """
+    if segment_seconds is None:
+        segment_seconds = settings.RENDER_SEGMENT_SECONDS
+    audio, captions = _short_inputs(day_dir, sid, audio)
+    audio_duration = audio_seconds(audio)
+    bg = plan_background(sid, background_video, audio_duration)
+
+    out = output_path(day_dir, sid, background_video, source_file, date_str)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    if profiles is None:
+        profiles = settings.RENDER_PROFILES
+    variants = {name: variant_path(out, name) for name in profiles}
+    segmented = bool(segment_seconds) and audio_duration > segment_seconds and not variants
+    if not isinstance(audio, dict):
+        archive = None  # the WAV is the archive
+    if archive is not None:
+        archive.unlink(missing_ok=True)  # may be hard-linked from the previous run's workspace
+
+    key = render_cache_key(audio, captions, bg["input"], bg["offset"], segment_seconds if segmented else 0)
+    cached = [(RENDER_CACHE, key, out)] + [
+        (POSTER_CACHE if "image_at" in settings.OUTPUT_PROFILES[name] else RENDER_CACHE,
+         make_key(key, name, settings.OUTPUT_PROFILES[name]), path)
+        for name, path in variants.items()
+    ]
+    if not force and all(cache.fetch(k, path) for cache, k, path in cached):
+        print(f"   ♻️  {sid}: video reused from render cache")
+        if archive is not None:
+            _run_ffmpeg(["ffmpeg", "-y", *audio_input_args(audio), *ARCHIVE_AUDIO_ARGS, str(archive)], audio)
+        return out
+
+    # Outputs may be hard links into the render cache; never let ffmpeg write through them
+    for _, _, path in cached:
+        path.unlink(missing_ok=True)
+
+    if variants:
+        cmd = build_variants_cmd(bg, audio, captions, out, variants, audio_duration, threads)
+    else:
+        cmd = build_render_cmd(bg, audio, captions, out, threads=threads)
+    cmd += archive_output_args(archive)
+    with metrics.timed(metrics.ENCODE_SECONDS, background=background_video):
+        if segmented:
+            _encode_segmented(bg, audio, captions, out, audio_duration, segment_seconds, threads, progress, archive)
+        elif progress is None:
+            _run_ffmpeg(cmd, audio)
+        else:
+            _run_ffmpeg_with_progress(cmd, audio_duration, progress, audio)
+
+    for cache, k, path in cached:
+        cache.store(k, path)
     return out
 
+def render_preview(day_dir: Path, sid: str, background_video: str, seconds: Optional[float] = None) -> Path:
+    """Low-resolution ultrafast draft of a short (optionally just its first seconds) for the editor.
+
+    Uses the same background selection and filter graph as render_one, at PREVIEW_WIDTH x PREVIEW_HEIGHT.
+    Written to <day_dir>/preview/ under a name keyed by its inputs; unchanged previews come from PREVIEW_CACHE.
+    """
+    audio, captions = _short_inputs(day_dir, sid)
+    bg = plan_background(sid, background_video, media_probe.duration(audio))
+
+    key = make_key("preview-v1", file_digest(audio), file_digest(captions), file_digest(bg["input"]),
+                   bg["offset"], seconds, PREVIEW_WIDTH, PREVIEW_HEIGHT, " ".join(PREVIEW_VIDEO_ARGS))
+    out = day_dir / "preview" / f"{sid}.{key[:16]}.mp4"
+    if PREVIEW_CACHE.fetch(key, out):
+        return out
+    out.parent.mkdir(parents=True, exist_ok=True)
+    for stale in out.parent.glob(f"{sid}.*.mp4"):
+        stale.unlink(missing_ok=True)
+
+    tmp = out.with_name(f".{out.name}.{threading.get_ident()}.tmp.mp4")
+    cmd = build_render_cmd(bg, audio, captions, tmp, PREVIEW_WIDTH, PREVIEW_HEIGHT,
+                           PREVIEW_VIDEO_ARGS, PREVIEW_AUDIO_ARGS, seconds=seconds)
+    cmd[-1:-1] = ["-movflags", "+faststart"]  # playable while it downloads
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+        tmp.replace(out)
+    finally:
+        tmp.unlink(missing_ok=True)
+    PREVIEW_CACHE.store(key, out)
+    return out
+
+def _render_job(job: Dict[str, Any], threads: int) -> Dict[str, Any]:
+    sid = job["sid"]
+    try:
+        out = render_one(job["day_dir"], sid, job["background_video"], job["source_file"],
+                         job["date_str"], threads=threads, force=job.get("force", False),
+                         segment_seconds=job.get("segment_seconds"), profiles=job.get("profiles"))
+        print(f"   ✅ Rendered: {out.name}")
+        return {"id": sid, "status": "ok", "output": str(out), "error": ""}
+    except subprocess.CalledProcessError as e:
+        stderr = (e.stderr or b"").decode("utf-8", errors="ignore").strip()
+        error = stderr.splitlines()[-1] if stderr else str(e)
+    except Exception as e:
+        error = str(e)
+    print(f"   ❌ {sid} failed: {error}")
+    return {"id": sid, "status": "failed", "output": "", "error": error}
+
+def decode_windows(pending: List[Dict[str, Any]], gap: float = None) -> List[List[int]]:
+    """Group shorts whose background stretches overlap or lie within gap seconds of each other.
+
+    Each group is decoded once, from its earliest offset to its latest end; shorts spread
+    across the clip (see background_offset) get a group, and a decode, of their own.
+    """
+    if gap is None:
+        gap = settings.RENDER_SHARED_DECODE_GAP
+    groups: List[List[int]] = []
+    end = 0.0
+    for i in sorted(range(len(pending)), key=lambda i: pending[i]["bg"]["offset"]):
+        start = pending[i]["bg"]["offset"]
+        if groups and start <= end + gap:
+            groups[-1].append(i)
+        else:
+            groups.append([i])
+            end = start
+        end = max(end, start + pending[i]["duration"])
+    return groups
+
+def _encode_shared(pending: List[Dict[str, Any]], threads: int) -> None:
+    """One ffmpeg for several shorts on the same background: decode and scale it once per window, split per short.
+
+    Shorts are grouped by decode_windows(); each group's stretch of the background is an
+    input of its own, seeked to the group's earliest offset. Each branch trims its own
+    segment (so every short keeps its keyframe offset), burns its captions and is encoded
+    to its own output with its own audio.
+    """
+    bg = pending[0]["bg"]
+    windows = decode_windows(pending)
+    budget = threads if threads > 0 else cpu_count()
+
+    cmd = ["ffmpeg", "-y"]
+    graph = []
+    for w, members in enumerate(windows):
+        start = min(pending[i]["bg"]["offset"] for i in members)
+        loop = any(pending[i]["bg"]["loop"] for i in members)
+        cmd += [
+            *(["-stream_loop", "-1"] if loop else []),
+            *(["-ss", f"{start:.3f}"] if start else []),
+            "-i", str(bg["input"]),
+        ]
+        graph.append(f"[{w}:v]{frame_filter(bg['normalized'])}split={len(members)}" + "".join(f"[s{i}]" for i in members))
+        for i in members:
+            p = pending[i]
+            graph.append(f"[s{i}]trim=start={p['bg']['offset'] - start:g}:duration={p['duration']:g},"
+                         f"setpts=PTS-STARTPTS,{subtitles_filter(p['captions'])}[v{i}]")
+    for p in pending:
+        cmd += ["-i", str(p["audio"])]
+    cmd += ["-filter_complex", ";".join(graph)]
+    for i, p in enumerate(pending):
+        p["out"].unlink(missing_ok=True)  # may be a hard link into the render cache
+        cmd += [
+            "-map", f"[v{i}]",
+            "-map", f"{len(windows) + i}:a:0",
+            "-r", str(FPS),
+            *VIDEO_ENCODER_ARGS,
+            *AUDIO_ENCODER_ARGS,
+            "-shortest",
+            "-threads", str(max(1, budget // len(pending))),
+            str(p["out"]),
+        ]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+def render_shared(jobs: List[Dict[str, Any]], threads: int = 0) -> List[Dict[str, Any]]:
+    """Render jobs that share a workspace and background_video with one shared-decode ffmpeg.
+
+    Render-cache hits are skipped, and shorts that get segment-parallel encodes or profile
+    variants go through render_one. If the shared encode fails, the shorts are retried one by one so a single bad
+    short doesn't fail its siblings. Returns one result dict per job, in input order.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    for job in jobs:
+        sid = job["sid"]
+        try:
+            audio, captions = _short_inputs(job["day_dir"], sid)
+            duration = media_probe.duration(audio)
+            segment_seconds = job.get("segment_seconds")
+            if segment_seconds is None:
+                segment_seconds = settings.RENDER_SEGMENT_SECONDS
+            profiles = job.get("profiles")
+            if profiles is None:
+                profiles = settings.RENDER_PROFILES
+            if (segment_seconds and duration > segment_seconds) or profiles:
+                results[sid] = _render_job(job, threads)  # segmented or multi-variant renders
+                continue
+
+            bg = plan_background(sid, job["background_video"], duration)
+            out = output_path(job["day_dir"], sid, job["background_video"], job["source_file"], job["date_str"])
+            out.parent.mkdir(parents=True, exist_ok=True)
+            key = render_cache_key(audio, captions, bg["input"], bg["offset"])
+            if not job.get("force") and RENDER_CACHE.fetch(key, out):
+                print(f"   ♻️  {sid}: video reused from render cache")
+                results[sid] = {"id": sid, "status": "ok", "output": str(out), "error": ""}
+                continue
+            pending.append({**job, "audio": audio, "captions": captions, "duration": duration,
+                            "bg": bg, "out": out, "key": key})
+        except Exception as e:
+            print(f"   ❌ {sid} failed: {e}")
+            results[sid] = {"id": sid, "status": "failed", "output": "", "error": str(e)}
+
+    if len(pending) == 1:
+        results[pending[0]["sid"]] = _render_job(pending[0], threads)
+    elif pending:
+        print(f"🎞️  {len(pending)} short(s) sharing {len(decode_windows(pending))} decode(s) "
+              f"of {pending[0]['background_video']}")
+        try:
+            with metrics.timed(metrics.ENCODE_SECONDS, background=pending[0]["background_video"]):
+                _encode_shared(pending, threads)
+            for p in pending:
+                RENDER_CACHE.store(p["key"], p["out"])
+                print(f"   ✅ Rendered: {p['out'].name}")
+                results[p["sid"]] = {"id": p["sid"], "status": "ok", "output": str(p["out"]), "error": ""}
+        except Exception as e:
+            stderr = (getattr(e, "stderr", b"") or b"").decode("utf-8", errors="ignore").strip()
+            print(f"   ⚠️  Shared render failed ({stderr.splitlines()[-1] if stderr else e}); rendering one by one")
+            for p in pending:
+                results[p["sid"]] = _render_job(p, threads)
+    return [results[job["sid"]] for job in jobs]
+
+def render_many(jobs: List[Dict[str, Any]], workers: int = None, shared_decode: bool = None) -> List[Dict[str, Any]]:
+    """Render several shorts concurrently; one failed job never stops its siblings.
+
+    Each job is a dict with sid, day_dir, background_video, source_file and date_str,
+    plus an optional force flag to bypass the render cache, segment_seconds and profiles.
+    With shared_decode (default settings.RENDER_SHARED_DECODE), shorts are grouped by
+    background and each group is rendered by render_shared().
+    Returns one result dict per job, in input order.
+    """
+    if shared_decode is None:
+        shared_decode = settings.RENDER_SHARED_DECODE
+    groups: Dict[Any, List[int]] = {}
+    for i, job in enumerate(jobs):
+        group = (str(job["day_dir"]), job["background_video"]) if shared_decode else i
+        groups.setdefault(group, []).append(i)
+    batches = list(groups.values())
+
+    workers = min(resolve_render_workers(workers), max(1, len(batches)))
+    threads = threads_per_job(workers)
+    print(f"🎬 Rendering {len(jobs)} short(s) in {len(batches)} batch(es): "
+          f"{workers} at a time, {threads} ffmpeg threads each")
+
+    def render_batch(batch: List[int]) -> List[Dict[str, Any]]:
+        if len(batch) == 1:
+            return [_render_job(jobs[batch[0]], threads)]
+        return render_shared([jobs[i] for i in batch], threads)
+
+    # Each batch is its own ffmpeg process, so a thread pool is enough to bound them
+    results: List[Dict[str, Any]] = [{}] * len(jobs)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render") as pool:
+        for batch, batch_results in zip(batches, pool.map(render_batch, batches)):
+            for i, result in zip(batch, batch_results):
+                results[i] = result
+    return results
+
 def main():
-    dated = sorted(Path("output").glob("20??-??-??"))
-    if not dated:
-        raise FileNotFoundError("No output/YYYY-MM-DD folder found. Run TTS/captions first.")
-    day_dir = dated[-1]
-    date_str = day_dir.name  # e.g., "2026-01-11"
-
-    # Read from temp directory
-    json_files = sorted(Path("data/temp").glob("shorts_*.json"), key=lambda p: p.stat().st_mtime)
-    if not json_files:
-        raise FileNotFoundError("No data/temp/shorts_*.json found. Run generate_scripts.py first.")
-    json_path = json_files[-1]
-
-    payload = json.loads(json_path.read_text(encoding="utf-8"))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workspace", required=True, help="Run workspace containing shorts.json, audio/ and captions/")
+    ap.add_argument("--force", action="store_true", help="Re-render even if the render cache has a match")
+    ap.add_argument("--preview", action="store_true", help=f"Draft {PREVIEW_WIDTH}x{PREVIEW_HEIGHT} previews instead")
+    ap.add_argument("--seconds", type=float, default=None, help="Preview only the first N seconds")
+    ap.add_argument("--profiles", nargs="*", default=None,
+                    help="Extra outputs from settings.OUTPUT_PROFILES, e.g. 720p poster (default from settings)")
+    ap.add_argument("--shared-decode", action="store_true", default=None,
+                    help="Render shorts on the same background from one ffmpeg (default from settings)")
+    ap.add_argument("--segment-seconds", type=float, default=None,
+                    help="Encode shorts longer than this as parallel segments (0 = off; default from settings)")
+    args = ap.parse_args()
+
+    day_dir = Path(args.workspace)
+    payload = json.loads((day_dir / "shorts.json").read_text(encoding="utf-8"))
+    if args.preview:
+        for s in payload.get("shorts", []):
+            print("✅ Preview:", render_preview(day_dir, s["id"], s.get("background_video", DEFAULT_BACKGROUND), args.seconds))
+        return
     source_file = payload.get("source_file", "unknown")
+    date_str = payload.get("date", "unknown-date")  # e.g., "2026-01-11"
     
-    for s in payload.get("shorts", []):
-        sid = s["id"]
-        background_video = s.get("background_video", DEFAULT_BACKGROUND)
-        
-        print(f"🎬 Rendering {sid} with background: {background_video}")
-        out = render_one(day_dir, sid, background_video, source_file, date_str)
-        print(f"   ✅ Rendered: {out.name}")
+    jobs = [
+        {
+            "sid": s["id"],
+            "day_dir": day_dir,
+            "background_video": s.get("background_video", DEFAULT_BACKGROUND),
+            "source_file": source_file,
+            "date_str": date_str,
+            "force": args.force,
+            "segment_seconds": args.segment_seconds,
+            "profiles": args.profiles,
+        }
+        for s in payload.get("shorts", [])
+    ]
+    results = render_many(jobs, shared_decode=args.shared_decode)
+
+    failed = [r for r in results if r["status"] != "ok"]
+    if failed:
+        raise SystemExit(f"❌ {len(failed)} of {len(results)} renders failed: " + ", ".join(r["id"] for r in failed))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file